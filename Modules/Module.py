@@ -36,6 +36,21 @@ class Module(object, metaclass=abc.ABCMeta):
         # Module output file directory
         self.output_dir = "/tmp/"
 
+        # Expected runtime of module in minutes on a typical input. Used to prioritize tasks on the critical path.
+        # Long-running modules (aligners, variant callers, etc.) override it. Everything else counts as 1 minute.
+        self.runtime_estimate = 1
+
+        # Flag specifying whether module only parses a small input file and can be run on the controller
+        # Inline modules name the input argument holding the file and whether only the start of the file is needed
+        self.is_inline              = False
+        self.inline_input_key       = None
+        self.inline_partial_input   = False
+
+        # Input and output types the module's command reads and writes from start to finish exactly once
+        # Output of a module can be streamed through a pipe into a module fused after it instead of being saved
+        self.streamable_inputs      = []
+        self.streamable_outputs     = []
+
     @abc.abstractmethod
     def define_input(self):
         pass
@@ -119,6 +134,11 @@ class Module(object, metaclass=abc.ABCMeta):
         # Example: Module that determines how many lines are in a file
         pass
 
+    def process_inline_input(self, contents):
+        # Parse contents of the inline input file when module is run on the controller
+        # Override if module's command does more than print the input file
+        self.process_cmd_output(contents.decode("utf8"), "")
+
     def generate_unique_file_name(self, extension=".dat", output_dir=None):
 
         # Generate file basename
@@ -208,12 +228,19 @@ class Module(object, metaclass=abc.ABCMeta):
             raise RuntimeError("Attempt to set undeclared output type for module!")
         self.output[key] = value
 
+    def get_runtime_estimate(self):
+        return self.runtime_estimate
+
     def get_output_dir(self):
         return self.output_dir
 
     def set_output_dir(self, new_output_dir):
         self.output_dir = new_output_dir
 
+    def get_immutable_attributes(self):
+        # Return attributes that never change after module is loaded and can be shared by split copies of the module
+        return [self.module_args, self.input_keys, self.output_keys]
+
     def get_input_values(self):
         # Get list of current input values
         return [arg.get_value() for arg in list(self.arguments.values())]
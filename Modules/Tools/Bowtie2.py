@@ -4,6 +4,7 @@ class Bowtie2(Module):
     def __init__(self, module_id, is_docker = False):
         super(Bowtie2, self).__init__(module_id, is_docker)
         self.output_keys = ["bam", "R1", "R2"]
+        self.runtime_estimate = 180
 
     def define_input(self):
         self.add_argument("R1",             is_required=True)
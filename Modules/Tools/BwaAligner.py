@@ -5,6 +5,9 @@ class BwaAligner(Module):
         super(BwaAligner, self).__init__(module_id, is_docker)
         self.output_keys = ["bam", "bam_sorted"]
 
+        self.streamable_inputs  = ["R1", "R2"]
+        self.runtime_estimate = 240
+
     def define_input(self):
         self.add_argument("R1",             is_required=True)
         self.add_argument("R2")
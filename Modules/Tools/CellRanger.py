@@ -7,6 +7,7 @@ class CellRanger(Module):
     def __init__(self, module_id, is_docker = False):
         super(CellRanger, self).__init__(module_id, is_docker, is_resumable=True)
         self.output_keys = ["cellranger_output_dir"]
+        self.runtime_estimate = 240
 
     def define_input(self):
         self.add_argument("sample_name",            is_required=True)
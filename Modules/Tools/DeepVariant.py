@@ -5,6 +5,7 @@ class DeepVariant(Module):
     def __init__(self, module_id, is_docker = True):
         super(DeepVariant, self).__init__(module_id, is_docker)
         self.output_keys = ["vcf_gz", "vcf_tbi", "gvcf_gz", "gvcf_tbi"]
+        self.runtime_estimate = 240
 
     def define_input(self):
         self.add_argument("sample_name",    is_required=True)
@@ -4,6 +4,7 @@ class Delly(Module):
     def __init__(self, module_id, is_docker = False):
         super(Delly, self).__init__(module_id, is_docker)
         self.output_keys = ["bcf", "csi"]
+        self.runtime_estimate = 120
 
     def define_input(self):
         self.add_argument("bam",            is_required=True)
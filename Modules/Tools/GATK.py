@@ -73,6 +73,7 @@ class HaplotypeCaller(_GATKBase):
     def __init__(self, module_id, is_docker=False):
         super(HaplotypeCaller, self).__init__(module_id, is_docker)
         self.output_keys = ["gvcf_gz", "gvcf_idx", "vcf_gz", "vcf_idx"]
+        self.runtime_estimate = 240
 
     def define_input(self):
         self.define_base_args()
@@ -180,6 +181,7 @@ class PrintReads(_GATKBase):
     def __init__(self, module_id, is_docker=False):
         super(PrintReads, self).__init__(module_id, is_docker)
         self.output_keys            = ["bam"]
+        self.runtime_estimate = 90
 
     def define_input(self):
         self.define_base_args()
@@ -237,6 +239,7 @@ class ApplyBQSR(_GATKBase):
     def __init__(self, module_id, is_docker=False):
         super(ApplyBQSR, self).__init__(module_id, is_docker)
         self.output_keys            = ["bam", "bam_idx"]
+        self.runtime_estimate = 90
 
     def define_input(self):
         self.define_base_args()
@@ -298,6 +301,7 @@ class BaseRecalibrator(_GATKBase):
     def __init__(self, module_id, is_docker=False):
         super(BaseRecalibrator, self).__init__(module_id, is_docker)
         self.output_keys    = ["BQSR_report"]
+        self.runtime_estimate = 90
 
     def define_input(self):
         self.define_base_args()
@@ -505,6 +509,7 @@ class GenotypeGenomicsDB(_GATKBase):
     def __init__(self, module_id, is_docker=False):
         super(GenotypeGenomicsDB, self).__init__(module_id, is_docker)
         self.output_keys = ["vcf", "vcf_idx"]
+        self.runtime_estimate = 60
 
     def define_input(self):
         self.define_base_args()
@@ -563,6 +568,7 @@ class SplitNCigarReads(_GATKBase):
     def __init__(self, module_id, is_docker=False):
         super(SplitNCigarReads, self).__init__(module_id, is_docker)
         self.output_keys  = ["bam"]
+        self.runtime_estimate = 90
 
     def define_input(self):
         self.define_base_args()
@@ -607,6 +613,7 @@ class Mutect2(_GATKBase):
     def __init__(self, module_id, is_docker=False):
         super(Mutect2, self).__init__(module_id, is_docker)
         self.output_keys = ["vcf_gz", "vcf_tbi", "stats_table"]
+        self.runtime_estimate = 300
 
     def define_input(self):
         self.define_base_args()
@@ -775,6 +782,7 @@ class DepthOfCoverage(_GATKBase):
         self.prefix         = None
         self.output_keys    = ["per_base_summary", "interval_summary", "interval_statistics", "sample_summary",
                                "sample_statistics", "cumulative_coverage_counts", "cumulative_coverage_proportions"]
+        self.runtime_estimate = 60
 
     def define_input(self):
         self.define_base_args()
@@ -8,6 +8,7 @@ class HlaLa(Module):
         super(HlaLa, self).__init__(module_id, is_docker)
         # Add output keys here if needed
         self.output_keys = ["hla_report"]
+        self.runtime_estimate = 60
 
     def define_input(self):
         # Module creator needs to define which arguments have is_resource=True
@@ -4,6 +4,7 @@ class NovoBreak(Module):
     def __init__(self, module_id, is_docker = False):
         super(NovoBreak, self).__init__(module_id, is_docker)
         self.output_keys = ["vcf"]
+        self.runtime_estimate = 240
 
     def define_input(self):
         self.add_argument("bam",            is_required=True)
@@ -7,6 +7,7 @@ class MarkDuplicates(Module):
     def __init__(self, module_id, is_docker = False):
         super(MarkDuplicates, self).__init__(module_id, is_docker)
         self.output_keys            = ["bam", "MD_report", "bam_sorted"]
+        self.runtime_estimate = 120
 
     def define_input(self):
         self.add_argument("bam",        is_required=True)
@@ -140,6 +141,7 @@ class SamToFastq(Module):
     def __init__(self, module_id, is_docker=False):
         super(SamToFastq, self).__init__(module_id, is_docker)
         self.output_keys = ["R1", "R2"]
+        self.runtime_estimate = 60
 
     def define_input(self):
         self.add_argument("bam",        is_required=True)
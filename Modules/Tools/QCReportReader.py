@@ -129,6 +129,10 @@ class _QCReportReader(Module):
     def __init__(self, module_id, is_docker=False):
         super(_QCReportReader, self).__init__(module_id, is_docker)
 
+        # QCReport is small enough to be parsed on the controller
+        self.is_inline          = True
+        self.inline_input_key   = "qc_report"
+
     def define_input(self):
         self.add_argument("qc_report",      is_required=True)
         self.add_argument("sample_name",    is_required=True)
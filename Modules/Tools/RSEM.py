@@ -4,6 +4,7 @@ class RSEM(Module):
     def __init__(self, module_id, is_docker = False):
         super(RSEM, self).__init__(module_id, is_docker)
         self.output_keys = ["isoforms_results", "genes_results"]
+        self.runtime_estimate = 120
 
     def define_input(self):
         self.add_argument("transcriptome_mapped_bam",   is_required=True)
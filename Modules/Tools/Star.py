@@ -7,6 +7,7 @@ class Star(Module):
 
         self.output_keys = ["bam", "transcriptome_mapped_bam", "raw_read_counts",
                             "splice_junction_out", "final_log"]
+        self.runtime_estimate = 60
 
     def define_input(self):
         self.add_argument("R1",                         is_required=True)
@@ -8,6 +8,7 @@ class Strelka2(Module):
 
         # Initialze Strelka2's run directory
         self.run_directory = None
+        self.runtime_estimate = 120
 
     def define_input(self):
         self.add_argument("sample_name",    is_required=True)
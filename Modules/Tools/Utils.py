@@ -1,5 +1,6 @@
 import logging
 import copy
+import zlib
 from itertools import zip_longest
 
 from System.Datastore import GAPFile
@@ -421,6 +422,9 @@ class BGZipVCF(Module):
         super(BGZipVCF, self).__init__(module_id, is_docker)
         self.output_keys    = ["vcf_gz"]
 
+        self.streamable_inputs  = ["vcf"]
+        self.streamable_outputs = ["vcf_gz"]
+
     def define_input(self):
         self.add_argument("vcf",        is_required=True)
         self.add_argument("bgzip",      is_required=True, is_resource=True)
@@ -450,6 +454,9 @@ class BGZipBED(Module):
         super(BGZipBED, self).__init__(module_id, is_docker)
         self.output_keys    = ["bed_gz"]
 
+        self.streamable_inputs  = ["bed"]
+        self.streamable_outputs = ["bed_gz"]
+
     def define_input(self):
         self.add_argument("bed",        is_required=True)
         self.add_argument("bgzip",      is_required=True, is_resource=True)
@@ -478,6 +485,11 @@ class GetReadGroup(Module):
         super(GetReadGroup, self).__init__(module_id, is_docker)
         self.output_keys = ["read_group"]
 
+        # Only the first read header is needed
+        self.is_inline              = True
+        self.inline_input_key       = "R1"
+        self.inline_partial_input   = True
+
     def define_input(self):
         self.add_argument("R1",             is_required=True)
         self.add_argument("sample_name",    is_required=True)
@@ -498,6 +510,15 @@ class GetReadGroup(Module):
             cmd = "head -n 1 %s" % R1
         return cmd
 
+    def process_inline_input(self, contents):
+        # Decompress as much of the gzipped fastq as was read
+        if self.get_argument("R1").endswith(".gz"):
+            contents = zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(contents)
+
+        # Mimic 'head -n 1'
+        first_line = contents.decode("utf8").split("\n")[0]
+        self.process_cmd_output("%s\n" % first_line, "")
+
     def process_cmd_output(self, out, err):
 
         # Obtain necessary data
@@ -571,6 +592,10 @@ class GetVCFChroms(Module):
         super(GetVCFChroms, self).__init__(module_id, is_docker)
         self.output_keys = ["chrom_list"]
 
+        # Small VCFs can be parsed on the controller
+        self.is_inline          = True
+        self.inline_input_key   = "vcf"
+
     def define_input(self):
         self.add_argument("vcf",        is_required=True)
         self.add_argument("nr_cpus",    is_required=True, default_value=1)
@@ -585,6 +610,14 @@ class GetVCFChroms(Module):
         cmd = 'cat {0} | grep -v "#" | cut -f1 | sort | uniq'.format(vcf)
         return cmd
 
+    def process_inline_input(self, contents):
+        # Mimic 'grep -v "#" | cut -f1 | sort | uniq'
+        chroms = set()
+        for line in contents.decode("utf8").split("\n"):
+            if len(line) > 0 and "#" not in line:
+                chroms.add(line.split("\t")[0])
+        self.process_cmd_output("".join(["%s\n" % chrom for chrom in sorted(chroms)]), "")
+
     def process_cmd_output(self, out, err):
         #holds the chromosome list
         chrom_list = list()
@@ -602,6 +635,10 @@ class GetRefChroms(Module):
         super(GetRefChroms, self).__init__(module_id, is_docker)
         self.output_keys = ["chrom_list"]
 
+        # Reference index is small enough to be parsed on the controller
+        self.is_inline          = True
+        self.inline_input_key   = "ref_idx"
+
     def define_input(self):
         self.add_argument("ref_idx",    is_required=True, is_resource=True)
         self.add_argument("nr_cpus",    is_required=True, default_value=1)
@@ -616,6 +653,11 @@ class GetRefChroms(Module):
         cmd = "cut -f1 {0}".format(ref_idx)
         return cmd
 
+    def process_inline_input(self, contents):
+        # Mimic 'cut -f1'
+        lines = contents.decode("utf8").split("\n")
+        self.process_cmd_output("\n".join([line.split("\t")[0] for line in lines]), "")
+
     def process_cmd_output(self, out, err):
         #holds the chromosome list
         chrom_list = list()
@@ -635,6 +677,10 @@ class GetCellBarcodes(Module):
         super(GetCellBarcodes, self).__init__(module_id, is_docker)
         self.output_keys = ["barcode_list"]
 
+        # Barcode file is small enough to be parsed on the controller
+        self.is_inline          = True
+        self.inline_input_key   = "barcode_file"
+
     def define_input(self):
         self.add_argument("barcode_file", is_required=True)
         self.add_argument("nr_cpus",      is_required=True, default_value=1)
@@ -716,6 +762,9 @@ class ReplaceGVCFSampleName(Module):
         super(ReplaceGVCFSampleName, self).__init__(module_id, is_docker)
         self.output_keys = ["gvcf"]
 
+        self.streamable_inputs  = ["gvcf"]
+        self.streamable_outputs = ["gvcf"]
+
     def define_input(self):
         self.add_argument("barcode",      is_required=True)
         self.add_argument("gvcf",         is_required=True)
@@ -903,6 +952,8 @@ class CovertToSAM(Module):
         super(CovertToSAM, self).__init__(module_id, is_docker)
         self.output_keys = ["sam"]
 
+        self.streamable_outputs = ["sam"]
+
     def define_input(self):
         self.add_argument("bam",            is_required=True)
         self.add_argument("bam_idx",        is_required=True)
@@ -953,6 +1004,8 @@ class GetERCCReadCounts(Module):
         super(GetERCCReadCounts, self).__init__(module_id, is_docker)
         self.output_keys = ["read_counts"]
 
+        self.streamable_inputs = ["sam"]
+
     def define_input(self):
         self.add_argument("sam",                is_required=True)
         self.add_argument("nr_cpus",            is_required=True, default_value=2)
@@ -1,4 +1,5 @@
 import copy
+import math
 import os
 import logging
 
@@ -21,11 +22,12 @@ class Datastore(object):
         self.__base_wrk_dir = self.platform.wrk_dir
         self.__base_output_dir = self.platform.final_output_dir
 
-    def set_task_input_args(self, task_id):
+    def set_task_input_args(self, task_id, is_streamed=False):
         # Set input arguments for a task module
+        # Inputs of a task streamed from its parent are set while the parent is still running
 
         # Throw error if task inputs aren't ready to be set
-        if not self.graph.parents_complete(task_id):
+        if not is_streamed and not self.graph.parents_complete(task_id):
             logging.error("Cannot set arguments for task '%s' before upstream tasks have completed!" % task_id)
             raise PrematureTaskInputSetError("Cannot set task arguments before a task dependencies have completed!")
 
@@ -48,6 +50,79 @@ class Datastore(object):
         task_module.set_argument("nr_cpus", nr_cpus)
         task_module.set_argument("mem", mem)
 
+    def estimate_task_resources(self, task_id):
+        # Estimate nr_cpus, mem, and disk space a task will request before its parent tasks have finished
+        task = self.graph.get_tasks(task_id)
+        task_module = task.module
+        resources = []
+        for arg_type in ["nr_cpus", "mem"]:
+            val = self.__get_task_arg(task_id, arg_type)
+            if val is None:
+                val = task_module.get_arguments()[arg_type].get_default_value()
+            resources.append(val)
+        nr_cpus, mem = resources
+
+        # CPUs scaled to the number of task inputs can't be known until the inputs exist
+        if isinstance(nr_cpus, str):
+            if nr_cpus.isdigit():
+                nr_cpus = int(nr_cpus)
+            elif nr_cpus.lower() == "max":
+                nr_cpus = self.platform.get_max_nr_cpus()
+            else:
+                nr_cpus = 2
+        nr_cpus = min(int(nr_cpus), int(self.platform.get_max_nr_cpus()))
+
+        # Output of unfinished parents doesn't exist yet so each parent's output is assumed to be as big as its input
+        input_files = [input_file for input_file in self.get_task_pipeline_inputs(task_id) if isinstance(input_file, GAPFile)]
+        for parent_id in self.graph.get_parents(task_id):
+            if self.graph.get_tasks(parent_id).is_complete():
+                input_files.extend(self.get_task_output_files(parent_id))
+            else:
+                input_files.extend(self.get_task_input_files(parent_id))
+        input_files = [input_file for input_file in input_files if input_file.size_known()]
+
+        docker_image = None
+        if task.get_docker_image_id() is not None and self.resource_kit.has_docker_image(task.get_docker_image_id()):
+            docker_image = self.resource_kit.get_docker_images(task.get_docker_image_id())
+            if docker_image.get_size() is None:
+                docker_image = None
+
+        return nr_cpus, self.__reformat_mem(mem, nr_cpus), self.compute_disk_space(input_files, docker_image)
+
+    def compute_disk_space(self, input_files, docker_image, input_multiplier=None):
+        # Compute size of disk needed to store input/output files
+        input_size = 0
+
+        # Add size of docker image if one needs to be loaded for task
+        if docker_image is not None:
+            input_size += docker_image.get_size()
+
+        # Add sizes of each input file
+        for input_file in input_files:
+            # Overestimate for gzipped files
+            if input_file.get_path().endswith(".gz"):
+                input_size += input_file.get_size()*5
+            else:
+                input_size += input_file.get_size()
+
+        # Obtain the input multiplier if not provided
+        if input_multiplier is None:
+            input_multiplier = self.platform.config.get("input_multiplier", 5)
+
+        # Set size of desired disk
+        disk_size = int(math.ceil(input_multiplier * input_size))
+
+        # Make sure platform can create a disk that size
+        min_disk_size = self.platform.get_min_disk_space()
+        max_disk_size = self.platform.get_max_disk_space()
+
+        # Must be at least as big as minimum disk size
+        disk_size = disk_size + min_disk_size
+
+        # And smaller than max disk size
+        disk_size = min(disk_size, max_disk_size)
+        return disk_size
+
     def get_task_workspace(self, task_id=None):
         # Use task information to generate unique directories for input/output files
 
@@ -108,6 +183,22 @@ class Datastore(object):
 
         return input_files
 
+    def get_task_pipeline_inputs(self, task_id):
+        # Return resource kit files, sample files, and docker image a task would read from the pipeline inputs
+        # Returns the datastore's own objects instead of copies so their validation status can be checked
+        task = self.graph.get_tasks(task_id)
+        inputs = []
+        for input_type, input_arg in task.module.get_arguments().items():
+            possible_args = self.__gather_args(task_id, input_type)
+            val = self.__select_arg(possible_args, is_resource=input_arg.is_resource())
+            inputs.extend([input_file for input_file in flatten([val])
+                           if isinstance(input_file, GAPFile) and not input_file.is_flagged("docker")])
+
+        docker_image_id = task.get_docker_image_id()
+        if docker_image_id is not None and self.resource_kit.has_docker_image(docker_image_id):
+            inputs.append(self.resource_kit.get_docker_images(docker_image_id))
+        return inputs
+
     def get_task_output_files(self, task_id):
         # Return list of output files produced by task
         module = self.graph.get_tasks(task_id).get_module()
@@ -126,6 +217,64 @@ class Datastore(object):
         # Return actual copies so that module paths get updated as they are transferred
         return output_files
 
+    def get_tmp_output_files(self, task_id):
+        # Return output files a task saved to the tmp output dir
+        # Files a task passes along from its parents belong to the parent that produced them
+        tmp_output_dir = self.get_task_workspace().get_tmp_output_dir()
+        task_tmp_output_dir = self.get_task_workspace(task_id=task_id).get_tmp_output_dir()
+        parent_paths = self.__get_parent_output_paths(task_id)
+
+        tmp_output_files = []
+        for output_file in self.get_task_output_files(task_id):
+            path = output_file.get_transferrable_path()
+            if not path.startswith(tmp_output_dir) or path.rstrip("/") == task_tmp_output_dir.rstrip("/"):
+                continue
+            if path not in parent_paths:
+                tmp_output_files.append(output_file)
+        return tmp_output_files
+
+    def passes_parent_output(self, task_id):
+        # Determine whether any output of a task is a file it received from a parent task
+        parent_paths = self.__get_parent_output_paths(task_id)
+        return any([output_file.get_transferrable_path() in parent_paths for output_file in self.get_task_output_files(task_id)])
+
+    def count_tmp_file_consumers(self, task_id, path, finished_task_ids):
+        # Count tasks that haven't finished and read a temporary output file of a task
+        # Tasks that read the file through a task passing it along count as well
+        nr_consumers = 0
+        for child_id in self.graph.get_children(task_id):
+            if self.graph.get_tasks(child_id).is_deprecated():
+                continue
+
+            # Skip children that don't have access to file
+            if path not in [input_file.get_transferrable_path() for input_file in self.__get_parent_files(child_id, task_id)]:
+                continue
+
+            if child_id not in finished_task_ids:
+                nr_consumers += 1
+
+            if path in [output_file.get_transferrable_path() for output_file in self.get_task_output_files(child_id)]:
+                nr_consumers += self.count_tmp_file_consumers(child_id, path, finished_task_ids)
+
+        return nr_consumers
+
+    def __get_parent_output_paths(self, task_id):
+        # Return paths of every output file produced by parents of a task
+        parent_paths = set()
+        for parent_id in self.graph.get_parents(task_id):
+            parent_paths.update([output_file.get_transferrable_path() for output_file in self.get_task_output_files(parent_id)])
+        return parent_paths
+
+    def __get_parent_files(self, task_id, parent_id):
+        # Return output files a task can inherit from a parent task
+        parent = self.graph.get_tasks(parent_id)
+        if parent.is_splitter_task():
+            # Limit output to partition visible to task
+            output = parent.module.get_output(split_id=self.graph.get_tasks(task_id).get_split_id())
+        else:
+            output = parent.module.get_output()
+        return [output_file for output_file in flatten(list(output.values())) if isinstance(output_file, GAPFile)]
+
     def __get_task_arg(self, task_id, arg_type, is_resource=False):
         # Return the object that best satisfies the arg_type for a task
 
@@ -0,0 +1,79 @@
+import os
+import time
+import sqlite3
+import threading
+
+class InputCache(object):
+    # Local index of the size of pipeline input files checked by previous runs keyed by path
+    # Files are assumed not to have changed within the TTL. Changes made to a file inside the TTL aren't detected
+    # Also indexes the size of docker images by manifest digest
+
+    # Days after which sizes of docker images that haven't been used again are removed
+    MAX_AGE = 30
+
+    def __init__(self, cache_dir, ttl):
+
+        # Path to local SQLite index of input files
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        self.cache_file = os.path.join(os.path.abspath(cache_dir), "input_cache.db")
+
+        # Number of hours an input file is assumed not to have changed since it was last checked
+        self.ttl = ttl
+
+        # Index is shared by all input validation threads
+        self.cache_lock = threading.Lock()
+        self.conn = sqlite3.connect(self.cache_file, check_same_thread=False)
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS inputs ("
+                              "path TEXT PRIMARY KEY, "
+                              "size REAL NOT NULL, "
+                              "checked REAL NOT NULL)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS images ("
+                              "digest TEXT PRIMARY KEY, "
+                              "size REAL NOT NULL, "
+                              "checked REAL NOT NULL)")
+        self.evict()
+
+    def lookup(self, path):
+        # Return size (GB) of input file if it was checked within the TTL, otherwise None
+        cutoff = time.time() - self.ttl * 3600
+        with self.cache_lock:
+            row = self.conn.execute("SELECT size FROM inputs WHERE path=? AND checked>=?", (path, cutoff)).fetchone()
+        return None if row is None else row[0]
+
+    def store(self, path, size):
+        # Record size of input file that was just checked
+        with self.cache_lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO inputs (path, size, checked) VALUES (?, ?, ?)",
+                              (path, size, time.time()))
+
+    def lookup_image(self, digest):
+        # Return size (GB) of docker image with manifest digest, otherwise None
+        # Digests identify image contents so their sizes never need to be checked again
+        with self.cache_lock, self.conn:
+            row = self.conn.execute("SELECT size FROM images WHERE digest=?", (digest,)).fetchone()
+            if row is not None:
+                self.conn.execute("UPDATE images SET checked=? WHERE digest=?", (time.time(), digest))
+        return None if row is None else row[0]
+
+    def store_image(self, digest, size):
+        with self.cache_lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO images (digest, size, checked) VALUES (?, ?, ?)",
+                              (digest, size, time.time()))
+
+    def remove(self, path):
+        with self.cache_lock, self.conn:
+            self.conn.execute("DELETE FROM inputs WHERE path=?", (path,))
+
+    def evict(self):
+        # Remove entries of files that have to be checked again and images that haven't been used in a long time
+        with self.cache_lock, self.conn:
+            self.conn.execute("DELETE FROM inputs WHERE checked < ?", (time.time() - self.ttl * 3600,))
+            self.conn.execute("DELETE FROM images WHERE checked < ?", (time.time() - InputCache.MAX_AGE * 24 * 3600,))
+
+    def close(self):
+        with self.cache_lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
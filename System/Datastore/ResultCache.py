@@ -0,0 +1,200 @@
+import os
+import json
+import time
+import logging
+import sqlite3
+import hashlib
+import threading
+
+from System.Datastore import GAPFile, RunState
+
+class ResultCache(object):
+    # Local index of task outputs from previous runs keyed by everything that determines what a task produces
+
+    # Module arguments that only affect how fast a task runs, not what it produces
+    IGNORED_ARGS = ["nr_cpus", "mem"]
+
+    def __init__(self, cache_dir, max_entries=None, max_age=None):
+
+        # Path to local SQLite index of cached results
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        self.cache_file = os.path.join(os.path.abspath(cache_dir), "result_cache.db")
+
+        # Eviction limits. Max age is the number of days since an entry was last used.
+        self.max_entries    = max_entries
+        self.max_age        = max_age
+
+        # Helper used to copy cached outputs into the current pipeline's output directory
+        self.storage_helper = None
+
+        # Index is shared by all task workers
+        self.cache_lock = threading.Lock()
+        self.conn = sqlite3.connect(self.cache_file, check_same_thread=False)
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS results ("
+                              "key TEXT PRIMARY KEY, "
+                              "module TEXT NOT NULL, "
+                              "task_id TEXT NOT NULL, "
+                              "output TEXT NOT NULL, "
+                              "created REAL NOT NULL, "
+                              "last_used REAL NOT NULL)")
+        self.evict()
+
+    def set_storage_helper(self, storage_helper):
+        self.storage_helper = storage_helper
+
+    def get_key(self, task, docker_image=None):
+        # Compute key from module class, resolved arguments, docker image, and identity of input files
+        # Returns None if the identity of input files can't be determined, in which case the task isn't cached
+        module = task.get_module()
+
+        # Look up versions of all input files at once so files overwritten in place get a new key
+        input_files = [arg_file for arg_key, arg in module.get_arguments().items() if arg_key not in ResultCache.IGNORED_ARGS
+                       for arg_file in ResultCache.__get_files(arg.get_value())]
+        try:
+            versions = self.storage_helper.get_file_versions(list(set([ResultCache.__get_version_path(input_file)
+                                                                       for input_file in input_files])),
+                                                             job_name="get_versions_%s" % task.get_ID()) \
+                if len(input_files) > 0 else {}
+        except BaseException as e:
+            logging.warning("(%s) Unable to determine versions of input files! Task results won't be cached." % task.get_ID())
+            if str(e) != "":
+                logging.warning("Received the following message:\n%s" % e)
+            return None
+
+        args = {}
+        for arg_key, arg in module.get_arguments().items():
+            if arg_key not in ResultCache.IGNORED_ARGS:
+                args[arg_key] = ResultCache.__get_identity(arg.get_value(), versions)
+
+        key_data = {"module"        : ResultCache.__get_module_name(module),
+                    "args"          : args,
+                    "docker_image"  : docker_image.get_image_name() if docker_image is not None else None}
+        return hashlib.sha256(json.dumps(key_data, sort_keys=True).encode("utf8")).hexdigest()
+
+    def is_cacheable(self, task, output_files):
+        # Only tasks whose output files are all saved as final output are cached
+        # Everything else is removed along with the tmp output at the end of a run
+        if task.is_splitter_task() or task.is_merger_task():
+            return False
+        final_output_types = task.get_final_output_keys()
+        return all([output_file.get_type() in final_output_types for output_file in output_files])
+
+    def lookup(self, key):
+        # Return cached module output for key or None if there's no entry
+        with self.cache_lock:
+            row = self.conn.execute("SELECT output FROM results WHERE key=?", (key,)).fetchone()
+            if row is None:
+                return None
+            with self.conn:
+                self.conn.execute("UPDATE results SET last_used=? WHERE key=?", (time.time(), key))
+        return RunState.decode_output(row[0])
+
+    def restore(self, task_id, key, output_dir, output_files):
+        # Copy cached output files into the current output dir
+        # Returns False and drops entry from cache if cached files no longer exist
+        job_names = []
+        try:
+            for count, output_file in enumerate(output_files):
+                # Output cached by an earlier run into the same directory is already in place
+                src_path = output_file.get_transferrable_path()
+                if os.path.dirname(src_path.rstrip("/")) == output_dir.rstrip("/"):
+                    continue
+                job_name = "restore_cached_%s_%s_%s" % (task_id, output_file.get_type(), count)
+                self.storage_helper.mv(src_path, output_dir, job_name=job_name)
+                job_names.append(job_name)
+            for job_name in job_names:
+                self.storage_helper.proc.wait_process(job_name)
+
+        except BaseException as e:
+            logging.warning("(%s) Unable to restore cached output! Removing entry from result cache." % task_id)
+            if str(e) != "":
+                logging.warning("Received the following message:\n%s" % e)
+            self.remove(key)
+            return False
+
+        # Update paths to reflect new location
+        for output_file in output_files:
+            output_file.update_path(new_dir=output_dir)
+        return True
+
+    def store(self, key, task):
+        # Add output of completed task to cache
+        output = RunState.encode_output(task.module.get_output())
+        module = task.get_module()
+        now = time.time()
+        with self.cache_lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO results (key, module, task_id, output, created, last_used) "
+                              "VALUES (?, ?, ?, ?, ?, ?)",
+                              (key, ResultCache.__get_module_name(module), task.get_ID(), output, now, now))
+
+    def remove(self, key):
+        with self.cache_lock, self.conn:
+            self.conn.execute("DELETE FROM results WHERE key=?", (key,))
+
+    def invalidate(self, module_names=None):
+        # Remove all entries or only entries produced by the given modules
+        # Modules can be given by name (e.g. 'Samtools') or module and submodule name (e.g. 'Samtools.Index')
+        with self.cache_lock, self.conn:
+            if module_names is None or len(module_names) == 0:
+                count = self.conn.execute("DELETE FROM results").rowcount
+            else:
+                count = 0
+                for module_name in module_names:
+                    count += self.conn.execute("DELETE FROM results WHERE module=? OR module LIKE ?",
+                                               (module_name, "%s.%%" % module_name)).rowcount
+        logging.info("Invalidated %d entries from result cache." % count)
+
+    def evict(self):
+        # Remove entries that haven't been used recently and least recently used entries over the size limit
+        # Only index entries are removed. Files belong to the runs that created them.
+        with self.cache_lock, self.conn:
+            if self.max_age is not None:
+                cutoff = time.time() - self.max_age * 24 * 3600
+                self.conn.execute("DELETE FROM results WHERE last_used < ?", (cutoff,))
+            if self.max_entries is not None:
+                self.conn.execute("DELETE FROM results WHERE key NOT IN "
+                                  "(SELECT key FROM results ORDER BY last_used DESC LIMIT ?)", (self.max_entries,))
+
+    def close(self):
+        with self.cache_lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+    @staticmethod
+    def __get_module_name(module):
+        return "%s.%s" % (module.__class__.__module__, module.__class__.__name__)
+
+    @staticmethod
+    def __get_files(value):
+        # Return all files in an argument value
+        if isinstance(value, GAPFile):
+            return [value]
+        elif isinstance(value, (list, tuple)):
+            return [val_file for val in value for val_file in ResultCache.__get_files(val)]
+        elif isinstance(value, dict):
+            return [val_file for val in value.values() for val_file in ResultCache.__get_files(val)]
+        return []
+
+    @staticmethod
+    def __get_version_path(input_file):
+        # Files in containing directories change whenever anything in the directory changes
+        if input_file.get_containing_dir() is not None:
+            return input_file.get_containing_dir().rstrip("/") + "/"
+        return input_file.get_transferrable_path()
+
+    @staticmethod
+    def __get_identity(value, versions):
+        # Files are identified by path, size, and version, everything else by value
+        if isinstance(value, GAPFile):
+            return {"path": value.get_path(), "size": value.get_size(),
+                    "version": versions.get(ResultCache.__get_version_path(value))}
+        elif isinstance(value, (list, tuple)):
+            return [ResultCache.__get_identity(val, versions) for val in value]
+        elif isinstance(value, dict):
+            return {str(key): ResultCache.__get_identity(val, versions) for key, val in value.items()}
+        elif value is None or isinstance(value, (str, int, float, bool)):
+            return value
+        return str(value)
@@ -0,0 +1,120 @@
+import os
+import json
+import logging
+import sqlite3
+import hashlib
+from collections import OrderedDict
+
+from System.Datastore import GAPFile
+
+class RunStateError(Exception):
+    pass
+
+class RunState(object):
+    # Durable record of the tasks a pipeline has completed so a failed run can be resumed
+
+    def __init__(self, state_file, graph_config, resource_kit_config, sample_data_config, resume=False):
+
+        # Path to local SQLite database holding run state
+        self.state_file = os.path.abspath(state_file)
+
+        # Fingerprints of the configs used to detect inputs that changed between runs
+        self.fingerprints = OrderedDict()
+        for config_type, config_file in [("graph", graph_config),
+                                         ("resource_kit", resource_kit_config),
+                                         ("sample_data", sample_data_config)]:
+            with open(config_file, "rb") as fh:
+                self.fingerprints["%s_fingerprint" % config_type] = hashlib.sha1(fh.read()).hexdigest()
+
+        # Start over unless previous progress is going to be resumed
+        if not resume and os.path.exists(self.state_file):
+            logging.warning("Discarding run state from previous run: %s" % self.state_file)
+            os.remove(self.state_file)
+
+        elif resume and not os.path.exists(self.state_file):
+            logging.error("Cannot resume pipeline! Run state file '%s' does not exist!" % self.state_file)
+            raise RunStateError("Cannot resume pipeline without a run state file!")
+
+        if not os.path.isdir(os.path.dirname(self.state_file)):
+            os.makedirs(os.path.dirname(self.state_file))
+
+        self.conn = sqlite3.connect(self.state_file)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS run_info (key TEXT PRIMARY KEY, value TEXT)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS completed_tasks ("
+                          "seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+                          "task_id TEXT UNIQUE NOT NULL, "
+                          "output TEXT NOT NULL, "
+                          "split_tasks TEXT NOT NULL)")
+
+        # Outputs of completed tasks can't be re-used if the configs that produced them have changed
+        changed = []
+        for key, fingerprint in self.fingerprints.items():
+            row = self.conn.execute("SELECT value FROM run_info WHERE key=?", (key,)).fetchone()
+            if resume and (row is None or row[0] != fingerprint):
+                changed.append(key.replace("_fingerprint", ""))
+        if len(changed) > 0:
+            self.close()
+            logging.error("Cannot resume pipeline! The following configs have changed since run state '%s' was recorded: %s"
+                          % (self.state_file, ", ".join(changed)))
+            raise RunStateError("Cannot resume pipeline with configs that differ from the original run!")
+
+        with self.conn:
+            for key, fingerprint in self.fingerprints.items():
+                self.conn.execute("INSERT OR REPLACE INTO run_info (key, value) VALUES (?, ?)", (key, fingerprint))
+
+    def record_task(self, task, split_task_ids=None):
+        # Record that a task completed along with its outputs and any split tasks it created
+        output      = RunState.encode_output(task.module.get_output())
+        split_tasks = json.dumps(split_task_ids if split_task_ids is not None else [])
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO completed_tasks (task_id, output, split_tasks) VALUES (?, ?, ?)",
+                              (task.get_ID(), output, split_tasks))
+
+    def get_completed_tasks(self):
+        # Return (task_id, output, split_task_ids) for every completed task in order of completion
+        completed_tasks = []
+        for task_id, output, split_tasks in self.conn.execute(
+                "SELECT task_id, output, split_tasks FROM completed_tasks ORDER BY seq"):
+            output = RunState.decode_output(output)
+            completed_tasks.append((task_id, output, json.loads(split_tasks)))
+        return completed_tasks
+
+    def get_state_file(self):
+        return self.state_file
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    @staticmethod
+    def encode_output(output):
+        # Serialize module output to a JSON string
+        return json.dumps(RunState.__to_json(output))
+
+    @staticmethod
+    def decode_output(output_string):
+        # Re-create module output serialized by encode_output()
+        return RunState.__from_json(json.loads(output_string, object_pairs_hook=OrderedDict))
+
+    @staticmethod
+    def __to_json(value):
+        # Recursively convert module output into JSON-serializable objects
+        if isinstance(value, GAPFile):
+            return {"__gapfile__": value.to_dict()}
+        elif isinstance(value, dict):
+            return OrderedDict((key, RunState.__to_json(val)) for key, val in value.items())
+        elif isinstance(value, (list, tuple)):
+            return [RunState.__to_json(val) for val in value]
+        return value
+
+    @staticmethod
+    def __from_json(value):
+        # Recursively convert JSON objects back into module output
+        if isinstance(value, dict):
+            if "__gapfile__" in value:
+                return GAPFile.from_dict(value["__gapfile__"])
+            return OrderedDict((key, RunState.__from_json(val)) for key, val in value.items())
+        elif isinstance(value, list):
+            return [RunState.__from_json(val) for val in value]
+        return value
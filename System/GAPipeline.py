@@ -4,9 +4,10 @@ import json
 from collections import OrderedDict
 
 from System.Graph import Graph, Scheduler
-from System.Datastore import ResourceKit, SampleSet, Datastore
+from System.Datastore import ResourceKit, SampleSet, Datastore, RunState, ResultCache, InputCache
 from System.Validators import GraphValidator, InputValidator, SampleValidator
 from System.Platform import StorageHelper, DockerHelper
+from System.Workers import FunctionThread
 
 class GAPipeline(object):
 
@@ -16,7 +17,20 @@ class GAPipeline(object):
                  sample_data_config,
                  platform_config,
                  platform_module,
-                 final_output_dir):
+                 final_output_dir,
+                 dispatch_mode=Scheduler.FIFO,
+                 state_file=None,
+                 resume=False,
+                 cache_dir=None,
+                 cache_max_entries=None,
+                 cache_max_age=None,
+                 invalidate_cache=None,
+                 input_cache_ttl=None,
+                 input_cache_dir=None,
+                 max_speculative_procs=0,
+                 fuse_tasks=False,
+                 peer_transfer=False,
+                 pipelined_start=False):
 
         # GAP run id
         self.pipeline_id    = pipeline_id
@@ -33,6 +47,36 @@ class GAPipeline(object):
         # Final output directory where output is saved
         self.__final_output_dir     = final_output_dir
 
+        # Order in which the scheduler dispatches ready tasks
+        self.__dispatch_mode        = dispatch_mode
+
+        # Local file where progress is recorded and whether to pick up where a previous run left off
+        self.__state_file           = state_file
+        self.__resume               = resume
+
+        # Local directory holding the index of cached task results and cache eviction/invalidation options
+        self.__cache_dir            = cache_dir
+        self.__cache_max_entries    = cache_max_entries
+        self.__cache_max_age        = cache_max_age
+        self.__invalidate_cache     = invalidate_cache
+
+        # Hours input files checked by a previous run aren't checked again (None = always check input files)
+        # Input file index is kept with cached task results unless it has its own directory
+        self.__input_cache_ttl      = input_cache_ttl
+        self.__input_cache_dir      = input_cache_dir if input_cache_dir is not None else cache_dir
+
+        # Maximum number of processors created ahead of tasks becoming ready
+        self.__max_speculative_procs = max_speculative_procs
+
+        # Whether linear chains of tasks share a processor
+        self.__fuse_tasks           = fuse_tasks
+
+        # Whether temporary output is transferred straight from the processor that produced it
+        self.__peer_transfer        = peer_transfer
+
+        # Whether tasks start running while the inputs of other tasks are still being validated
+        self.__pipelined_start      = pipelined_start
+
         # Obtain pipeline name and append to final output dir
 
         self.graph          = None
@@ -43,6 +87,15 @@ class GAPipeline(object):
         # Create datastore from pipeline components
         self.datastore      = None
 
+        # Record of completed tasks
+        self.run_state      = None
+
+        # Results of tasks from previous runs
+        self.result_cache   = None
+
+        # Input files checked by previous runs
+        self.input_cache    = None
+
         # Task scheduler for running jobs
         self.scheduler = None
 
@@ -67,45 +120,89 @@ class GAPipeline(object):
         plat_class      = plat_module.__dict__[self.__plat_module]
         self.platform   = plat_class(self.pipeline_id, self.__platform_config, self.__final_output_dir)
 
+        # Load record of completed tasks
+        if self.__state_file is not None:
+            self.run_state = RunState(self.__state_file, self.__graph_config, self.__res_kit_config,
+                                      self.__sample_set_config, resume=self.__resume)
+
+        # Load index of cached task results
+        if self.__cache_dir is not None:
+            self.result_cache = ResultCache(self.__cache_dir,
+                                            max_entries=self.__cache_max_entries,
+                                            max_age=self.__cache_max_age)
+            if self.__invalidate_cache is not None:
+                self.result_cache.invalidate(module_names=self.__invalidate_cache)
+
+        # Load index of input files checked by previous runs
+        if self.__input_cache_ttl is not None:
+            if self.__input_cache_dir is None:
+                logging.warning("Input files can only be cached if a cache directory is provided! Checking all input files.")
+            else:
+                self.input_cache = InputCache(self.__input_cache_dir, self.__input_cache_ttl)
+
         # Create datastore and scheduler
         self.datastore = Datastore(self.graph, self.resource_kit, self.sample_data, self.platform)
-        self.scheduler = Scheduler(self.graph, self.datastore, self.platform)
+        self.scheduler = Scheduler(self.graph, self.datastore, self.platform,
+                                   dispatch_mode=self.__dispatch_mode,
+                                   run_state=self.run_state,
+                                   result_cache=self.result_cache,
+                                   max_speculative_procs=self.__max_speculative_procs,
+                                   fuse_tasks=self.__fuse_tasks,
+                                   peer_transfer=self.__peer_transfer)
 
     def validate(self):
 
+        # Validate the platform and boot the helper processor while the sample sheet and graph are validated
+        helper_launcher = FunctionThread(self.__launch_helper_processor, "Unable to validate platform and create helper processor")
+        helper_launcher.start()
+
         # Assume all validations are working
         has_errors = False
 
-        # Validate the sample set
-        sample_validator = SampleValidator(self.sample_data)
-        has_errors = sample_validator.validate() or has_errors
-        if not has_errors:
-            logging.debug("Sample sheet validated!")
-
-        # Validate the graph
-        graph_validator = GraphValidator(self.graph, self.resource_kit, self.sample_data)
-        has_errors = graph_validator.validate() or has_errors
-        if not has_errors:
-            logging.debug("Graph validated!")
-
-        # Validate the platform
-        self.platform.validate()
+        try:
+            # Validate the sample set
+            sample_validator = SampleValidator(self.sample_data)
+            has_errors = sample_validator.validate() or has_errors
+            if not has_errors:
+                logging.debug("Sample sheet validated!")
+
+            # Validate the graph
+            graph_validator = GraphValidator(self.graph, self.resource_kit, self.sample_data)
+            has_errors = graph_validator.validate() or has_errors
+            if not has_errors:
+                logging.debug("Graph validated!")
+
+        finally:
+            # Wait for the platform to be validated and the helper processor to be created
+            # Helper processor is always waited for so that it's destroyed by clean_up if there are any errors
+            helper_launcher.finalize()
 
         # Stop the pipeline before launching if there are any errors
         if has_errors:
             raise SystemError("One or more errors have been encountered during validation. "
                               "See the above logs for more information")
 
-        # Create helper processor and storage/docker helpers for checking input files
-        self.helper_processor   = self.platform.get_helper_processor()
-        self.helper_processor.create()
-
+        # Create storage/docker helpers for checking input files
         self.storage_helper     = StorageHelper(self.helper_processor)
-        self.docker_helper      = DockerHelper(self.helper_processor)
+        self.docker_helper      = DockerHelper(self.helper_processor, image_cache=self.input_cache)
+
+        # Cached results are copied into pipeline output dir by the helper processor
+        if self.result_cache is not None:
+            self.result_cache.set_storage_helper(self.storage_helper)
+
+        # Tasks without a command are finished by the helper processor instead of their own processor
+        self.scheduler.set_storage_helper(self.storage_helper)
 
         # Validate all pipeline inputs can be found on platform
-        input_validator = InputValidator(self.resource_kit, self.sample_data, self.storage_helper, self.docker_helper)
-        has_errors = input_validator.validate() or has_errors
+        input_validator = InputValidator(self.resource_kit, self.sample_data, self.storage_helper, self.docker_helper,
+                                         input_cache=self.input_cache,
+                                         on_validated=self.scheduler.notify_inputs_validated if self.__pipelined_start else None)
+        if self.__pipelined_start:
+            # Tasks are launched as their inputs are validated and invalid inputs stop the pipeline once they're found
+            input_validator.validate_in_background()
+            self.scheduler.set_input_validator(input_validator)
+        else:
+            has_errors = input_validator.validate() or has_errors
 
         # Stop the pipeline if there are any errors
         if has_errors:
@@ -118,9 +215,18 @@ class GAPipeline(object):
             self.storage_helper.mkdir(dir_path=str(dir_path), job_name="mkdir_%s" % dir_type, wait=True)
         logging.info("CloudCounductor run validated! Beginning pipeline execution.")
 
+    def __launch_helper_processor(self):
+        # Validate the platform
+        self.platform.validate()
+
+        # Create helper processor once the platform has determined the minimum processor size
+        self.helper_processor   = self.platform.get_helper_processor()
+        self.helper_processor.create()
+
     def run(self, rm_tmp_output_on_success=True):
         # Run until all tasks are complete
-        self.scheduler.run()
+        # Temporary files are deleted as soon as they're no longer needed unless they're being kept
+        self.scheduler.run(resume=self.__resume, rm_tmp_output=rm_tmp_output_on_success)
 
         # Remove temporary output on success
         if rm_tmp_output_on_success:
@@ -133,7 +239,11 @@ class GAPipeline(object):
                     logging.error("Received the following err message:\n%s" % e)
 
     def save_progress(self):
-        pass
+        # Task completions are recorded as they happen so just make sure the run state is closed
+        if self.run_state is not None:
+            self.run_state.close()
+            logging.info("Pipeline progress saved to '%s'. Re-run with --resume to skip completed tasks."
+                         % self.run_state.get_state_file())
 
     def publish_report(self, err=False, err_msg=None, git_version=None):
         # Create and publish GAP pipeline report
@@ -161,6 +271,19 @@ class GAPipeline(object):
         # Cleaning up the platform (let the platform decide what that means)
         if self.platform is not None:
             self.platform.clean_up()
+            self.platform.remove_peer_key()
+
+        # Close record of completed tasks
+        if self.run_state is not None:
+            self.run_state.close()
+
+        # Close index of cached results
+        if self.result_cache is not None:
+            self.result_cache.close()
+
+        # Close index of checked input files
+        if self.input_cache is not None:
+            self.input_cache.close()
 
     def __make_pipeline_report(self, err, err_msg, git_version):
 
@@ -208,6 +331,13 @@ class GAPipeline(object):
                             # OR file is temporary output file but pipeline failed
                             report.register_output_file(task_name, file_type, file_path, file_size, is_final_output)
 
+        # Register time processors spent idle waiting to be re-used by another task
+        if self.platform is not None and self.platform.get_idle_processor_ttl() > 0:
+            report.register_task(task_name="IdleProcessors",
+                                 start_time=None,
+                                 run_time=self.platform.get_idle_runtime(),
+                                 cost=self.platform.get_idle_cost())
+
         return report
 
 
@@ -1,5 +1,5 @@
 import logging
-from collections import OrderedDict
+from collections import OrderedDict, deque
 
 from Config import ConfigParser
 from System.Graph import Task
@@ -16,6 +16,9 @@ class Graph(object):
         # Generate graph
         self.tasks, self.adj_list = self.__generate_graph()
 
+        # Index graph for constant-time lookup of children, parent completion, and runnable tasks
+        self.children, self.incomplete_parents, self.unfinished, self.ready = self.__index_graph()
+
         # Check validity of adjacency list
         self.__check_adjacency_list()
 
@@ -29,8 +32,16 @@ class Graph(object):
             raise RuntimeError("Cannot add task with duplicate ID to graph!")
 
         # Add new node to nodelist
-        self.tasks[task.get_ID()] = task
-        self.adj_list[task.get_ID()] = []
+        task_id = task.get_ID()
+        self.tasks[task_id] = task
+        self.adj_list[task_id] = []
+
+        # Add new node to graph indices
+        self.children[task_id] = set()
+        self.incomplete_parents[task_id] = 0
+        if not task.is_complete():
+            self.unfinished.add(task_id)
+        self.__update_ready(task_id)
 
     def remove_task(self, task_id):
         # Remove node and all edges from Graph
@@ -38,14 +49,26 @@ class Graph(object):
             logging.error("Attempt to remove non-existant task from Graph: %s" % task_id)
             raise RuntimeError("Graph Error: Attempt to remove non-existant task from graph!")
 
-        # Remove node from vertice list
+        # Remove edges to children. Children no longer have to wait for the removed task.
+        is_complete = self.tasks[task_id].is_complete()
+        for child_id in self.children[task_id]:
+            while task_id in self.adj_list[child_id]:
+                self.adj_list[child_id].remove(task_id)
+                if not is_complete:
+                    self.incomplete_parents[child_id] -= 1
+            self.__update_ready(child_id)
+
+        # Remove edges from parents
+        for parent_id in set(self.adj_list[task_id]):
+            self.children[parent_id].discard(task_id)
+
+        # Remove node from vertice list and indices
         self.tasks.pop(task_id)
         self.adj_list.pop(task_id)
-
-        # Remove all references to node in adjacency list
-        for adj_list in self.adj_list.values():
-            if task_id in adj_list:
-                adj_list.remove(task_id)
+        self.children.pop(task_id)
+        self.incomplete_parents.pop(task_id)
+        self.unfinished.discard(task_id)
+        self.ready.pop(task_id, None)
 
     def add_dependency(self, child_task_id, parent_task_id):
         # Adds dependency where dep_nod_id must wait until ind_node_id is finished
@@ -58,6 +81,33 @@ class Graph(object):
 
         # Add dependency
         self.adj_list[child_task_id].append(parent_task_id)
+        self.children[parent_task_id].add(child_task_id)
+
+        # Child can't be run until the new parent has completed
+        if not self.tasks[parent_task_id].is_complete():
+            self.incomplete_parents[child_task_id] += 1
+            self.ready.pop(child_task_id, None)
+
+    def mark_task_complete(self, task_id):
+        # Set task to complete and release any children that were only waiting on this task
+        task = self.tasks[task_id]
+        if task.is_complete():
+            return
+
+        task.set_complete(True)
+        self.unfinished.discard(task_id)
+        self.ready.pop(task_id, None)
+
+        for child_id in self.children[task_id]:
+            self.incomplete_parents[child_id] -= self.adj_list[child_id].count(task_id)
+            self.__update_ready(child_id)
+
+    def pop_ready_tasks(self):
+        # Return tasks that can be run right now and remove them from the ready set
+        ready_tasks = [self.tasks[task_id] for task_id in self.ready
+                       if not self.tasks[task_id].is_deprecated() and not self.tasks[task_id].is_complete()]
+        self.ready.clear()
+        return ready_tasks
 
     def get_tasks(self, task_id=None):
         if task_id is None:
@@ -65,17 +115,13 @@ class Graph(object):
         return self.tasks[task_id]
 
     def get_unfinished_tasks(self):
-        return [task for task in list(self.tasks.values()) if not task.is_complete()]
+        return [self.tasks[task_id] for task_id in self.unfinished]
 
     def get_children(self, task_id):
         if task_id not in self.tasks:
             logging.error("Cannot list children for non-existant task: %s" % task_id)
             raise RuntimeError("Graph Error: Attempt to get children from nonexistant task!")
-        dependents = []
-        for task, edges in self.adj_list.items():
-            if task_id in edges:
-                dependents.append(task)
-        return dependents
+        return list(self.children[task_id])
 
     def get_parents(self, task_id):
         if task_id not in self.tasks:
@@ -84,17 +130,48 @@ class Graph(object):
         return [x for x in self.adj_list[task_id]]
 
     def is_complete(self):
-        return len(self.get_unfinished_tasks()) < 1
+        return len(self.unfinished) < 1
 
     def parents_complete(self, task_id):
         # Determine if all task parents have completed
-        parents = self.get_parents(task_id)
-        return len(parents) == len([x for x in parents if self.get_tasks(x).is_complete()])
+        return self.incomplete_parents[task_id] == 0
+
+    def get_critical_path_lengths(self):
+        # Compute the expected runtime of the longest chain of unfinished tasks starting at each unfinished task
+        # Tasks are visited in reverse topological order so every child is scored before its parents
+        remaining_children  = {task_id: 0 for task_id in self.unfinished}
+        for task_id in self.unfinished:
+            for parent_id in set(self.adj_list[task_id]):
+                if parent_id in remaining_children:
+                    remaining_children[parent_id] += 1
+
+        to_visit    = deque(task_id for task_id, count in remaining_children.items() if count == 0)
+        cp_lengths  = {}
+        while len(to_visit) > 0:
+            task_id = to_visit.popleft()
+            task    = self.tasks[task_id]
+
+            # Deprecated tasks never run so they don't add to the length of the path
+            longest_child = max([cp_lengths.get(child_id, 0) for child_id in self.children[task_id]], default=0)
+            cp_lengths[task_id] = longest_child if task.is_deprecated() else longest_child + task.get_runtime_estimate()
+
+            for parent_id in set(self.adj_list[task_id]):
+                if parent_id in remaining_children:
+                    remaining_children[parent_id] -= 1
+                    if remaining_children[parent_id] == 0:
+                        to_visit.append(parent_id)
+
+        return cp_lengths
 
     def split_graph(self, splitter_task_id):
         # Recursively split tasks downstream of 'head_task' until a closing merge is reached
         child_tasks = self.get_children(splitter_task_id)
         splitter_task = self.tasks[splitter_task_id]
+
+        # Tasks created and tasks deprecated by this split
+        split_task_ids = set()
+        deprecated_task_ids = OrderedDict()
+
         for split_id in splitter_task.module.get_output():
             # Create new graph partition for each new split
             split = splitter_task.module.get_output(split_id=split_id)
@@ -102,11 +179,13 @@ class Graph(object):
             # If no visible samples declared, split nodes inherit visible samples from splitter task
             visible_samples = split["visible_samples"] if split["visible_samples"] is not None else splitter_task.get_visible_samples()
             for child_task in child_tasks:
-                child_split = self.__split_subgraph(child_task, splitter_task_id, split_id, visible_samples)
+                child_split = self.__split_subgraph(child_task, splitter_task_id, split_id, visible_samples,
+                                                    split_task_ids=split_task_ids,
+                                                    deprecated_task_ids=deprecated_task_ids)
                 self.add_dependency(child_split, splitter_task_id)
 
         # Loop through deprecated tasks and give upstream dependencies for parent tasks that weren't in splitter's subtree
-        for task in self.__deprecated_tasks:
+        for task in deprecated_task_ids:
             # Get parents of deprecated task
             parents = self.get_parents(task)
             for parent in parents:
@@ -114,22 +193,24 @@ class Graph(object):
                 # Add that dependency for all a tasks's newly created daughter splits
                 if not self.tasks[parent].is_deprecated() and parent != splitter_task_id:
                     for clone_task_id in self.tasks[task].get_clones():
-                        if parent not in self.get_parents(clone_task_id):
+                        if parent not in self.adj_list[clone_task_id]:
                             self.add_dependency(clone_task_id, parent)
 
             # Remove deprecated task from graph completely
             #self.remove_task(task)
 
             # Set deprecated task to complete so it doesn't get run
-            self.tasks[task].set_complete(is_complete=True)
+            self.mark_task_complete(task)
 
-            # Make sure graph structure is still valid
-            self.__check_adjacency_list()
-            self.__check_cycles()
+        # Make sure graph structure is still valid
+        # Only new split tasks and the tasks they feed into can have gained edges
+        changed_task_ids = set(split_task_ids)
+        for task_id in split_task_ids:
+            changed_task_ids.update(self.children[task_id])
+        self.__check_adjacency_list(runtime=True, task_ids=changed_task_ids)
+        self.__check_cycles(runtime=True, task_ids=split_task_ids)
 
-    @property
-    def __deprecated_tasks(self):
-        return [task.get_ID() for task in list(self.tasks.values()) if task.is_deprecated()]
+        return sorted(split_task_ids)
 
     def __generate_graph(self):
 
@@ -143,9 +224,44 @@ class Graph(object):
 
         return tasks, adj_list
 
-    def __check_adjacency_list(self, runtime=False):
+    def __index_graph(self):
+        # Build child sets, counts of incomplete parents, and the ready set from the adjacency list
+        children            = OrderedDict((task_id, set()) for task_id in self.tasks)
+        incomplete_parents  = OrderedDict((task_id, 0) for task_id in self.tasks)
+        unfinished          = set()
+        ready               = OrderedDict()
+
+        for task_id, parents in self.adj_list.items():
+            for parent_id in parents:
+                # Edges to undeclared tasks are reported by __check_adjacency_list
+                if parent_id not in self.tasks:
+                    continue
+                children[parent_id].add(task_id)
+                if not self.tasks[parent_id].is_complete():
+                    incomplete_parents[task_id] += 1
+
+        for task_id, task in self.tasks.items():
+            if not task.is_complete():
+                unfinished.add(task_id)
+                if incomplete_parents[task_id] == 0:
+                    ready[task_id] = True
+
+        return children, incomplete_parents, unfinished, ready
+
+    def __update_ready(self, task_id):
+        # Add task to ready set if it can be run, otherwise make sure it isn't in the ready set
+        task = self.tasks[task_id]
+        if self.incomplete_parents[task_id] == 0 and not task.is_complete() and not task.is_deprecated():
+            self.ready[task_id] = True
+        else:
+            self.ready.pop(task_id, None)
+
+    def __check_adjacency_list(self, runtime=False, task_ids=None):
+        # Check the inputs of every task or only the inputs of 'task_ids'
+        task_ids = self.adj_list.keys() if task_ids is None else task_ids
         errors = False
-        for task, adj_tasks in self.adj_list.items():
+        for task in task_ids:
+            adj_tasks = self.adj_list[task]
 
             # Enforce uniqueness of task inputs. Duplicate entries are probably a mistake so better to just throw error
             if len(adj_tasks) != len(set(adj_tasks)):
@@ -168,9 +284,13 @@ class Graph(object):
             else:
                 raise RuntimeError("Runtime graph alteration resulted in invalid graph!")
 
-    def __split_subgraph(self, task_id, splitter_task_id, split_id, visible_samples, level=1, split_task_ids=[]):
+    def __split_subgraph(self, task_id, splitter_task_id, split_id, visible_samples, level=1, split_task_ids=None, deprecated_task_ids=None):
         # Recursively split subgraph that depends on 'task'
 
+        # Tasks created and deprecated so far by the current split
+        split_task_ids = set() if split_task_ids is None else split_task_ids
+        deprecated_task_ids = OrderedDict() if deprecated_task_ids is None else deprecated_task_ids
+
         task = self.tasks[task_id]
 
         if task.is_merger_task():
@@ -192,6 +312,7 @@ class Graph(object):
         # Can happen if two tasks in split subtree have same child
         if split_task.get_ID() in split_task_ids:
             task.deprecate()
+            deprecated_task_ids[task_id] = True
             return split_task.get_ID()
 
         # Add newly created task to existing graph and clone parental dependencies
@@ -199,57 +320,67 @@ class Graph(object):
 
         # Mark original task as deprecated so it can be discarded
         task.deprecate()
+        deprecated_task_ids[task_id] = True
 
         # Add new task ID to list of ids in current split
-        split_task_ids.append(split_task.get_ID())
+        split_task_ids.add(split_task.get_ID())
 
         # Create dependencies between current task and splits created for each child task
         child_tasks = self.get_children(task_id)
         for child_task in child_tasks:
             # Split each child subgraph
-            child_split = self.__split_subgraph(child_task, splitter_task_id, split_id, visible_samples, level, split_task_ids)
+            child_split = self.__split_subgraph(child_task, splitter_task_id, split_id, visible_samples, level,
+                                                split_task_ids, deprecated_task_ids)
             # Connect task to split child subgraph
             self.add_dependency(child_split, split_task.get_ID())
 
         # Return split task
         return split_task.get_ID()
 
-    def __check_cycles(self, runtime=False):
-        # Taken with modification from https://www.geeksforgeeks.org/detect-cycle-in-a-graph/
-        cycle = False
-        visited = []
-        recStack = []
-        for task_id in list(self.tasks.keys()):
-            if task_id not in visited:
-                if self.__is_cycle(task_id, visited, recStack):
-                    cycle = True
-        if cycle:
+    def __check_cycles(self, runtime=False, task_ids=None):
+        # Kahn's algorithm. A cycle exists iff some tasks can never reach zero in-degree.
+        # If 'task_ids' is given, only check the part of the graph reachable from those tasks.
+        # Any cycle through a new edge must pass through one of those tasks, so this is sufficient after a split.
+        if task_ids is None:
+            subgraph = set(self.tasks)
+        else:
+            subgraph = set()
+            to_visit = deque(task_ids)
+            while to_visit:
+                task_id = to_visit.popleft()
+                if task_id in subgraph:
+                    continue
+                subgraph.add(task_id)
+                to_visit.extend(self.children[task_id])
+
+        # Count incoming edges from within the subgraph
+        in_degree = {task_id: 0 for task_id in subgraph}
+        for task_id in subgraph:
+            for child_id in self.children[task_id]:
+                if child_id in subgraph:
+                    in_degree[child_id] += 1
+
+        # Remove tasks without incoming edges until none are left
+        to_visit = deque([task_id for task_id, degree in in_degree.items() if degree == 0])
+        num_visited = 0
+        while to_visit:
+            task_id = to_visit.popleft()
+            num_visited += 1
+            for child_id in self.children[task_id]:
+                if child_id in subgraph:
+                    in_degree[child_id] -= 1
+                    if in_degree[child_id] == 0:
+                        to_visit.append(child_id)
+
+        if num_visited < len(subgraph):
+            cycle_tasks = sorted([task_id for task_id, degree in in_degree.items() if degree > 0])
+            logging.error("Incorrect pipeline graph: Cycle detected that includes one or more of the following tasks: %s!"
+                          % ", ".join(cycle_tasks))
             if not runtime:
                 raise IOError("Incorrect pipeline graph: Cycle detected!")
             else:
                 raise RuntimeError("Runtime graph alteration resulted in invalid graph: Cycle detected!")
 
-    def __is_cycle(self, task_id, visited, recStack):
-
-        # Mark current task as visited
-        visited.append(task_id)
-        # Add current task to current recursion stack
-        recStack.append(task_id)
-
-        # Check if any subgraph of current task contains a cycle
-        neighbors = self.get_children(task_id)
-        for neighbor_id in neighbors:
-            if neighbor_id not in visited:
-                if self.__is_cycle(neighbor_id, visited, recStack):
-                    return True
-            elif neighbor_id in recStack:
-                logging.error("Incorrect pipeline graph: Cycle detected that includes task '%s'!" % task_id)
-                return True
-
-        # Pop current task from recursion stack
-        recStack.remove(task_id)
-        return False
-
     def __str__(self):
         to_ret = ""
         for task_id, task in self.tasks.items():
@@ -1,11 +1,28 @@
 import logging
 import os
+import time
 
 from System.Platform import StorageHelper, DockerHelper, Platform
 
 class ModuleExecutor(object):
 
-    def __init__(self, task_id, processor, workspace, docker_image=None):
+    # Where processors keep the key used to authenticate with processors serving files
+    PEER_KEY_FILE = "$HOME/.ssh/cc_peer_key"
+
+    # Limits on the number of input files transferred at the same time (scaled with processor CPUs)
+    MIN_CONCURRENT_TRANSFERS = 2
+    MAX_CONCURRENT_TRANSFERS = 16
+
+    # GB of input that can be transferred at the same time per GB of processor memory
+    TRANSFER_GB_PER_MEM_GB = 4
+
+    # Seconds between checks for finished input transfers
+    TRANSFER_POLL_INTERVAL = 1
+
+    # Minimum number of files going to the same directory that are transferred with a single bulk command
+    MIN_BULK_TRANSFER_FILES = 8
+
+    def __init__(self, task_id, processor, workspace, docker_image=None, local_files=None):
         self.task_id        = task_id
         self.processor      = processor
         self.workspace      = workspace
@@ -13,14 +30,35 @@ class ModuleExecutor(object):
         self.docker_helper  = DockerHelper(self.processor)
         self.docker_image   = docker_image
 
+        # Files left on processor by the previous task (remote path -> local path) that can be used instead of
+        # downloading input, and the copies of output files kept on the processor after they've been saved
+        self.local_files    = local_files or {}
+        self.saved_files    = {}
+
+        # Temporary output files kept on the processor instead of being uploaded: remote path -> (local path, remote dir)
+        self.served_files   = {}
+
+        # Jobs writing input files into named pipes read by the task's command: job name -> pipe path
+        self.input_streams  = {}
+
         # Create workspace directory structure
         self.__create_workspace()
 
-    def load_input(self, inputs):
+    def load_input(self, inputs, peer_files=None, peer_key_file=None, streamed_paths=None):
+        # Peer files (remote path -> (processor address, local path)) are transferred from the processor serving them
+        # Peer key file is the controller's copy of the private key used to authenticate with serving processors
+        # Streamed paths are remote inputs written into named pipes while the command runs instead of being downloaded
+        streamed_paths = streamed_paths or set()
+        streams = []
 
         # List of jobs that have been started in process of loading input
         job_names = []
 
+        # Install key used to authenticate with processors serving files
+        peer_files = peer_files or {}
+        if len(peer_files) > 0:
+            self.__install_peer_key(peer_key_file)
+
         # Pull docker image if necessary
         if self.docker_image is not None:
             docker_image_name = self.docker_image.get_image_name().split("/")[0]
@@ -34,10 +72,23 @@ class ModuleExecutor(object):
         src_seen = []
         dest_seen = []
         count = 1
-        batch_size = 5
-        loading_counter = 0
+
+        # Remote input transfers that are started once every input has a destination: (size, job name, src, transfer)
+        transfers = []
         for task_input in inputs:
 
+            # Move intermediate files left on processor by the task fused before this one into workspace
+            if task_input.is_flagged("fused"):
+                job_name = "load_input_%s_%s_%s" % (self.task_id, task_input.get_type(), count)
+                self.storage_helper.mv(src_path=task_input.get_transferrable_path(),
+                                       dest_path=self.workspace.get_wrk_dir(),
+                                       job_name=job_name)
+                job_names.append(job_name)
+                count += 1
+                task_input.update_path(new_dir=self.workspace.get_wrk_dir())
+                task_input.unflag("fused")
+                continue
+
             # Don't transfer local files
             if ":" not in task_input.get_path():
                 continue
@@ -52,8 +103,12 @@ class ModuleExecutor(object):
             if task_input.get_transferrable_path() not in src_seen:
 
                 # Get name of file that's going to be transferred
+                # Use copy already on the processor if there is one
                 src_path = task_input.get_transferrable_path()
                 job_name = "load_input_%s_%s_%s" % (self.task_id, task_input.get_type(), count)
+                if src_path in self.local_files:
+                    logging.debug("(%s) Input '%s' is already on processor!" % (self.task_id, src_path))
+                    src_path = self.local_files.pop(src_path)
                 logging.debug("Input path: %s, transfer path: %s" % (task_input.get_path(), src_path))
 
                 # Generate complete transfer path
@@ -75,40 +130,96 @@ class ModuleExecutor(object):
                 # Show the final log file
                 logging.debug("Destination: {0}".format(dest_path))
 
+                # Stream file into named pipe once command starts reading it
+                # Streamed files are never downloaded as the processor's disk was sized without them
+                if src_path in streamed_paths:
+                    pipe_path = os.path.join(dest_dir, dest_filename or task_input.filename)
+                    job_name = "stream_input_%s_%s_%s" % (self.task_id, task_input.get_type(), count)
+                    streams.append((src_path, pipe_path, job_name))
+
                 # Move file to dest_path
-                self.storage_helper.mv(src_path=src_path,
-                                       dest_path=dest_path,
-                                       job_name=job_name)
-                loading_counter += 1
-                
+                elif src_path in peer_files:
+                    logging.debug("(%s) Transferring input '%s' from processor serving it." % (self.task_id, src_path))
+                    transfer = dict(src_address=peer_files[src_path][0],
+                                    src_path=peer_files[src_path][1],
+                                    dest_path=dest_path,
+                                    key_file=ModuleExecutor.PEER_KEY_FILE,
+                                    job_name=job_name)
+                    transfers.append((task_input.get_size() or 0, job_name, src_path, transfer))
+                else:
+                    transfer = dict(src_path=src_path,
+                                    dest_path=dest_path,
+                                    job_name=job_name)
+                    transfers.append((task_input.get_size() or 0, job_name, src_path, transfer))
+
                 # Add transfer path to list of remote paths that have been transferred to local workspace
-                src_seen.append(src_path)
+                src_seen.append(task_input.get_transferrable_path())
                 count += 1
-                job_names.append(job_name)
-                
-                # If loading_counter is batch_size, clear out queue
-                if loading_counter >= batch_size:
-                    logging.debug("Batch size reached on task {0}".format(
-                        self.task_id))
-                    # Wait for all processes to finish
-                    while len(job_names):
-                        self.processor.wait_process(job_names.pop())
-                    loading_counter = 0
 
             # Update path after transferring to wrk directory and add to list of files in working directory
             task_input.update_path(new_dir=dest_dir, new_filename=dest_filename)
             dest_seen.append(task_input.get_path())
             logging.debug("Updated path: %s" % task_input.get_path())
 
+        # Transfer remote input
+        self.__transfer_input(transfers)
+
         # Wait for all processes to finish
         for job_name in job_names:
             self.processor.wait_process(job_name)
 
+        # Remove files left by the previous task that weren't needed
+        self.__remove_local_files()
+
         # Recursively give every permission to all files we just added
         logging.info("(%s) Final workspace perm. update for task '%s'..." % (self.processor.name, self.task_id))
         self.__grant_workspace_perms(job_name="grant_final_wrkspace_perms")
 
-    def run(self, cmd, job_name=None):
+        # Start writing streamed input into pipes. Writing starts once the command opens them.
+        if len(streams) > 0:
+            cmd = " && ".join(["sudo mkfifo -m 777 %s" % pipe_path for _, pipe_path, _ in streams])
+            self.processor.run(job_name="make_input_pipes", cmd=cmd)
+            self.processor.wait_process("make_input_pipes")
+        for src_path, pipe_path, job_name in streams:
+            logging.debug("(%s) Streaming input '%s' through pipe '%s'." % (self.task_id, src_path, pipe_path))
+            self.storage_helper.stream(src_path, pipe_path, job_name=job_name, num_retries=0)
+            self.input_streams[job_name] = pipe_path
+
+    def has_input_streams(self):
+        # Determine whether any input is being streamed into the command
+        return len(self.input_streams) > 0
+
+    def wait_input_streams(self):
+        # Wait for streamed input to be read in full. Raises an error if any input wasn't streamed in full.
+        input_streams = self.input_streams
+        self.input_streams = {}
+        for job_name in input_streams:
+            self.processor.wait_process(job_name)
+
+    def close_input_streams(self):
+        # Stop streaming input a command didn't finish reading so streaming jobs don't wait for it forever
+        if len(self.input_streams) == 0:
+            return
+        input_streams = self.input_streams
+        self.input_streams = {}
+        try:
+            cmd = " ; ".join(["sudo timeout 5 sh -c 'cat %s > /dev/null' || true" % pipe_path
+                              for pipe_path in input_streams.values()])
+            self.processor.run(job_name="close_input_streams", cmd=cmd, num_retries=0)
+            self.processor.wait_process("close_input_streams")
+        except BaseException as e:
+            logging.warning("(%s) Unable to stop streaming input!" % self.task_id)
+            if str(e) != "":
+                logging.warning("Received the following message:\n%s" % e)
+
+        # Streaming jobs fail once pipes are closed
+        for job_name in input_streams:
+            try:
+                self.processor.wait_process(job_name)
+            except BaseException:
+                pass
+
+    def run(self, cmd, job_name=None, num_retries=None, wait=True):
 
         # Check or create job name
         if job_name is None:
@@ -118,17 +229,22 @@ class ModuleExecutor(object):
         docker_image_name = None if self.docker_image is None else self.docker_image.get_image_name()
 
         # Begin running job and return stdout, stderr after job has finished running
-        self.processor.run(job_name, cmd, docker_image=docker_image_name)
-        return self.processor.wait_process(job_name)
+        self.processor.run(job_name, cmd, num_retries=num_retries, docker_image=docker_image_name)
+        if wait:
+            return self.processor.wait_process(job_name)
 
-    def save_output(self, outputs, final_output_types):
+    def save_output(self, outputs, final_output_types, keep_tmp_output=False, serve_tmp_output=False):
         # Return output files to workspace output dir
+        # Temporary output can be kept on the processor for a task fused after this one
+        # or served to the processors of tasks that read it and only uploaded if the processor is destroyed
 
         # Get workspace places for output files
         final_output_dir = self.workspace.get_output_dir()
         tmp_output_dir = self.workspace.get_tmp_output_dir()
         count = 1
-        job_names = []
+
+        # Output files to transfer: (src path, dest dir, job name)
+        transfers = []
 
         # List of output file paths. We create this list to ensure the files are not being overwritten
         output_filepaths = []
@@ -144,6 +260,12 @@ class ModuleExecutor(object):
             file_size = self.storage_helper.get_file_size(output_file.get_path(), job_name=job_name)
             output_file.set_size(file_size)
 
+            # Leave temporary output on processor
+            if keep_tmp_output and dest_dir == tmp_output_dir:
+                output_file.flag("fused")
+                count += 1
+                continue
+
             # Check if there already exists a file with the same name on the bucket
             destination_path = "{0}/{1}/".format(dest_dir.rstrip("/"), output_file.get_filename())
             if destination_path in output_filepaths:
@@ -161,22 +283,33 @@ class ModuleExecutor(object):
                 # Just add the new path to the list of output file paths
                 output_filepaths.append(destination_path)
 
+            # Keep temporary output on processor to serve it
+            curr_path = output_file.get_transferrable_path()
+            if serve_tmp_output and dest_dir != final_output_dir and curr_path.startswith(self.workspace.get_wrk_out_dir()):
+                output_file.update_path(new_dir=dest_dir)
+                self.served_files[output_file.get_transferrable_path()] = (curr_path, dest_dir)
+                logging.debug("(%s) Serving file '%s' from processor as '%s'"
+                              % (self.task_id, curr_path, output_file.get_transferrable_path()))
+                count += 1
+                continue
+
             # Transfer to correct output directory
             job_name = "save_output_%s_%s_%s" % (self.task_id, output_file.get_type(), count)
-            curr_path = output_file.get_transferrable_path()
-            self.storage_helper.mv(curr_path, dest_dir, job_name=job_name)
+            transfers.append((curr_path, dest_dir, job_name))
 
             # Update path of output file to reflect new location
-            job_names.append(job_name)
             output_file.update_path(new_dir=dest_dir)
+
+            # Files copied to remote storage from the output dir are also still on the processor
+            if ":" in dest_dir and curr_path.startswith(self.workspace.get_wrk_out_dir()):
+                self.saved_files[output_file.get_transferrable_path()] = curr_path
             logging.debug("(%s) Transferring file '%s' from old path '%s' to new path '%s' ('%s')" % (
                 self.task_id, output_file.get_type(), curr_path, output_file.get_path(), output_file.get_transferrable_path()))
 
             count += 1
 
         # Wait for transfers to complete
-        for job_name in job_names:
-            self.processor.wait_process(job_name)
+        self.__move_files(transfers, job_prefix="save_output_%s" % self.task_id)
 
         # Wait for output files to finish transferring
         self.processor.wait()
@@ -187,6 +320,162 @@ class ModuleExecutor(object):
         final_log_dir = self.workspace.get_final_log_dir()
         self.storage_helper.mv(log_files, final_log_dir, job_name="return_logs", log=False, wait=True)
 
+    def get_saved_files(self):
+        # Return output files that have been saved but are still on the processor (remote path -> local path)
+        return self.saved_files
+
+    def get_served_files(self):
+        # Return output files that are being served instead of being saved (remote path -> local path)
+        return {remote_path: local_path for remote_path, (local_path, _) in self.served_files.items()}
+
+    def serve_files(self, peer_key):
+        # Allow processors holding the peer key to transfer served files from processor
+        cmd = "mkdir -p $HOME/.ssh && (grep -qxF '{0}' $HOME/.ssh/authorized_keys || echo '{0}' >> $HOME/.ssh/authorized_keys)"
+        self.processor.run(job_name="authorize_peer_key", cmd=cmd.format(peer_key))
+        self.processor.wait_process("authorize_peer_key")
+
+    def upload_served_files(self, remote_paths=None):
+        # Upload served files to the remote paths tasks will read them from once processor is gone
+        # Optionally only upload a subset of served files (e.g. files nothing needs anymore are skipped)
+        if remote_paths is None:
+            remote_paths = list(self.served_files)
+        transfers = []
+        served_files = [(path, self.served_files[path]) for path in remote_paths if path in self.served_files]
+        for count, (remote_path, (local_path, dest_dir)) in enumerate(served_files):
+            transfers.append((local_path, dest_dir, "upload_served_%s_%s" % (self.task_id, count)))
+        self.__move_files(transfers, job_prefix="upload_served_%s" % self.task_id, log=False)
+        self.served_files = {}
+
+    def clean_workspace(self, keep_output=False):
+        # Remove task working directory so processor can be re-used by another task
+        # Optionally keep the output dir so output can be used by the next task on the processor
+        self.__remove_local_files()
+        if keep_output:
+            cmd = "sudo find %s -mindepth 1 -maxdepth 1 ! -path %s -exec rm -rf {} +" % \
+                  (self.workspace.get_wrk_dir(), self.workspace.get_wrk_out_dir().rstrip("/"))
+        else:
+            cmd = "sudo rm -rf %s" % self.workspace.get_wrk_dir()
+        self.processor.run(job_name="clean_wrkspace", cmd=cmd)
+        self.processor.wait_process("clean_wrkspace")
+
+    def set_processor_dirs(self):
+        # Point processor at task workspace so commands are mounted/logged in the right place
+        # Needed when commands of more than one task are run on the processor at the same time
+        self.processor.set_wrk_dir(self.workspace.get_wrk_dir())
+        self.processor.set_wrk_out_dir(self.workspace.get_wrk_out_dir())
+        self.processor.set_log_dir(self.workspace.get_wrk_log_dir())
+
+    def __move_files(self, transfers, job_prefix, log=True):
+        # Move files to their dest dirs and wait for them to finish: (src path, dest dir, job name)
+        # Enough files going to the same dir are moved by a single bulk command. Files it fails to move are moved again.
+        dest_dirs = {}
+        for src_path, dest_dir, job_name in transfers:
+            dest_dirs.setdefault(dest_dir, []).append((src_path, dest_dir, job_name))
+
+        job_names = []
+        bulk_jobs = []
+        for count, (dest_dir, dir_transfers) in enumerate(dest_dirs.items()):
+            if len(dir_transfers) >= ModuleExecutor.MIN_BULK_TRANSFER_FILES:
+                job_name = self.storage_helper.bulk_mv([src_path for src_path, _, _ in dir_transfers], dest_dir,
+                                                       job_name="%s_bulk_%s" % (job_prefix, count),
+                                                       tmp_dir=self.workspace.get_wrk_log_dir(), log=log)
+                bulk_jobs.append((job_name, dir_transfers))
+                continue
+
+            for src_path, dest_dir, job_name in dir_transfers:
+                self.storage_helper.mv(src_path, dest_dir, job_name=job_name, log=log)
+                job_names.append(job_name)
+
+        for job_name in job_names:
+            self.processor.wait_process(job_name)
+
+        for bulk_job, dir_transfers in bulk_jobs:
+            for src_path, dest_dir, job_name in self.__get_failed_transfers(bulk_job, dir_transfers):
+                self.storage_helper.mv(src_path, dest_dir, job_name=job_name, log=log, wait=True)
+
+    def __get_failed_transfers(self, bulk_job, transfers):
+        # Return transfers that a bulk transfer job didn't finish (src path is the first item of each transfer)
+        results = self.storage_helper.get_bulk_mv_results(bulk_job)
+        failed = [transfer for transfer in transfers if not results[transfer[0]]]
+        logging.debug("(%s) Bulk transfer '%s' transferred %d/%d files."
+                      % (self.task_id, bulk_job, len(transfers) - len(failed), len(transfers)))
+        if len(failed) > 0:
+            logging.warning("(%s) Bulk transfer '%s' failed to transfer %d files! Transferring them one at a time."
+                            % (self.task_id, bulk_job, len(failed)))
+        return failed
+
+    def __transfer_input(self, transfers):
+        # Transfer input files through a sliding window that starts the next transfer as soon as one finishes
+        # Enough files transferred into the working dir under their own name are transferred by a single bulk command
+        start_time = time.time()
+        wrk_dir = self.workspace.get_wrk_dir()
+        bulk_transfers = [transfer for transfer in transfers if "src_address" not in transfer[3]
+                          and transfer[3]["dest_path"] == wrk_dir and ":" in transfer[2]]
+        if len(bulk_transfers) < ModuleExecutor.MIN_BULK_TRANSFER_FILES:
+            bulk_transfers = []
+
+        bulk_job = None
+        if len(bulk_transfers) > 0:
+            bulk_job = self.storage_helper.bulk_mv([src_path for _, _, src_path, _ in bulk_transfers], wrk_dir,
+                                                   job_name="load_input_%s_bulk" % self.task_id,
+                                                   tmp_dir=self.workspace.get_wrk_log_dir())
+
+        # Transfer the remaining files while bulk transfer is running
+        max_transfers = self.__run_transfer_window([transfer for transfer in transfers if transfer not in bulk_transfers])
+        if bulk_job is not None:
+            bulk_results = [(src_path, (size, job_name, transfer)) for size, job_name, src_path, transfer in bulk_transfers]
+            failed = self.__get_failed_transfers(bulk_job, bulk_results)
+            self.__run_transfer_window([(size, job_name, src_path, transfer) for src_path, (size, job_name, transfer) in failed])
+
+        if len(transfers) > 0:
+            total_size = sum([transfer[0] for transfer in transfers])
+            runtime = max(time.time() - start_time, 1e-3)
+            logging.info("(%s) Transferred %d input files (%.2f GB) in %.1fs (%.1f MB/s) with up to %d at a time%s."
+                         % (self.task_id, len(transfers), total_size, runtime, total_size * 1024 / runtime, max_transfers,
+                            " and %d in bulk" % len(bulk_transfers) if len(bulk_transfers) > 0 else ""))
+
+    def __run_transfer_window(self, transfers):
+        # Run transfers through a sliding window and return the number of transfers that could run at the same time
+        # Largest files are started first. The number of transfers and GB in flight are limited by the processor shape.
+        max_transfers = min(max(self.processor.get_nr_cpus(), ModuleExecutor.MIN_CONCURRENT_TRANSFERS),
+                            ModuleExecutor.MAX_CONCURRENT_TRANSFERS)
+        max_transfer_size = self.processor.get_mem() * ModuleExecutor.TRANSFER_GB_PER_MEM_GB
+
+        pending = sorted(transfers, key=lambda x: x[0], reverse=True)
+        running = {}
+        running_size = 0
+        while len(pending) > 0 or len(running) > 0:
+
+            # Start the largest transfers that fit in the window. The window always holds at least one transfer.
+            i = 0
+            while i < len(pending) and len(running) < max_transfers:
+                size, job_name, src_path, transfer = pending[i]
+                if len(running) > 0 and running_size + size > max_transfer_size:
+                    i += 1
+                    continue
+                pending.pop(i)
+                if "src_address" in transfer:
+                    self.storage_helper.pull(**transfer)
+                else:
+                    self.storage_helper.mv(**transfer)
+                running[job_name] = (size, src_path, time.time())
+                running_size += size
+
+            # Wait for transfers to finish
+            finished = [job_name for job_name in running if self.processor.is_process_finished(job_name)]
+            if len(finished) == 0:
+                time.sleep(ModuleExecutor.TRANSFER_POLL_INTERVAL)
+                continue
+
+            for job_name in finished:
+                self.processor.wait_process(job_name)
+                size, src_path, transfer_start = running.pop(job_name)
+                running_size -= size
+                runtime = max(time.time() - transfer_start, 1e-3)
+                logging.debug("(%s) Transferred input '%s' (%.2f GB) in %.1fs (%.1f MB/s)."
+                              % (self.task_id, src_path, size, runtime, size * 1024 / runtime))
+        return max_transfers
+
     def __create_workspace(self):
         # Create all directories specified in task workspace
 
@@ -195,9 +484,7 @@ class ModuleExecutor(object):
             self.storage_helper.mkdir(dir_obj, job_name="mkdir_%s" % dir_type, wait=True)
 
         # Set processor wrk, log directories
-        self.processor.set_wrk_dir(self.workspace.get_wrk_dir())
-        self.processor.set_wrk_out_dir(self.workspace.get_wrk_out_dir())
-        self.processor.set_log_dir(self.workspace.get_wrk_log_dir())
+        self.set_processor_dirs()
 
         # Give everyone all the permissions on working directory
         logging.info("(%s) Updating workspace permissions..." % self.processor.name)
@@ -206,6 +493,22 @@ class ModuleExecutor(object):
         # Wait for all the above commands to complete
         logging.info("(%s) Successfully created workspace for task '%s'!" % (self.processor.name, self.task_id))
 
+    def __install_peer_key(self, peer_key_file):
+        # Save key used to authenticate with processors serving files
+        # Key is copied through the command's standard input so it isn't logged or visible in the process list
+        cmd = "mkdir -p $HOME/.ssh && touch {0} && chmod 600 {0} && cat > {0}".format(ModuleExecutor.PEER_KEY_FILE)
+        self.processor.run(job_name="install_peer_key", cmd=cmd, stdin_file=peer_key_file)
+        self.processor.wait_process("install_peer_key")
+
+    def __remove_local_files(self):
+        # Remove output dirs of the previous task that held files this task didn't use
+        if len(self.local_files) == 0:
+            return
+        local_dirs = sorted(set([os.path.dirname(local_path) for local_path in self.local_files.values()]))
+        self.local_files = {}
+        self.processor.run(job_name="rm_local_files", cmd="sudo rm -rf %s" % " ".join(local_dirs))
+        self.processor.wait_process("rm_local_files")
+
     def __grant_workspace_perms(self, job_name):
         cmd = "sudo chmod -R 777 %s" % self.workspace.get_wrk_dir()
         self.processor.run(job_name=job_name, cmd=cmd)
@@ -1,65 +1,406 @@
 import logging
+import queue
+import threading
 import time
 
 from System.Graph import TaskWorker
 
 class Scheduler(object):
 
-    def __init__(self, task_graph, datastore, platform):
+    # Order in which ready tasks are dispatched and given platform resources
+    FIFO            = "fifo"
+    CRITICAL_PATH   = "critical_path"
+
+    DISPATCH_MODES  = [FIFO, CRITICAL_PATH]
+
+    # Seconds before a task's last running parent is expected to finish when a processor starts being created for it
+    PROVISION_LEAD_TIME     = 180
+
+    # Seconds between checks for tasks that need processors created ahead of time
+    PROVISION_CHECK_INTERVAL = 30
+
+    def __init__(self, task_graph, datastore, platform, dispatch_mode=FIFO, run_state=None, result_cache=None,
+                 max_speculative_procs=0, fuse_tasks=False, peer_transfer=False):
 
         # Initialize pipeline definition variables
         self.task_graph     = task_graph
         self.datastore      = datastore
         self.platform       = platform
 
+        # Determine how ready tasks are prioritized
+        if dispatch_mode not in Scheduler.DISPATCH_MODES:
+            logging.error("Invalid scheduler dispatch mode '%s'! Possible values are: %s"
+                          % (dispatch_mode, ", ".join(Scheduler.DISPATCH_MODES)))
+            raise RuntimeError("Invalid scheduler dispatch mode!")
+        self.dispatch_mode  = dispatch_mode
+
+        # Remaining critical path length of each unfinished task, used as its priority
+        self.priorities     = {}
+
+        # Durable record of completed tasks used to resume failed runs
+        self.run_state      = run_state
+
+        # Cache of task results from previous runs
+        self.result_cache   = result_cache
+
+        # Storage helper on the controller used to finish tasks without a command
+        self.storage_helper = None
+
+        # Maximum number of processors that can be created ahead of tasks becoming ready
+        self.max_speculative_procs = max_speculative_procs
+        if self.max_speculative_procs > 0 and self.platform.get_idle_processor_ttl() <= 0:
+            logging.warning("Processors can only be created ahead of time if the platform re-uses idle processors! "
+                            "Set 'idle_processor_ttl' in the platform config to enable.")
+            self.max_speculative_procs = 0
+
+        # Tasks that processors have been created ahead of time for
+        self.speculated_tasks = set()
+
+        # Observed runtimes of finished tasks, grouped by the task they were split from
+        self.observed_runtimes = {}
+
+        # Whether linear chains of tasks are run one after another on the same processor
+        self.fuse_tasks = fuse_tasks
+
+        # Task fused after each task and tasks whose completion can't be recorded until the task fused after them finishes
+        self.fused_children     = {}
+        self.fused_parents      = {}
+        self.unrecorded_tasks   = {}
+
+        # Whether temporary output is served by the processor that produced it instead of being uploaded
+        self.peer_transfer = peer_transfer
+        if self.peer_transfer and self.platform.get_idle_processor_ttl() <= 0:
+            logging.warning("Temporary output can only be served by processors if the platform re-uses idle processors! "
+                            "Set 'idle_processor_ttl' in the platform config to enable.")
+            self.peer_transfer = False
+
+        # Whether temporary output is deleted as soon as every task reading it has finished
+        self.rm_tmp_output      = True
+        self.tmp_output_collector = None
+
+        # Tasks whose completion has been recorded and temporary files that have already been deleted
+        self.settled_tasks      = set()
+        self.deleted_tmp_files  = set()
+
+        # Validator still checking pipeline inputs and ready tasks waiting for their inputs to be validated
+        self.input_validator    = None
+        self.gated_tasks        = []
+
         # Initialize set of task workers
         self.task_workers = {}
 
+        # IDs of task workers that have been launched but not yet finalized
+        self.unfinalized_workers = set()
+
+        # Queue where task workers announce that they've finished running
+        self.completion_queue = queue.Queue()
+
+    def set_storage_helper(self, storage_helper):
+        self.storage_helper = storage_helper
+
+    def set_input_validator(self, input_validator):
+        # Tasks don't run until the validator has found all the pipeline inputs they read valid
+        self.input_validator = input_validator
+
+    def notify_inputs_validated(self):
+        # Wake the scheduler so tasks waiting on inputs that were just validated can be launched
+        self.completion_queue.put(None)
+
     def get_task_workers(self):
         return self.task_workers
 
-    def run(self):
+    def run(self, resume=False, rm_tmp_output=True):
+        self.rm_tmp_output = rm_tmp_output
         try:
+            # Skip tasks that were completed by a previous run
+            if resume:
+                self.__restore_progress()
             self.__run_tasks()
         finally:
             self.__finalize()
 
     def __run_tasks(self):
+        # Prioritize tasks by the length of the longest chain of work remaining behind them
+        self.__update_priorities()
+
         # Execute tasks until are are completed or until error encountered
         while not self.task_graph.is_complete():
 
-            # Check all tasks to see if they need anything updated
-            unfinished_tasks = self.task_graph.get_unfinished_tasks()
-            for task in unfinished_tasks:
+            # Stop if inputs validated while tasks are running turned out to be invalid
+            self.__check_input_validation()
 
-                # Task id
-                task_id = task.get_ID()
+            # Start running tasks that are ready to run but aren't currently
+            self.__launch_ready_tasks()
 
-                # Check if task worker has been created for task
-                task_worker = None if task_id not in self.task_workers else self.task_workers[task_id]
+            # Make sure something is running that can eventually wake the scheduler back up
+            if not self.__has_running_task_workers() and self.input_validator is None:
+                logging.error("Scheduler deadlock! No tasks are running but the following tasks never became ready: %s"
+                              % ", ".join([task.get_ID() for task in self.task_graph.get_unfinished_tasks()]))
+                raise RuntimeError("Scheduler deadlock! Pipeline graph cannot be completed!")
 
-                # Finalize completed tasks
-                if task_worker is not None and task_worker.get_status() == TaskWorker.COMPLETE:
-                    self.__finalize_task_worker(task_worker)
+            # Wait for the next task worker to finish and finalize it
+            # Scheduler is also woken up without a task worker when more inputs have been validated
+            task_worker = self.__wait_for_task_worker()
+            if task_worker is not None:
+                self.__finalize_task_worker(task_worker)
+
+        # Inputs that weren't read by any task still need to be valid for the pipeline to succeed
+        self.__check_input_validation(wait=True)
+
+    def __check_input_validation(self, wait=False):
+        # Stop waiting on input validation once it has finished and raise an error if any inputs were invalid
+        if self.input_validator is None or (self.input_validator.is_validating() and not wait):
+            return
+
+        input_validator = self.input_validator
+        self.input_validator = None
+        if input_validator.finalize():
+            logging.error("One or more pipeline inputs are invalid! Cancelling pipeline. See the above logs for more information.")
+            raise RuntimeError("One or more pipeline inputs are invalid!")
+        logging.info("All pipeline inputs validated!")
+
+    def __is_input_pending(self, task_id):
+        # Determine whether any pipeline input read by a task hasn't been validated yet
+        if self.input_validator is None:
+            return False
+        for input_obj in self.datastore.get_task_pipeline_inputs(task_id):
+            if self.input_validator.is_input_pending(input_obj):
+                return True
+        return False
+
+    def __wait_for_task_worker(self):
+        # Return next task worker to finish running
+        if self.max_speculative_procs <= 0:
+            return self.completion_queue.get()
+
+        # Periodically look for tasks that will become ready soon while waiting
+        while True:
+            self.__provision_speculative_processors()
+            try:
+                return self.completion_queue.get(timeout=Scheduler.PROVISION_CHECK_INTERVAL)
+            except queue.Empty:
+                pass
+
+    def __provision_speculative_processors(self):
+        # Create processors for tasks whose last running parents are expected to finish soon
+        now = time.time()
+        fused_task_ids = set(self.fused_children.values())
+        for parent_id in list(self.unfinalized_workers):
+            for task_id in self.task_graph.get_children(parent_id):
+
+                # Stop once the maximum number of speculative processors exist
+                if self.platform.get_nr_speculative_processors() >= self.max_speculative_procs:
+                    return
+
+                if task_id in self.speculated_tasks or task_id in self.task_workers or task_id in fused_task_ids:
+                    continue
+
+                task = self.task_graph.get_tasks(task_id)
+                if task.is_complete() or task.is_deprecated():
                     continue
 
-                # Start running tasks that are ready to run but aren't currently
-                if task_worker is None and self.task_graph.parents_complete(task_id) and not task.is_deprecated():
-                    logging.info("Launching task: '%s'" % task_id)
-                    self.task_workers[task_id] = TaskWorker(task, self.datastore, self.platform)
-                    self.task_workers[task_id].start()
+                # Determine when the last unfinished parent is expected to finish
+                finish_time = self.__predict_parents_finish_time(task_id)
+                if finish_time is None or finish_time - now > Scheduler.PROVISION_LEAD_TIME:
+                    continue
+
+                # Size processor using the resources the task is expected to request once its parents finish
+                nr_cpus, mem, disk_space = self.datastore.estimate_task_resources(task_id)
+                if self.platform.provision_speculative_processor(task_id, nr_cpus, mem, disk_space):
+                    self.speculated_tasks.add(task_id)
+
+    def __cancel_speculative_processors(self):
+        # Release processors created ahead of time for tasks that were replaced when their graph was split
+        for task_id in list(self.speculated_tasks):
+            if self.task_graph.get_tasks(task_id).is_deprecated():
+                self.platform.cancel_speculative_processor(task_id)
+                self.speculated_tasks.discard(task_id)
+
+    def __predict_parents_finish_time(self, task_id):
+        # Predict when all parents of a task will have finished. Returns None if it can't be predicted.
+        finish_time = 0
+        for parent_id in self.task_graph.get_parents(task_id):
+            parent = self.task_graph.get_tasks(parent_id)
+            if parent.is_complete():
+                continue
+
+            # Parent hasn't started yet or will be replaced when its upstream splitter finishes
+            if parent_id not in self.task_workers or parent.is_splitter_task():
+                return None
+
+            # Parent's processor isn't running yet
+            start_time = self.task_workers[parent_id].get_start_time()
+            if start_time is None:
+                return None
+
+            # Parent's runtime is unknown
+            expected_runtime = self.__get_expected_runtime(parent)
+            if expected_runtime is None:
+                return None
+
+            finish_time = max(finish_time, start_time + expected_runtime)
+        return finish_time
+
+    def __get_expected_runtime(self, task):
+        # Average runtime of other tasks split from the same task, otherwise the runtime estimate in the graph config
+        # Returns None if neither exists as the default module estimate says nothing about how long a task will run
+        observed = self.observed_runtimes.get(task.get_ID().split(".")[0], [])
+        if len(observed) > 0:
+            return sum(observed) / len(observed)
+        if task.has_runtime_estimate():
+            return task.get_runtime_estimate() * 60
+        return None
+
+    def __restore_progress(self):
+        # Replay task completions recorded by a previous run in the order they originally happened
+        if self.run_state is None:
+            logging.error("Cannot resume pipeline without a run state!")
+            raise RuntimeError("Cannot resume pipeline without a run state!")
+
+        completed_tasks = self.run_state.get_completed_tasks()
+        for task_id, output, split_task_ids in completed_tasks:
+
+            # Make sure task still exists in current graph
+            if task_id not in self.task_graph.get_tasks():
+                logging.error("Cannot resume pipeline! Previously completed task '%s' does not exist in graph!" % task_id)
+                raise RuntimeError("Cannot resume pipeline! Graph does not match recorded run state!")
+
+            # Restore outputs so downstream tasks can use them
+            task = self.task_graph.get_tasks(task_id)
+            task.module.output = output
+
+            # Re-create split tasks
+            if task.is_splitter_task():
+                new_split_task_ids = self.task_graph.split_graph(task_id)
+                if new_split_task_ids != split_task_ids:
+                    logging.error("Cannot resume pipeline! Splitting task '%s' didn't re-create the recorded split tasks!" % task_id)
+                    raise RuntimeError("Cannot resume pipeline! Graph does not match recorded run state!")
+
+            self.task_graph.mark_task_complete(task_id)
+            self.settled_tasks.add(task_id)
+
+        logging.info("Resumed pipeline from '%s'. Skipping %d previously completed tasks."
+                     % (self.run_state.get_state_file(), len(completed_tasks)))
 
-            # Sleeping for 5 seconds before checking again
-            time.sleep(5)
+    def __launch_ready_tasks(self):
+        # Launch task workers for every task whose parents have all completed
+        ready_tasks = self.task_graph.pop_ready_tasks()
+
+        # Hold back tasks until the pipeline inputs they read have been validated
+        ready_tasks = [task for task in self.gated_tasks if not task.is_deprecated() and not task.is_complete()] + ready_tasks
+        gated_task_ids = set([task.get_ID() for task in ready_tasks if self.__is_input_pending(task.get_ID())])
+        self.gated_tasks = [task for task in ready_tasks if task.get_ID() in gated_task_ids]
+        ready_tasks = [task for task in ready_tasks if task.get_ID() not in gated_task_ids]
+
+        # Launch tasks on the critical path first
+        if self.dispatch_mode == Scheduler.CRITICAL_PATH:
+            ready_tasks.sort(key=lambda task: self.priorities.get(task.get_ID(), 0), reverse=True)
+
+        for task in ready_tasks:
+
+            # Task id
+            task_id = task.get_ID()
+
+            if task_id not in self.task_workers:
+                logging.info("Launching task: '%s'" % task_id)
+
+                # Determine which task will run on this task's processor next
+                fused_child_id, fused_resources = self.__get_fused_chain(task_id)
+                if fused_child_id is not None:
+                    logging.info("Task '%s' will run on the same processor as task '%s'." % (fused_child_id, task_id))
+                    self.fused_children[task_id] = fused_child_id
+                    self.fused_parents[fused_child_id] = task_id
+
+                # Task may have already been run by the task fused before it
+                stream_parent = None
+                if task_id in self.fused_parents and self.task_workers[self.fused_parents[task_id]].is_streaming():
+                    stream_parent = self.task_workers[self.fused_parents[task_id]]
+
+                self.task_workers[task_id] = TaskWorker(task, self.datastore, self.platform,
+                                                        completion_queue=self.completion_queue,
+                                                        priority=self.priorities.get(task_id, 0),
+                                                        result_cache=self.result_cache,
+                                                        storage_helper=self.storage_helper,
+                                                        fused_child=self.task_graph.get_tasks(fused_child_id)
+                                                        if fused_child_id is not None else None,
+                                                        fused_resources=fused_resources,
+                                                        stream_parent=stream_parent,
+                                                        peer_transfer=self.peer_transfer)
+                self.unfinalized_workers.add(task_id)
+                self.task_workers[task_id].start()
+
+    def __get_fused_chain(self, task_id):
+        # Return the task that will run on a task's processor after it and the (nr_cpus, mem) needed by
+        # the rest of the chain of tasks fused after it. Returns (None, None) if task isn't fused with another task.
+        if not self.fuse_tasks:
+            return None, None
+
+        fused_child_id = self.__get_fused_child(task_id)
+        if fused_child_id is None:
+            return None, None
+
+        # Processor needs to be big enough for every task in the chain
+        nr_cpus, mem = 0, 0
+        child_id = fused_child_id
+        while child_id is not None:
+            child_cpus, child_mem, _ = self.datastore.estimate_task_resources(child_id)
+            nr_cpus, mem = max(nr_cpus, child_cpus), max(mem, child_mem)
+            child_id = self.__get_fused_child(child_id)
+
+        return fused_child_id, (nr_cpus, mem)
+
+    def __get_fused_child(self, task_id):
+        # Return a task's only child if it only depends on the task and both can share a processor, otherwise None
+        # Splitters and mergers change the shape of the graph so they're never fused
+        task = self.task_graph.get_tasks(task_id)
+        if task.is_splitter_task() or task.is_merger_task() or task.module.is_inline:
+            return None
+
+        children = set(self.task_graph.get_children(task_id))
+        if len(children) != 1:
+            return None
+
+        child_id = children.pop()
+        child = self.task_graph.get_tasks(child_id)
+        if set(self.task_graph.get_parents(child_id)) != {task_id}:
+            return None
+        if child.is_splitter_task() or child.is_merger_task() or child.module.is_inline:
+            return None
+        if child.is_complete() or child.is_deprecated() or child_id in self.task_workers:
+            return None
+
+        # Child would run without waiting for its inputs to be validated
+        if self.__is_input_pending(child_id):
+            return None
+        return child_id
+
+    def __update_priorities(self):
+        # Only rank tasks when dispatching along the critical path
+        if self.dispatch_mode == Scheduler.CRITICAL_PATH:
+            self.priorities = self.task_graph.get_critical_path_lengths()
+
+    def __has_running_task_workers(self):
+        # Determine whether any task worker has yet to be finalized
+        return len(self.unfinalized_workers) > 0
 
     def __finalize_task_worker(self, task_worker):
 
+        # Don't finalize the same task worker twice
+        if task_worker.get_status() is TaskWorker.FINALIZED:
+            return
+
         # Get task being executed by worker
         task = task_worker.get_task()
         logging.debug("Finalizing task '%s'..." % task.get_ID())
 
         # Add to list of finalized task workers
         task_worker.set_status(TaskWorker.FINALIZED)
+        self.unfinalized_workers.discard(task.get_ID())
+
+        # Release processor created ahead of time for task if it was never used
+        if task.get_ID() in self.speculated_tasks:
+            self.platform.cancel_speculative_processor(task.get_ID())
+            self.speculated_tasks.discard(task.get_ID())
 
         # Checks for and raises any runtime errors that occurred while running task
         task_worker.finalize()
@@ -71,45 +412,127 @@ class Scheduler(object):
         # Actions on successful task completion
         elif task_worker.is_success():
             logging.info("Task '%s' finished successfully!" % task.get_ID())
+
+            # Keep track of how long tasks take to predict when similar tasks will finish
+            if task_worker.get_runtime() > 0:
+                self.observed_runtimes.setdefault(task.get_ID().split(".")[0], []).append(task_worker.get_runtime())
+
             # Split subgraph if task is a splitter
+            split_task_ids = None
             if task.is_splitter_task():
-                self.task_graph.split_graph(task.get_ID())
+                split_task_ids = self.task_graph.split_graph(task.get_ID())
+                self.__cancel_speculative_processors()
+
+                # Score the newly created split tasks
+                self.__update_priorities()
 
             # Set task to complete if task worker completed successfully
-            task.set_complete(True)
+            self.task_graph.mark_task_complete(task.get_ID())
+
+            # Record completion so task won't be re-run if pipeline is resumed
+            self.__record_task(task, split_task_ids)
+
+    def __record_task(self, task, split_task_ids):
+        # Record completed task in run state
+        # Tasks that left output on their processor for a fused task are recorded once the whole chain has finished,
+        # otherwise a resumed pipeline would look for output that no longer exists
+        unrecorded = self.unrecorded_tasks.pop(task.get_ID(), []) + [(task, split_task_ids)]
+        if task.get_ID() in self.fused_children:
+            self.unrecorded_tasks[self.fused_children[task.get_ID()]] = unrecorded
+            return
+
+        for unrecorded_task, unrecorded_split_task_ids in unrecorded:
+            if self.run_state is not None:
+                self.run_state.record_task(unrecorded_task, split_task_ids=unrecorded_split_task_ids)
+
+            # Temporary output read by task can be deleted once it's been recorded
+            self.__collect_tmp_output(unrecorded_task)
+
+    def __collect_tmp_output(self, task):
+        # Delete temporary files that every task reading them has finished with
+        self.settled_tasks.add(task.get_ID())
+        if not self.rm_tmp_output or self.storage_helper is None:
+            return
+
+        # Check files produced by task and files produced by the tasks it read from
+        # Files passed along by a parent were produced further upstream
+        task_ids = [task.get_ID()] + self.task_graph.get_parents(task.get_ID())
+        checked_task_ids = set()
+        while len(task_ids) > 0:
+            task_id = task_ids.pop()
+            if task_id in checked_task_ids:
+                continue
+            checked_task_ids.add(task_id)
+            if task_id != task.get_ID() and self.datastore.passes_parent_output(task_id):
+                task_ids.extend(self.task_graph.get_parents(task_id))
+
+            # Files can't be deleted until task producing them has been recorded
+            if task_id not in self.settled_tasks:
+                continue
+
+            unused_paths = []
+            for tmp_file in self.datastore.get_tmp_output_files(task_id):
+                path = tmp_file.get_transferrable_path()
+                if path in self.deleted_tmp_files:
+                    continue
+                if self.datastore.count_tmp_file_consumers(task_id, path, self.settled_tasks) == 0:
+                    self.deleted_tmp_files.add(path)
+                    unused_paths.append(path)
+
+            if len(unused_paths) == 0:
+                continue
+
+            # Files only held by processors serving them don't have to be uploaded or deleted
+            served_paths = self.platform.forget_served_files(unused_paths)
+            for path in unused_paths:
+                if path not in served_paths:
+                    self.__get_tmp_output_collector().delete(path)
+
+    def __get_tmp_output_collector(self):
+        # Start deleting temporary files in the background the first time one is no longer needed
+        if self.tmp_output_collector is None:
+            self.tmp_output_collector = TmpOutputCollector(self.storage_helper)
+            self.tmp_output_collector.start()
+        return self.tmp_output_collector
 
     def __finalize(self):
 
-        # Prevent any new processors from being created on platform
-        self.platform.lock()
+        # Served temporary output only needs to be uploaded if the pipeline might be resumed
+        if self.task_graph.is_complete():
+            self.platform.forget_served_files()
 
         # Cancel any still-running jobs
+        # Tasks are cancelled first so tasks woken up by the platform being locked know they were cancelled
         self.__cancel_unfinished_tasks()
 
-        # Wait for all jobs to finish
-        done = False
-        while not done:
-            # Wait for all task workers to finish up cancelling
-            done = True
-            for task_id, task_worker in self.task_workers.items():
-                if not task_worker.get_status() is TaskWorker.FINALIZED:
-                    # Indicate that not all tasks have been finalized
-                    done = False
-
-                # Finalize tasks that have finished running/cancelling
-                if task_worker.get_status() is TaskWorker.COMPLETE:
-                    try:
-                        self.__finalize_task_worker(task_worker)
-
-                    except BaseException as e:
-                        # Log error but don't raise exception as we want to finish finalizing all task workers
-                        if not task_worker.is_cancelled():
-                            logging.error("Task '%s' failed due to runtime error!" % task_id)
-                            if str(e) != "":
-                                logging.error("Received the following message:\n%s" % e)
-
-            # Wait for a bit before checking again
-            time.sleep(5)
+        # Prevent any new processors from being created on platform
+        self.platform.lock()
+
+        # Wait for all task workers to finish up cancelling
+        while self.__has_running_task_workers():
+
+            # Finalize task workers that already finished running but were never finalized
+            # Otherwise wait for the next task worker to finish running or cancelling
+            complete_workers = [self.task_workers[task_id] for task_id in list(self.unfinalized_workers)
+                                if self.task_workers[task_id].get_status() is TaskWorker.COMPLETE]
+            if len(complete_workers) == 0:
+                complete_workers = [task_worker for task_worker in [self.completion_queue.get()] if task_worker is not None]
+
+            for task_worker in complete_workers:
+                try:
+                    self.__finalize_task_worker(task_worker)
+
+                except BaseException as e:
+                    # Log error but don't raise exception as we want to finish finalizing all task workers
+                    if not task_worker.is_cancelled():
+                        logging.error("Task '%s' failed due to runtime error!" % task_worker.get_task().get_ID())
+                        if str(e) != "":
+                            logging.error("Received the following message:\n%s" % e)
+
+        # Finish deleting temporary files that are no longer needed
+        if self.tmp_output_collector is not None:
+            self.tmp_output_collector.stop()
+            self.tmp_output_collector.join()
 
     def __cancel_unfinished_tasks(self):
         # Cancel any still-running jobs
@@ -119,3 +542,37 @@ class Scheduler(object):
                 # Cancel pipeline if it isn't finalizing or already cancelled
                 logging.debug("Initiated cancellation of '%s'" % task_id)
                 task_worker.cancel()
+
+
+class TmpOutputCollector(threading.Thread):
+    def __init__(self, storage_helper):
+        super(TmpOutputCollector, self).__init__()
+
+        # Setting node thread as daemon
+        self.daemon = True
+
+        # Storage helper for deleting files and queue of files waiting to be deleted
+        self.storage_helper = storage_helper
+        self.paths = queue.Queue()
+        self.nr_deleted = 0
+
+    def delete(self, path):
+        self.paths.put(path)
+
+    def stop(self):
+        # Stop once every queued file has been deleted
+        self.paths.put(None)
+
+    def run(self):
+        while True:
+            path = self.paths.get()
+            if path is None:
+                break
+            try:
+                logging.debug("TmpOutputCollector deleting unused temporary file: %s" % path)
+                self.storage_helper.rm(path, job_name="rm_tmp_%d" % self.nr_deleted, log=False, wait=True)
+            except BaseException as e:
+                logging.warning("Unable to delete unused temporary file: %s" % path)
+                if str(e) != "":
+                    logging.warning("Received the following message:\n%s" % e)
+            self.nr_deleted += 1
@@ -26,6 +26,12 @@ class Task(object):
         # Get the config inputs
         self.__module_args          = kwargs.pop("args", [])
 
+        # Expected runtime (minutes) declared in graph config. Overrides the module's own estimate.
+        self.__runtime_estimate     = kwargs.pop("runtime_estimate", None)
+
+        # Whether inputs the module reads sequentially are streamed into its command instead of being downloaded first
+        self.__stream_input         = kwargs.pop("stream_input", False)
+
         # Initialize modules
         self.module                 = self.__load_module(self.__module_name,
                                                          is_docker=self.__docker_image is not None,
@@ -60,7 +66,10 @@ class Task(object):
         # visible_samples is list of samples visible to new split
 
         # Create copy of current task and give new id
-        split_task = copy.deepcopy(self)
+        # Read-only graph config and module metadata are shared with the copy rather than deep-copied
+        shared_attrs = [self.__module_args, self.__final_output_keys, self.__clones]
+        shared_attrs.extend(self.module.get_immutable_attributes())
+        split_task = copy.deepcopy(self, {id(attr): attr for attr in shared_attrs})
         new_id = "%s.%s" % (self.__task_id, split_id)
         split_task.__task_id = new_id
 
@@ -121,6 +130,18 @@ class Task(object):
     def get_docker_image_id(self):
         return self.__docker_image
 
+    def get_runtime_estimate(self):
+        if self.__runtime_estimate is not None:
+            return self.__runtime_estimate
+        return self.module.get_runtime_estimate()
+
+    def has_runtime_estimate(self):
+        # Determine whether graph config declares how long task is expected to run
+        return self.__runtime_estimate is not None
+
+    def is_input_streamed(self):
+        return self.__stream_input
+
     def set_complete(self, is_complete):
         self.complete = is_complete
 
@@ -216,6 +237,12 @@ class Task(object):
         if self.__docker_image is not None:
             to_ret += "\tdocker_image\t= %s\n" % self.__docker_image
 
+        if self.__runtime_estimate is not None:
+            to_ret += "\truntime_estimate\t= %s\n" % self.__runtime_estimate
+
+        if self.__stream_input:
+            to_ret += "\tstream_input\t= %s\n" % self.__stream_input
+
         if isinstance(input_from, list) and len(input_from) == 1:
             to_ret += "\tinput_from\t= %s\n" % input_from[0]
 
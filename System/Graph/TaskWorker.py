@@ -1,9 +1,9 @@
 import threading
 import time
-import math
 import logging
 
 from System.Workers import Thread
+from System.Datastore import GAPFile
 from System.Graph import ModuleExecutor
 
 class TaskWorker(Thread):
@@ -18,7 +18,11 @@ class TaskWorker(Thread):
 
     STATUSES        = ["IDLE", "LOADING", "RUNNING", "FINALIZING", "COMPLETE", "CANCELLING", "FINALIZED"]
 
-    def __init__(self, task, datastore, platform):
+    # Largest input file (bytes) an inline module will parse on the controller
+    INLINE_MAX_BYTES = 16 * 1024**2
+
+    def __init__(self, task, datastore, platform, completion_queue=None, priority=0, result_cache=None,
+                 storage_helper=None, fused_child=None, fused_resources=None, stream_parent=None, peer_transfer=False):
         # Class for executing task
 
         # Initialize new thread
@@ -42,6 +46,14 @@ class TaskWorker(Thread):
         # Processor for executing task
         self.proc       = None
 
+        # Processor runtime/cost before task got processor and after task was done with it
+        # Processors can be re-used by several tasks so each task is only charged for the time it held the processor
+        self.proc_start_runtime = 0
+        self.proc_start_cost    = 0
+        self.proc_end_runtime   = None
+        self.proc_end_cost      = None
+        self.proc_start_time    = None
+
         # Garbage collector for destroying instance on cancellation
         self.garbage_collector = None
 
@@ -57,6 +69,42 @@ class TaskWorker(Thread):
         # Command that was run to carry out task
         self.cmd = None
 
+        # Queue where worker announces itself once it has finished running
+        self.completion_queue = completion_queue
+
+        # Priority of task when competing with other tasks for platform resources
+        self.priority = priority
+
+        # Cache of task results from previous runs
+        self.result_cache = result_cache
+
+        # Storage helper on the controller used to finish tasks that don't need a processor
+        self.storage_helper = storage_helper
+
+        # Task that runs on this task's processor next, and the (nr_cpus, mem) the processor needs for it
+        # Temporary output is left on the processor for the fused task instead of being saved
+        self.fused_child        = fused_child
+        self.fused_resources    = fused_resources
+
+        # Command of fused task that was run alongside this task's command reading its output through a pipe
+        # and the (runtime, cost) of the processor charged to the fused task for running it
+        self.streamed_cmd       = None
+        self.streamed_share     = (0, 0)
+
+        # Worker of the task that already ran this task's command while streaming its output into it
+        self.stream_parent      = stream_parent
+
+        # Whether temporary output is served to other processors instead of being uploaded
+        self.peer_transfer      = peer_transfer
+
+    def run(self):
+        # Run task and notify scheduler as soon as the worker has finished, regardless of success
+        try:
+            super(TaskWorker, self).run()
+        finally:
+            if self.completion_queue is not None:
+                self.completion_queue.put(self)
+
     def set_status(self, new_status):
 
         # Updates instance status with threading.lock() to prevent race conditions
@@ -76,27 +124,48 @@ class TaskWorker(Thread):
     def get_runtime(self):
         if self.proc is None:
             return 0
+        elif self.proc_end_runtime is not None:
+            return self.proc_end_runtime - self.proc_start_runtime
         else:
-            return self.proc.get_runtime()
+            return self.proc.get_runtime() - self.proc_start_runtime
 
     def get_cost(self):
         if self.proc is None:
             return 0
+        elif self.proc_end_cost is not None:
+            return self.proc_end_cost - self.proc_start_cost
         else:
-            return self.proc.compute_cost()
+            return self.proc.compute_cost() - self.proc_start_cost
 
     def get_start_time(self):
         if self.proc is None:
             return None
+        elif self.proc_start_time is not None:
+            return self.proc_start_time
         else:
             return self.proc.get_start_time()
 
     def get_cmd(self):
         return self.cmd
 
+    def is_streaming(self):
+        # Whether task successfully ran the command of the task fused after it
+        return self.streamed_cmd is not None and self.is_success()
+
+    def get_streamed_cmd(self):
+        return self.streamed_cmd
+
+    def get_streamed_share(self):
+        return self.streamed_share
+
     def work(self):
         # Run task module command and save outputs
         try:
+            # Only save output if command was already run by the task fused before this one
+            if self.stream_parent is not None:
+                self.__finish_streamed_task()
+                return
+
             # Set the input arguments that will be passed to the task module
             self.datastore.set_task_input_args(self.task.get_ID())
 
@@ -104,20 +173,27 @@ class TaskWorker(Thread):
             cpus    = self.module.get_argument("nr_cpus")
             mem     = self.module.get_argument("mem")
 
+            # Make processor big enough for the tasks fused after this one
+            if self.fused_resources is not None:
+                cpus    = max(cpus, self.fused_resources[0])
+                mem     = max(mem, self.fused_resources[1])
+
             # Compute disk space requirements
             docker_image    = None
             input_files     = self.datastore.get_task_input_files(self.task.get_ID())
             if self.task.get_docker_image_id() is not None:
                 docker_image    = self.datastore.get_docker_image(docker_id=self.task.get_docker_image_id())
-            disk_space      = self.__compute_disk_requirements(input_files, docker_image)
-            logging.debug("(%s) CPU: %s, Mem: %s, Disk space: %s" % (self.task.get_ID(), cpus, mem, disk_space))
 
-            # Wait for platform to have enough resources to run task
-            while not self.platform.can_make_processor(cpus, mem, disk_space) and not self.is_cancelled():
-                time.sleep(5)
+            # Inputs left on the processor by the task fused before this one
+            has_fused_input = any([input_file.is_flagged("fused") for input_file in input_files])
 
-            # Quit if pipeline is cancelled
-            self.__check_cancelled()
+            # Skip running task if a previous run already produced its output
+            # Results of tasks with fused inputs can't be cached as the inputs only exist on this run's processor
+            cache_key = None
+            if self.result_cache is not None and not has_fused_input:
+                cache_key = self.result_cache.get_key(self.task, docker_image)
+                if cache_key is not None and self.__load_cached_result(cache_key):
+                    return
 
             # Define unique workspace for task input/output
             task_workspace = self.datastore.get_task_workspace(task_id=self.task.get_ID())
@@ -126,14 +202,54 @@ class TaskWorker(Thread):
             # Specify that module output files should be placed in task's working directory
             self.module.set_output_dir(task_workspace.get_wrk_out_dir())
 
-            # Execute command if one exists
-            self.set_status(self.LOADING)
-
             # Check if there is any command that needs to be run
             has_command = self.module.get_command() is not None
 
-            # Create the specific processor for the task
-            if has_command:
+            # Resolve outputs of tasks without a command without creating a processor
+            if not has_command and not has_fused_input and self.__resolve_without_processor(task_workspace):
+                return
+
+            # Parse small input files of inline modules on the controller
+            if has_command and self.module.is_inline and not has_fused_input and self.__run_inline():
+                return
+
+            # Inputs streamed into the command don't have to fit on the processor's disk
+            streamed_paths  = self.__get_streamed_paths(input_files)
+            disk_space      = self.datastore.compute_disk_space([input_file for input_file in input_files
+                                                             if input_file.get_transferrable_path() not in streamed_paths],
+                                                            docker_image)
+            logging.debug("(%s) CPU: %s, Mem: %s, Disk space: %s" % (self.task.get_ID(), cpus, mem, disk_space))
+
+            # Wait for platform to admit task with enough resources to run it
+            # Processors already holding task input are preferred
+            input_sizes = {input_file.get_transferrable_path(): input_file.get_size() or 0
+                           for input_file in input_files if input_file.is_remote()}
+            # Task is never admitted once the platform has been locked to shut down the pipeline
+            if not self.platform.request_resources(self.task.get_ID(), cpus, mem, disk_space, priority=self.priority,
+                                                   input_sizes=input_sizes):
+                self.__cancelled = True
+
+            # Quit if pipeline is cancelled
+            self.__check_cancelled()
+
+            # Execute command if one exists
+            self.set_status(self.LOADING)
+
+            # Re-use idle processor handed to task by the platform along with any files left on it
+            self.proc = self.platform.get_leased_processor(self.task.get_ID())
+            is_new_proc = self.proc is None
+            local_files = {}
+            if not is_new_proc:
+                local_files = self.platform.get_local_files(self.proc)
+                if self.proc.get_nr_cpus() < cpus or self.proc.get_mem() < mem:
+                    logging.warning("(%s) Processor '%s' is smaller than task requested (CPU: %s, Mem: %s)!"
+                                    % (self.task.get_ID(), self.proc.get_name(), cpus, mem))
+                self.proc_start_time    = time.time()
+                self.proc_start_runtime = self.proc.get_runtime()
+                self.proc_start_cost    = self.proc.compute_cost()
+
+            # Otherwise create the specific processor for the task
+            elif has_command:
                 # Get processor capable of running job
                 self.proc = self.platform.get_processor(self.task.get_ID(), cpus, mem, disk_space)
                 logging.debug("(%s) Successfully acquired processor!" % self.task.get_ID())
@@ -146,7 +262,8 @@ class TaskWorker(Thread):
             self.__check_cancelled()
 
             # Create the processor
-            self.proc.create()
+            if is_new_proc:
+                self.proc.create()
 
             # Check to see if pipeline has been cancelled
             self.__check_cancelled()
@@ -155,7 +272,8 @@ class TaskWorker(Thread):
             self.module_executor = ModuleExecutor(task_id=self.task.get_ID(),
                                                   processor=self.proc,
                                                   workspace=task_workspace,
-                                                  docker_image=docker_image)
+                                                  docker_image=docker_image,
+                                                  local_files=local_files)
 
             # Check to see if pipeline has been cancelled
             self.__check_cancelled()
@@ -164,7 +282,16 @@ class TaskWorker(Thread):
             if has_command:
 
                 # Load task inputs onto module executor
-                self.module_executor.load_input(input_files)
+                # Inputs served by other processors are transferred straight from them unless they're streamed
+                remote_paths = [input_file.get_transferrable_path() for input_file in input_files
+                                if input_file.get_transferrable_path() not in streamed_paths]
+                peer_files = self.platform.get_peer_files(self.task.get_ID(), remote_paths)
+                try:
+                    peer_key_file = self.platform.get_peer_key()[0] if len(peer_files) > 0 else None
+                    self.module_executor.load_input(input_files, peer_files=peer_files, peer_key_file=peer_key_file,
+                                                    streamed_paths=streamed_paths)
+                finally:
+                    self.platform.release_peer_files(self.task.get_ID())
 
                 # Check to see if pipeline has been cancelled
                 self.__check_cancelled()
@@ -206,8 +333,22 @@ class TaskWorker(Thread):
 
                 else:
 
-                    # Run the actual command
-                    out, err = self.module_executor.run(self.cmd)
+                    # Run the actual command, streaming output into the task fused after this one if possible
+                    # Commands reading streamed input can't be retried as the stream can't be read again
+                    try:
+                        stream = self.__prepare_stream()
+                        if stream is not None:
+                            out, err = self.__run_streamed(*stream)
+                        else:
+                            num_retries = 0 if self.module_executor.has_input_streams() else None
+                            out, err = self.module_executor.run(self.cmd, num_retries=num_retries)
+                    except BaseException:
+                        if not self.__cancelled:
+                            self.module_executor.close_input_streams()
+                        raise
+
+                    # Make sure command read all of its streamed input
+                    self.module_executor.wait_input_streams()
 
                     # Check to see if pipeline has been cancelled
                     self.__check_cancelled()
@@ -222,16 +363,28 @@ class TaskWorker(Thread):
             self.set_status(self.FINALIZING)
 
             # Save output files in workspace output dirs (if any)
-            output_files = self.datastore.get_task_output_files(self.task.get_ID())
+            # Output streamed into the task fused after this one doesn't exist anymore
+            output_files = [output_file for output_file in self.datastore.get_task_output_files(self.task.get_ID())
+                            if not output_file.is_flagged("streamed")]
             final_output_types = self.task.get_final_output_keys()
             if len(output_files) > 0:
-                self.module_executor.save_output(output_files, final_output_types)
+                # Serve temporary output from processor if it can be reached by other processors
+                serve_tmp_output = self.peer_transfer and self.fused_child is None and self.platform.can_serve_files(self.proc)
+                if serve_tmp_output:
+                    self.module_executor.serve_files(self.platform.get_peer_key()[1])
+                self.module_executor.save_output(output_files, final_output_types,
+                                                 keep_tmp_output=self.fused_child is not None,
+                                                 serve_tmp_output=serve_tmp_output)
 
             # Indicate that task finished without any errors
             if not self.__cancelled:
                 with self.status_lock:
                     self.__err = False
 
+                # Save result so it can be re-used by future runs
+                if cache_key is not None and self.result_cache.is_cacheable(self.task, output_files):
+                    self.result_cache.store(cache_key, self.task)
+
         except BaseException as e:
             # Handle but do not raise exception if job was externally cancelled
             if self.__cancelled:
@@ -261,6 +414,9 @@ class TaskWorker(Thread):
         self.set_status(self.CANCELLING)
         self.__cancelled = True
 
+        # Stop waiting for platform resources
+        self.platform.cancel_resource_request(self.task.get_ID())
+
         if self.proc is not None:
             # Prevent further commands from being run on processor
             self.proc.stop()
@@ -275,8 +431,296 @@ class TaskWorker(Thread):
         with self.status_lock:
             return self.__cancelled
 
+    def __resolve_without_processor(self, task_workspace):
+        # Finish a task without a command on the controller. Returns False if task still needs a processor.
+        # Output files of tasks without a command are always existing input files that are already saved,
+        # so only files kept as final output need to be copied
+        final_output_types  = self.task.get_final_output_keys()
+        final_output_files  = [output_file for output_file in self.datastore.get_task_output_files(self.task.get_ID())
+                               if output_file.get_type() in final_output_types]
+
+        # Final output can only be copied without a processor if there's a storage helper on the controller
+        if len(final_output_files) > 0 and self.storage_helper is None:
+            return False
+
+        logging.debug("(%s) Task has no command. Resolving output without a processor." % self.task.get_ID())
+        self.set_status(self.FINALIZING)
+
+        # Copy final output files to task's output dir
+        job_names = []
+        output_dir = task_workspace.get_output_dir()
+        for count, output_file in enumerate(final_output_files):
+            job_name = "save_output_%s_%s_%s" % (self.task.get_ID(), output_file.get_type(), count)
+            self.storage_helper.mv(output_file.get_transferrable_path(), output_dir, job_name=job_name)
+            job_names.append(job_name)
+        for job_name in job_names:
+            self.storage_helper.proc.wait_process(job_name)
+        for output_file in final_output_files:
+            output_file.update_path(new_dir=output_dir)
+
+        # Indicate that task finished without any errors
+        if not self.__cancelled:
+            with self.status_lock:
+                self.__err = False
+        return True
+
+    def __run_inline(self):
+        # Run an inline module on the controller. Returns False if task still needs a processor.
+        input_file = self.module.get_arguments()[self.module.inline_input_key].get_value()
+        if not isinstance(input_file, GAPFile) or input_file.is_flagged("docker"):
+            return False
+
+        # Inline modules can't produce output files
+        if len(self.datastore.get_task_output_files(self.task.get_ID())) > 0:
+            return False
+
+        # Read one more byte than allowed to detect files over the limit
+        try:
+            contents = self.platform.read_file(input_file.get_path(), TaskWorker.INLINE_MAX_BYTES + 1)
+        except BaseException as e:
+            logging.warning("(%s) Unable to read inline input on the controller! Running task on a processor instead."
+                            % self.task.get_ID())
+            if str(e) != "":
+                logging.warning("Received the following message:\n%s" % e)
+            return False
+
+        if contents is None:
+            return False
+
+        if len(contents) > TaskWorker.INLINE_MAX_BYTES:
+            if not self.module.inline_partial_input:
+                logging.debug("(%s) Inline input is too large to parse on the controller. Running task on a processor."
+                              % self.task.get_ID())
+                return False
+            contents = contents[:TaskWorker.INLINE_MAX_BYTES]
+
+        # Parse input the same way module parses its command output
+        logging.debug("(%s) Running task inline on the controller." % self.task.get_ID())
+        self.set_status(self.RUNNING)
+        self.module.process_inline_input(contents)
+        self.set_status(self.FINALIZING)
+
+        # Indicate that task finished without any errors
+        if not self.__cancelled:
+            with self.status_lock:
+                self.__err = False
+        return True
+
+    def __get_streamed_paths(self, input_files):
+        # Return remote paths of inputs streamed into the task's command through named pipes instead of being downloaded
+        if not self.task.is_input_streamed() or len(self.module.streamable_inputs) == 0:
+            return set()
+
+        # Commands can't be restarted halfway through a stream after a preemption
+        if getattr(self.platform, "is_preemptible", False):
+            logging.warning("(%s) Input can't be streamed on preemptible processors! Downloading input instead."
+                            % self.task.get_ID())
+            return set()
+
+        # Input can only be streamed into a single command that runs start to finish
+        if isinstance(self.module.get_command(), list):
+            return set()
+
+        # Each pipe can only be read once
+        paths = [input_file.get_transferrable_path() for input_file in input_files
+                 if input_file.get_type() in self.module.streamable_inputs
+                 and input_file.is_remote() and not input_file.is_flagged("fused")]
+        streamed_paths = set([path for path in paths if paths.count(path) == 1])
+        if len(streamed_paths) > 0:
+            logging.info("(%s) Streaming %d input files into command." % (self.task.get_ID(), len(streamed_paths)))
+        return streamed_paths
+
+    def __prepare_stream(self):
+        # Set up the task fused after this one to read this task's output through named pipes
+        # Returns the child's command, the (pipe path, child input) pairs and the child's other inputs,
+        # or None if the output can't be streamed
+        child = self.fused_child
+        if child is None or len(self.module.streamable_outputs) == 0 or len(child.module.streamable_inputs) == 0:
+            return None
+
+        # Commands can't be restarted halfway through a stream after a preemption
+        if getattr(self.proc, "is_preemptible", False):
+            return None
+
+        # Only temporary output can be streamed since nothing is left to save afterwards
+        output_files = self.datastore.get_task_output_files(self.task.get_ID())
+        final_output_types = self.task.get_final_output_keys()
+        streamable_paths = [output_file.get_path() for output_file in output_files
+                            if output_file.get_type() in self.module.streamable_outputs
+                            and output_file.get_type() not in final_output_types]
+        if len(streamable_paths) == 0:
+            return None
+
+        # Set child inputs before this task's output exists
+        child_id = child.get_ID()
+        self.datastore.set_task_input_args(child_id, is_streamed=True)
+        child_workspace = self.datastore.get_task_workspace(task_id=child_id)
+
+        # Every output the child reads from this task has to be streamed since the child starts before it's written
+        output_paths = [output_file.get_path() for output_file in output_files]
+        streams, other_inputs = [], []
+        for input_file in self.datastore.get_task_input_files(child_id):
+            if input_file.get_path() not in output_paths:
+                other_inputs.append(input_file)
+            elif input_file.get_path() in streamable_paths and input_file.get_type() in child.module.streamable_inputs:
+                streams.append((input_file.get_path(), input_file))
+            else:
+                return None
+
+        # Each pipe can only be read once
+        pipe_paths = [pipe_path for pipe_path, _ in streams]
+        if len(streams) == 0 or len(set(pipe_paths)) != len(pipe_paths):
+            return None
+
+        # Child reads pipes through links in its own workspace
+        for _, input_file in streams:
+            input_file.update_path(new_dir=child_workspace.get_wrk_dir())
+
+        # Child command has to be a single command that runs start to finish
+        child.module.set_output_dir(child_workspace.get_wrk_out_dir())
+        child_cmd = child.module.update_command()
+        if child_cmd is None or isinstance(child_cmd, list):
+            child.module.output.clear()
+            return None
+
+        return child_cmd, streams, other_inputs
+
+    def __run_streamed(self, child_cmd, streams, other_inputs):
+        # Run task command while the task fused after this one runs its command reading the output through pipes
+        child = self.fused_child
+        child_id = child.get_ID()
+        logging.info("(%s) Streaming output into task '%s'!" % (self.task.get_ID(), child_id))
+
+        # Create child workspace and load the child inputs that don't come from this task
+        child_docker_image = None
+        if child.get_docker_image_id() is not None:
+            child_docker_image = self.datastore.get_docker_image(docker_id=child.get_docker_image_id())
+        child_executor = ModuleExecutor(task_id=child_id,
+                                        processor=self.proc,
+                                        workspace=self.datastore.get_task_workspace(task_id=child_id),
+                                        docker_image=child_docker_image)
+        child_executor.load_input(other_inputs)
+
+        # Create pipes in place of output files and link them into the child workspace
+        pipe_paths = [pipe_path for pipe_path, _ in streams]
+        cmd = " && ".join(["sudo mkfifo -m 777 %s && sudo ln %s %s" % (pipe_path, pipe_path, input_file.get_path())
+                           for pipe_path, input_file in streams])
+        self.proc.run(job_name="make_pipes_%s" % self.task.get_ID(), cmd=cmd)
+        self.proc.wait_process("make_pipes_%s" % self.task.get_ID())
+
+        # Stream output can't be saved
+        for output_file in self.datastore.get_task_output_files(self.task.get_ID()):
+            if output_file.get_path() in pipe_paths:
+                output_file.flag("streamed")
+
+        # Processor usage while both commands are running is split between the tasks
+        start_runtime   = self.proc.get_runtime()
+        start_cost      = self.proc.compute_cost()
+
+        # Start child reading from the pipes, then run task writing to them
+        # Neither command is retried as a retry can't re-read the part of the stream that was already read
+        child_executor.set_processor_dirs()
+        child_executor.run(child_cmd, job_name=child_id, num_retries=0, wait=False)
+        self.module_executor.set_processor_dirs()
+        try:
+            out, err = self.module_executor.run(self.cmd, num_retries=0)
+        except BaseException:
+            # Close pipes that were never opened so child command doesn't wait forever
+            if not self.__cancelled:
+                self.__close_pipes(pipe_paths, child_id)
+            raise
+
+        child_out, child_err = self.proc.wait_process(child_id)
+        child.module.process_cmd_output(child_out, child_err)
+        self.streamed_cmd = child_cmd
+
+        # Charge child for half of the processor usage while both were running
+        self.streamed_share = ((self.proc.get_runtime() - start_runtime) / 2.0,
+                               (self.proc.compute_cost() - start_cost) / 2.0)
+        return out, err
+
+    def __close_pipes(self, pipe_paths, child_id):
+        # Open pipes for writing so the reading command sees the end of the stream and exits
+        try:
+            cmd = " ; ".join(["sudo timeout 5 sh -c 'true > %s' || true" % pipe_path for pipe_path in pipe_paths])
+            self.proc.run(job_name="close_pipes_%s" % self.task.get_ID(), cmd=cmd, num_retries=0)
+            self.proc.wait_process("close_pipes_%s" % self.task.get_ID())
+            self.proc.wait_process(child_id)
+        except BaseException as e:
+            logging.warning("(%s) Unable to stop streaming into task '%s'!" % (self.task.get_ID(), child_id))
+            if str(e) != "":
+                logging.warning("Received the following message:\n%s" % e)
+
+    def __finish_streamed_task(self):
+        # Save output of task whose command was already run by the task fused before it
+        logging.info("(%s) Task was run while streaming output of task '%s'. Saving output."
+                     % (self.task.get_ID(), self.stream_parent.get_task().get_ID()))
+
+        # Processor was handed off by the task fused before this one
+        self.proc = self.platform.get_leased_processor(self.task.get_ID())
+        if self.proc is None:
+            logging.error("(%s) Processor holding output of streamed task was not handed off!" % self.task.get_ID())
+            raise RuntimeError("Task '%s' lost its output when its processor wasn't handed off!" % self.task.get_ID())
+
+        # Charge task for its share of the processor while it was running with the task before it
+        share_runtime, share_cost = self.stream_parent.get_streamed_share()
+        self.proc_start_time    = time.time()
+        self.proc_start_runtime = self.proc.get_runtime() - share_runtime
+        self.proc_start_cost    = self.proc.compute_cost() - share_cost
+        self.cmd                = self.stream_parent.get_streamed_cmd()
+
+        # Check to see if pipeline has been cancelled
+        self.__check_cancelled()
+
+        # Create module executor in task's existing workspace
+        task_workspace = self.datastore.get_task_workspace(task_id=self.task.get_ID())
+        docker_image = None
+        if self.task.get_docker_image_id() is not None:
+            docker_image = self.datastore.get_docker_image(docker_id=self.task.get_docker_image_id())
+        self.module_executor = ModuleExecutor(task_id=self.task.get_ID(),
+                                              processor=self.proc,
+                                              workspace=task_workspace,
+                                              docker_image=docker_image)
+
+        # Save output files in workspace output dirs (if any)
+        self.set_status(self.FINALIZING)
+        output_files = self.datastore.get_task_output_files(self.task.get_ID())
+        final_output_types = self.task.get_final_output_keys()
+        if len(output_files) > 0:
+            self.module_executor.save_output(output_files, final_output_types,
+                                             keep_tmp_output=self.fused_child is not None)
+
+        # Indicate that task finished without any errors
+        if not self.__cancelled:
+            with self.status_lock:
+                self.__err = False
+
+    def __load_cached_result(self, cache_key):
+        # Bind task output to a cached result. Returns True if task doesn't need to be run.
+        cached_output = self.result_cache.lookup(cache_key)
+        if cached_output is None:
+            return False
+
+        # Copy cached output files into pipeline output directory
+        task_output = self.module.output
+        self.module.output = cached_output
+        output_files = self.datastore.get_task_output_files(self.task.get_ID())
+        task_workspace = self.datastore.get_task_workspace(task_id=self.task.get_ID())
+        if not self.result_cache.restore(self.task.get_ID(), cache_key, task_workspace.get_output_dir(), output_files):
+            self.module.output = task_output
+            return False
+
+        logging.info("(%s) Re-using output of cached result! Task will not be run." % self.task.get_ID())
+        self.set_status(self.FINALIZING)
+        with self.status_lock:
+            self.__err = False
+        return True
+
     def __clean_up(self):
 
+        # Return resources allocated to task if a processor was never created to use them
+        self.platform.release_resources(self.task.get_ID())
+
         # Do nothing if errors occurred before processor was even created
         if self.proc is None:
             return
@@ -291,6 +735,15 @@ class TaskWorker(Thread):
             if str(e) != "":
                 logging.error("Received following error:\n%s" % e)
 
+        # Give processor to the task fused after this one
+        is_handing_off = self.fused_child is not None and self.is_success()
+        if self.__hand_off_processor():
+            return
+
+        # Give processor back to platform so it can be re-used by another task
+        if self.__return_processor():
+            return
+
         # Try to destroy platform if it's not off
         try:
 
@@ -305,39 +758,84 @@ class TaskWorker(Thread):
             if str(e) != "":
                 logging.error("Received following error:\n%s" % e)
 
-    def __compute_disk_requirements(self, input_files, docker_image, input_multiplier=None):
-        # Compute size of disk needed to store input/output files
-        input_size = 0
+        # Temporary output was lost along with the processor
+        if is_handing_off and not self.is_success():
+            raise RuntimeError("Task '%s' lost its output when its processor couldn't be handed off!" % self.task.get_ID())
 
-        # Add size of docker image if one needs to be loaded for task
-        if docker_image is not None:
-            input_size += docker_image.get_size()
+    def __hand_off_processor(self):
+        # Hand processor and temporary output to the task fused after this one. Returns False if there isn't one.
+        if self.fused_child is None or self.__cancelled or self.__err or self.module_executor is None:
+            return False
 
-        # Add sizes of each input file
-        for input_file in input_files:
-            # Overestimate for gzipped files
-            if input_file.get_path().endswith(".gz"):
-                input_size += input_file.get_size()*5
-            else:
-                input_size += input_file.get_size()
+        try:
+            # Clear out everything but the task output
+            self.module_executor.clean_workspace(keep_output=True)
+            self.proc.clear_processes()
 
-        # Obtain the input multiplier if not provided
-        if input_multiplier is None:
-            input_multiplier = self.platform.config.get("input_multiplier", 5)
+            # Stop charging task for processor, including the share of the processor used by a streamed task
+            self.proc_end_runtime   = self.proc.get_runtime() - self.streamed_share[0]
+            self.proc_end_cost      = self.proc.compute_cost() - self.streamed_share[1]
 
-        # Set size of desired disk
-        disk_size = int(math.ceil(input_multiplier * input_size))
+            if self.platform.hand_off_processor(self.proc, self.fused_child.get_ID()):
+                return True
 
-        # Make sure platform can create a disk that size
-        min_disk_size = self.platform.get_min_disk_space()
-        max_disk_size = self.platform.get_max_disk_space()
+        except BaseException as e:
+            # Temporary output only exists on the processor so task can't be used without it
+            logging.error("Unable to hand off processor '%s' to task '%s'. Processor will be destroyed."
+                          % (self.proc.get_name(), self.fused_child.get_ID()))
+            if str(e) != "":
+                logging.error("Received following error:\n%s" % e)
+            with self.status_lock:
+                self.__err = True
+
+        # Processor will be destroyed so charge task for it
+        self.proc_end_runtime   = None
+        self.proc_end_cost      = None
+        return False
+
+    def __return_processor(self):
+        # Return processor to platform's pool of idle processors. Returns False if processor needs to be destroyed.
+
+        # Only re-use healthy processors from tasks that succeeded
+        if self.__cancelled or self.__err or self.module_executor is None or self.platform.get_idle_processor_ttl() <= 0:
+            return False
+
+        served_files = self.module_executor.get_served_files()
+        try:
+            # Clear out task files and processes
+            # Saved output is kept on processor so tasks that read it can be placed on the processor
+            saved_files = self.module_executor.get_saved_files()
+            self.module_executor.clean_workspace(keep_output=len(saved_files) + len(served_files) > 0)
+            self.proc.clear_processes()
+
+            # Stop charging task for processor
+            self.proc_end_runtime   = self.proc.get_runtime()
+            self.proc_end_cost      = self.proc.compute_cost()
 
-        # Must be at least as big as minimum disk size
-        disk_size = disk_size + min_disk_size
+            if self.platform.return_processor(self.proc, local_files=saved_files, served_files=served_files,
+                                              uploader=self.module_executor.upload_served_files):
+                return True
 
-        # And smaller than max disk size
-        disk_size = min(disk_size, max_disk_size)
-        return disk_size
+        except BaseException as e:
+            logging.warning("Unable to return processor '%s' for re-use. Processor will be destroyed." % self.proc.get_name())
+            if str(e) != "":
+                logging.warning("Received following error:\n%s" % e)
+
+        # Processor will be destroyed so charge task for it
+        self.proc_end_runtime   = None
+        self.proc_end_cost      = None
+
+        # Served output has to be uploaded before processor is destroyed
+        if len(served_files) > 0:
+            try:
+                self.module_executor.upload_served_files()
+            except BaseException as e:
+                logging.error("(%s) Unable to upload temporary output before processor was destroyed!" % self.task.get_ID())
+                if str(e) != "":
+                    logging.error("Received following error:\n%s" % e)
+                with self.status_lock:
+                    self.__err = True
+        return False
 
     def __check_cancelled(self):
         if self.__cancelled:
@@ -1,11 +1,43 @@
 import logging
+import threading
+import requests
 
 class DockerHelper(object):
     # Class designed to facilitate remote file manipulations for a processor
 
-    def __init__(self, proc):
+    # Default registry and namespace of images that don't specify one
+    DEFAULT_REGISTRY    = "registry-1.docker.io"
+    DEFAULT_NAMESPACE   = "library"
+
+    # Manifest formats accepted from registries
+    MANIFEST_TYPES = ["application/vnd.docker.distribution.manifest.v2+json",
+                      "application/vnd.docker.distribution.manifest.list.v2+json",
+                      "application/vnd.oci.image.manifest.v1+json",
+                      "application/vnd.oci.image.index.v1+json"]
+
+    # Platform of the image picked from multi-platform manifests
+    IMAGE_OS            = "linux"
+    IMAGE_ARCH          = "amd64"
+
+    # Compressed layer sizes in manifests are scaled to approximate the size of the unpacked image
+    LAYER_EXPANSION     = 2.5
+
+    # Seconds to wait for a registry to respond
+    REGISTRY_TIMEOUT    = 30
+
+    # Image sizes (GB) indexed by manifest digest, shared by all helpers
+    image_sizes = {}
+    image_sizes_lock = threading.Lock()
+
+    def __init__(self, proc, image_cache=None):
         self.proc = proc
 
+        # Optional persistent index of image sizes by manifest digest (InputCache)
+        self.image_cache = image_cache
+
+        # Images already looked up in their registry: image name -> (digest, size)
+        self.registry_images = {}
+
     def pull(self, image_name, job_name=None, log=True, **kwargs):
         # Pull docker image on local processor
         cmd = "sudo docker pull %s" % image_name
@@ -22,6 +54,11 @@ class DockerHelper(object):
     def image_exists(self, image_name, job_name=None, **kwargs):
         # Return true if file exists, false otherwise
 
+        # Check the image manifest in its registry so the image doesn't need to be pulled
+        registry_image = self.__get_registry_image(image_name)
+        if registry_image is not None:
+            return registry_image is not False
+
         # Run command and return job name
         job_name = "check_exists_%s" % image_name if job_name is None else job_name
 
@@ -40,6 +77,12 @@ class DockerHelper(object):
 
     def get_image_size(self, image_name, job_name=None, **kwargs):
         # Return file size in gigabytes
+
+        # Use size of image layers listed in its manifest if registry could be reached
+        registry_image = self.__get_registry_image(image_name)
+        if registry_image:
+            return registry_image[1]
+
         cmd = "sudo docker image inspect %s --format='{{.Size}}'" % image_name
 
         # Run command and return job name
@@ -60,3 +103,136 @@ class DockerHelper(object):
             if str(e) != "":
                 logging.error("Received the following msg:\n%s" % e)
             raise
+
+    def __get_registry_image(self, image_name):
+        # Return (digest, size) of image from its registry manifest, False if the image doesn't exist
+        # Returns None if registry couldn't be queried, in which case the image is checked by pulling it
+        if image_name not in self.registry_images:
+            try:
+                self.registry_images[image_name] = self.__inspect_manifest(image_name)
+            except BaseException as e:
+                logging.debug("Unable to query registry for docker image %s. Image will be pulled instead. "
+                              "Received the following msg:\n%s" % (image_name, e))
+                self.registry_images[image_name] = None
+        return self.registry_images[image_name]
+
+    def __inspect_manifest(self, image_name):
+        # Look up digest of image manifest and compute image size from its layers
+        registry, repo, reference = DockerHelper.__parse_image_name(image_name)
+        url = "https://%s/v2/%s/manifests/%s" % (registry, repo, reference)
+        session = requests.Session()
+        session.headers["Accept"] = ", ".join(DockerHelper.MANIFEST_TYPES)
+
+        # Only the digest is needed if the size of the image has been computed before
+        resp = self.__request_manifest(session, "HEAD", url)
+        if resp is None:
+            return False
+        digest = resp.headers.get("Docker-Content-Digest")
+        size = self.__lookup_size(digest)
+        if size is not None:
+            logging.debug("Docker image %s (%s) found in registry. Size from cache: %s GB" % (image_name, digest, size))
+            return digest, size
+
+        # Get manifest and sum its layer sizes
+        resp = self.__request_manifest(session, "GET", url)
+        if resp is None:
+            return False
+        manifest = resp.json()
+        digest = resp.headers.get("Docker-Content-Digest", digest)
+
+        # Pick image built for the platform from multi-platform manifests
+        if "manifests" in manifest:
+            platform_digest = None
+            for entry in manifest["manifests"]:
+                platform = entry.get("platform", {})
+                if platform.get("os") == DockerHelper.IMAGE_OS and platform.get("architecture") == DockerHelper.IMAGE_ARCH:
+                    platform_digest = entry["digest"]
+                    break
+            if platform_digest is None:
+                logging.error("Docker image %s has no %s/%s image!" % (image_name, DockerHelper.IMAGE_OS, DockerHelper.IMAGE_ARCH))
+                return False
+            url = "https://%s/v2/%s/manifests/%s" % (registry, repo, platform_digest)
+            resp = self.__request_manifest(session, "GET", url)
+            if resp is None:
+                return False
+            manifest = resp.json()
+
+        if "layers" not in manifest:
+            raise RuntimeError("Unsupported manifest format: %s" % manifest.get("mediaType", manifest.get("schemaVersion")))
+
+        # Add up compressed layers and divide by billion bytes
+        num_bytes = sum([layer["size"] for layer in manifest["layers"]]) + manifest.get("config", {}).get("size", 0)
+        size = num_bytes * DockerHelper.LAYER_EXPANSION / (1024**3.0)
+        logging.debug("Docker image %s (%s) found in registry. Size from manifest: %s GB" % (image_name, digest, size))
+
+        self.__store_size(digest, size)
+        return digest, size
+
+    def __request_manifest(self, session, method, url):
+        # Request manifest from registry, authenticating with an anonymous token if the registry asks for one
+        # Returns None if manifest doesn't exist
+        resp = session.request(method, url, timeout=DockerHelper.REGISTRY_TIMEOUT)
+        if resp.status_code == 401 and "Authorization" not in session.headers:
+            session.headers["Authorization"] = "Bearer %s" % DockerHelper.__get_token(resp.headers.get("WWW-Authenticate", ""))
+            resp = session.request(method, url, timeout=DockerHelper.REGISTRY_TIMEOUT)
+        if resp.status_code == 404:
+            return None
+        resp.raise_for_status()
+        return resp
+
+    def __lookup_size(self, digest):
+        if digest is None:
+            return None
+        with DockerHelper.image_sizes_lock:
+            size = DockerHelper.image_sizes.get(digest)
+        if size is None and self.image_cache is not None:
+            size = self.image_cache.lookup_image(digest)
+        return size
+
+    def __store_size(self, digest, size):
+        if digest is None:
+            return
+        with DockerHelper.image_sizes_lock:
+            DockerHelper.image_sizes[digest] = size
+        if self.image_cache is not None:
+            self.image_cache.store_image(digest, size)
+
+    @staticmethod
+    def __get_token(challenge):
+        # Get anonymous bearer token from the auth server named in a registry's challenge
+        if not challenge.startswith("Bearer "):
+            raise RuntimeError("Unsupported registry authentication: %s" % challenge)
+        params = {}
+        for param in challenge[len("Bearer "):].split(","):
+            key, _, value = param.strip().partition("=")
+            params[key] = value.strip('"')
+        realm = params.pop("realm")
+        resp = requests.get(realm, params=params, timeout=DockerHelper.REGISTRY_TIMEOUT)
+        resp.raise_for_status()
+        token = resp.json()
+        return token.get("token", token.get("access_token"))
+
+    @staticmethod
+    def __parse_image_name(image_name):
+        # Split image name into registry, repository, and tag or digest
+        registry = DockerHelper.DEFAULT_REGISTRY
+        parts = image_name.split("/", 1)
+        if len(parts) > 1 and ("." in parts[0] or ":" in parts[0] or parts[0] == "localhost"):
+            registry, repo = parts
+            if registry == "docker.io":
+                registry = DockerHelper.DEFAULT_REGISTRY
+        else:
+            repo = image_name
+
+        # Digest references take precedence over tags
+        if "@" in repo:
+            repo, reference = repo.split("@", 1)
+        elif ":" in repo.split("/")[-1]:
+            repo, reference = repo.rsplit(":", 1)
+        else:
+            reference = "latest"
+
+        # Official images live in the library namespace of the default registry
+        if registry == DockerHelper.DEFAULT_REGISTRY and "/" not in repo:
+            repo = "%s/%s" % (DockerHelper.DEFAULT_NAMESPACE, repo)
+        return registry, repo, reference
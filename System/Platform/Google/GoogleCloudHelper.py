@@ -431,6 +431,21 @@ class GoogleCloudHelper(object):
             out_files.remove("")
         return out_files
 
+    @staticmethod
+    def cat(gs_path, max_bytes=None):
+        # Return raw contents of file on google storage, optionally only the first max_bytes
+        byte_range = "" if max_bytes is None else "-r 0-%d" % (max_bytes - 1)
+        cmd = "gsutil cat %s %s" % (byte_range, gs_path)
+
+        # Output may be binary so it isn't decoded
+        proc = sp.Popen(cmd, shell=True, stdout=sp.PIPE, stderr=sp.PIPE)
+        out, err = proc.communicate()
+        if proc.returncode != 0:
+            logging.error("Unable to read file on google storage path: %s" % gs_path)
+            logging.error("The following error appeared:\n    %s" % err.decode("utf8"))
+            raise RuntimeError("GoogleCloudHelper command error!")
+        return out
+
     @staticmethod
     def get_external_ip(name, zone):
         cmd = "gcloud compute instances list --format=\"csv(NAME,EXTERNAL_IP)\" " \
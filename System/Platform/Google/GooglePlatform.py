@@ -4,6 +4,7 @@ import subprocess as sp
 import tempfile
 
 from System.Platform import Platform
+from System.Workers import FunctionThread
 from System.Platform.Google import Instance, PreemptibleInstance, GoogleCloudHelper
 
 class GooglePlatform(Platform):
@@ -45,6 +46,27 @@ class GooglePlatform(Platform):
                           % self.final_output_dir)
             raise IOError("Invalid final output directory!")
 
+        # Query Google Cloud for the bucket, disk image, and reporting topic in parallel as they don't depend on each other
+        probes = [FunctionThread(self.__validate_bucket, "Unable to validate final output bucket"),
+                  FunctionThread(self.__validate_disk_image, "Unable to validate disk image"),
+                  FunctionThread(self.__validate_report_topic, "Unable to validate reporting topic")]
+        for probe in probes:
+            probe.start()
+
+        # Wait for all probes before raising the first error
+        errors = []
+        for probe in probes:
+            try:
+                probe.finalize()
+            except BaseException as e:
+                errors.append(e)
+        if len(errors) > 0:
+            raise errors[0]
+
+        # Indicate that report topic exists and has been validated
+        self.report_topic_validated = True
+
+    def __validate_bucket(self):
         # Make gs bucket if it doesn't exists already
         gs_bucket = GoogleCloudHelper.get_bucket_from_path(self.final_output_dir)
         if not GoogleCloudHelper.bucket_exists(gs_bucket):
@@ -52,19 +74,18 @@ class GooglePlatform(Platform):
             region = GoogleCloudHelper.get_region(self.zone)
             GoogleCloudHelper.mb(gs_bucket, project=self.google_project, region=region)
 
+    def __validate_disk_image(self):
         # Set the minimum disk size based on size of disk image
         disk_image = self.config["task_processor"]["disk_image"]
         disk_image_info = GoogleCloudHelper.get_disk_image_info(disk_image)
         self.MIN_DISK_SPACE = int(disk_image_info["diskSizeGb"])
 
+    def __validate_report_topic(self):
         # Check to see if the reporting Pub/Sub topic exists
         if not GoogleCloudHelper.pubsub_topic_exists(self.report_topic):
             logging.error("Reporting topic '%s' was not found!" % self.report_topic)
             raise IOError("Reporting topic '%s' not found!" % self.report_topic)
 
-        # Indicate that report topic exists and has been validated
-        self.report_topic_validated = True
-
     def init_helper_processor(self, name, nr_cpus, mem, disk_space):
         # Googlefy instance name
         name = self.__format_instance_name(name)
@@ -118,6 +139,12 @@ class GooglePlatform(Platform):
         if self.report_topic_validated:
             GoogleCloudHelper.send_pubsub_message(self.report_topic, message=dest_path, encode=True, compress=True)
 
+    def read_file(self, path, max_bytes):
+        # Read start of file on Google Storage from the controller
+        if not path.startswith("gs://"):
+            return None
+        return GoogleCloudHelper.cat(path, max_bytes=max_bytes)
+
     def clean_up(self):
 
         logging.info("Cleaning up Google Cloud Platform.")
@@ -52,6 +52,9 @@ class Instance(Processor):
         # Initialize extenal IP
         self.external_IP = None
 
+        # Initialize internal IP used by other instances on the same network
+        self.internal_IP = None
+
     def update_status(self):
 
         # Initialize the number of retries
@@ -64,8 +67,9 @@ class Instance(Processor):
                 # Obtain the instance information
                 data = GoogleCloudHelper.describe(self.name, self.zone)
 
-                # Update the external IP address
+                # Update the external and internal IP addresses
                 self.external_IP = data["networkInterfaces"][0]["accessConfigs"][0].get("natIP", None)
+                self.internal_IP = data["networkInterfaces"][0].get("networkIP", None)
 
                 # Set the status accordingly
                 if data["status"] in ["TERMINATED", "STOPPING"]:
@@ -88,6 +92,7 @@ class Instance(Processor):
 
                 # Update the external IP address
                 self.external_IP = None
+                self.internal_IP = None
 
                 # Set the status to OFF
                 self.set_status(Processor.OFF)
@@ -120,6 +125,12 @@ class Instance(Processor):
               "{0}@{1} -- '{2}'".format(getpass.getuser(), self.external_IP, cmd)
         return cmd
 
+    def get_peer_address(self):
+        # Obtain the internal IP in case is not set
+        if self.internal_IP is None:
+            self.update_status()
+        return self.internal_IP
+
     def create(self):
 
         if self.is_locked():
@@ -307,7 +318,8 @@ class Instance(Processor):
                      cmd=proc_obj.get_command(),
                      num_retries=proc_obj.get_num_retries() - 1,
                      docker_image=proc_obj.get_docker_image(),
-                     quiet_failure=proc_obj.is_quiet())
+                     quiet_failure=proc_obj.is_quiet(),
+                     stdin_file=proc_obj.get_stdin_file())
 
         # Raise error if cmd failed and no retries left
         else:
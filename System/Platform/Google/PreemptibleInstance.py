@@ -136,7 +136,8 @@ class PreemptibleInstance(Instance):
                 self.run(job_name=proc_name,
                          cmd=proc_obj.get_command(),
                          docker_image=proc_obj.get_docker_image(),
-                         quiet_failure=proc_obj.is_quiet())
+                         quiet_failure=proc_obj.is_quiet(),
+                         stdin_file=proc_obj.get_stdin_file())
                 self.wait_process(proc_name)
 
             # Exit function as the rest of the code is related to an instance that was not destroyed
@@ -215,7 +216,8 @@ class PreemptibleInstance(Instance):
                 self.run(job_name=proc_name,
                          cmd=proc_obj.get_command(),
                          docker_image=proc_obj.get_docker_image(),
-                         quiet_failure=proc_obj.is_quiet())
+                         quiet_failure=proc_obj.is_quiet(),
+                         stdin_file=proc_obj.get_stdin_file())
                 self.wait_process(proc_name)
 
     def get_runtime(self):
@@ -367,7 +369,8 @@ class PreemptibleInstance(Instance):
                      cmd=proc_obj.get_command(),
                      num_retries=proc_obj.get_num_retries() - 1,
                      docker_image=proc_obj.get_docker_image(),
-                     quiet_failure=proc_obj.is_quiet())
+                     quiet_failure=proc_obj.is_quiet(),
+                     stdin_file=proc_obj.get_stdin_file())
 
         # Raise error if command failed, has no retries, and wasn't caused by preemption
         else:
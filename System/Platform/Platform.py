@@ -1,7 +1,13 @@
 import logging
 import abc
 import uuid
+import time
 import threading
+import os
+import shutil
+import tempfile
+import subprocess as sp
+from collections import OrderedDict
 
 from Config import ConfigParser
 
@@ -54,6 +60,9 @@ class Platform(object, metaclass=abc.ABCMeta):
         # Platform resource threading lock
         self.platform_lock = threading.Lock()
 
+        # Condition used to wake tasks once they've been admitted to the platform
+        self.admission_cond = threading.Condition(self.platform_lock)
+
         # Boolean flag to lock processor creation upon cleanup
         self.__locked = False
 
@@ -64,6 +73,69 @@ class Platform(object, metaclass=abc.ABCMeta):
 
         self.dealloc_procs = []
 
+        # Resources requested by tasks that are waiting to be admitted to the platform
+        self.resource_requests = OrderedDict()
+        self.__nr_requests = 0
+
+        # Waiting task that holds a reservation on freed resources so smaller tasks can't starve it
+        self.reserved_request = None
+
+        # Resources admitted tasks are holding until their processor is created
+        self.allocations = {}
+
+        # Minutes an idle processor is kept around for re-use before being destroyed (0 = never re-use processors)
+        self.idle_processor_ttl = self.config.get("idle_processor_ttl", 0)
+
+        # Created processors waiting to be re-used: name -> (processor, time it became idle, cost when it became idle)
+        self.idle_processors = OrderedDict()
+
+        # Idle processors handed to admitted tasks that haven't picked them up yet
+        self.leased_processors = {}
+
+        # Number of idle processors being destroyed to make room for waiting tasks
+        self.nr_evicting = 0
+
+        # Runtime and cost of processors while they were sitting idle
+        self.idle_runtime = 0
+        self.idle_cost = 0
+
+        # Thread that destroys processors that have been idle for too long
+        self.idle_reaper = None
+
+        # Processors created ahead of tasks that are expected to become ready soon and that haven't been used yet
+        self.speculative_procs = set()
+        self.nr_speculative = 0
+
+        # Speculative processors are reserved for their task until it's launched, the reservation is cancelled,
+        # or the processor has sat unused for longer than the idle processor TTL
+        # Processors being created: task id -> (nr_cpus, mem, disk space)
+        # Created processors: task id -> (processor, time it became idle, cost when it became idle)
+        self.pending_reservations = {}
+        self.reserved_processors = {}
+
+        # Output files left on idle processors by the last task that ran on them: name -> {remote path: local path}
+        # Tasks are placed on processors already holding their input so it doesn't need to be downloaded again
+        self.local_files = {}
+
+        # Temporary output served by idle processors straight to the processors of tasks that read it
+        # Remote path where file will be uploaded if processor is destroyed -> (processor, local path)
+        self.served_files = {}
+
+        # Functions that upload the files served by a processor, number of transfers reading from each processor,
+        # and processors uploading their served files before being destroyed
+        self.file_uploaders = {}
+        self.peer_readers = {}
+        self.closing_servers = set()
+
+        # Processors each task is reading served files from
+        self.peer_transfers = {}
+
+        # Key processors use to authenticate with each other: (private key, public key)
+        # Private key is kept in a file on the controller so it never appears in a command
+        self.peer_key = None
+        self.peer_key_dir = None
+        self.peer_key_lock = threading.Lock()
+
     def get_processor(self, task_id, nr_cpus, mem, disk_space):
         # Initialize new processor and register with platform
 
@@ -93,10 +165,16 @@ class Platform(object, metaclass=abc.ABCMeta):
             logging.debug("(%s) We are starting to put that processor in the spot..." % task_id)
             if proc_name not in self.processors:
                 self.processors[proc_name]    = processor
-                self.cpu += processor.get_nr_cpus()
-                self.mem += processor.get_mem()
-                self.disk_space += processor.get_disk_space()
+
+                # Swap resources allocated at admission for the resources actually used by the processor
+                alloc_cpus, alloc_mem, alloc_disk_space = self.allocations.pop(task_id, (0, 0, 0))
+                self.cpu += processor.get_nr_cpus() - alloc_cpus
+                self.mem += processor.get_mem() - alloc_mem
+                self.disk_space += processor.get_disk_space() - alloc_disk_space
                 logging.debug("(%s) We put that processor in the spot!" % proc_name)
+
+                # Processor may be smaller than what was allocated
+                self.__admit_requests()
             else:
                 logging.error("Platform cannot create task processor with duplicate id: '%s'!" % proc_name)
                 raise RuntimeError("Platform attempted to create duplicate task processor!")
@@ -129,13 +207,298 @@ class Platform(object, metaclass=abc.ABCMeta):
 
         return self.processors["helper"]
 
-    def can_make_processor(self, req_cpus, req_mem, req_disk_space):
-        logging.info("\n{0}".format(self.__get_curr_usage_string()))
+    def request_resources(self, task_id, req_cpus, req_mem, req_disk_space, priority=0, input_sizes=None):
+        # Block until platform admits task with the requested resources
+        # Returns False if the request was cancelled or the platform was locked before it could be admitted
+        # Input sizes (remote path -> size) are used to prefer idle processors that already hold the task's input
+
+        # Make sure the request could ever be satisfied
+        self.__check_processor(task_id, req_cpus, req_mem, req_disk_space)
+
+        with self.admission_cond:
+            if self.__locked:
+                return False
+
+            # Task already has a processor handed to it by the task it was fused with
+            if task_id in self.leased_processors:
+                return True
+
+            # Use processor created ahead of time for task if it turned out to be big enough
+            if self.__claim_reserved_processor(task_id, req_cpus, req_mem, req_disk_space):
+                return True
+
+            # Get in line behind requests with the same or higher priority
+            self.resource_requests[task_id] = (priority, self.__nr_requests, req_cpus, req_mem, req_disk_space,
+                                               input_sizes or {})
+            self.__nr_requests += 1
+            self.__admit_requests()
+
+            # Wait to be admitted
+            while task_id in self.resource_requests:
+                self.admission_cond.wait()
+
+            return task_id in self.allocations or task_id in self.leased_processors
+
+    def get_leased_processor(self, task_id):
+        # Return idle processor handed to task at admission or None if task needs a new processor
+        with self.platform_lock:
+            processor = self.leased_processors.pop(task_id, None)
+        if processor is not None:
+            logging.info("Re-using processor '%s' for task '%s'!" % (processor.get_name(), task_id))
+        return processor
+
+    def return_processor(self, proc, local_files=None, served_files=None, uploader=None):
+        # Add processor to pool of idle processors so it can be re-used by another task
+        # Local files (remote path -> local path) are copies of task output kept on the processor
+        # Served files (remote path -> local path) haven't been uploaded and are served to other processors
+        # until processor is destroyed, at which point uploader is called to upload them
+        # Returns False if platform isn't re-using processors and processor should be destroyed instead
+        with self.admission_cond:
+            if self.__locked or self.idle_processor_ttl <= 0 or proc.get_name() not in self.processors:
+                return False
+
+            logging.debug("(%s) Processor is now idle!" % proc.get_name())
+            if local_files:
+                self.local_files[proc.get_name()] = dict(local_files)
+            if served_files:
+                logging.debug("(%s) Processor is serving %d files!" % (proc.get_name(), len(served_files)))
+                for remote_path, local_path in served_files.items():
+                    self.served_files[remote_path] = (proc, local_path)
+                self.file_uploaders[proc.get_name()] = uploader
+            self.__add_idle_processor(proc, time.time(), proc.compute_cost())
+        return True
+
+    def can_serve_files(self, proc):
+        # Determine whether processor can keep temporary output and serve it to other processors
+        return self.idle_processor_ttl > 0 and proc.get_peer_address() is not None
+
+    def get_peer_files(self, task_id, remote_paths):
+        # Return files served by other processors that can be transferred instead of being downloaded
+        # (remote path -> (processor address, local path)). Processors can't be destroyed until transfers are released.
+        with self.admission_cond:
+            # Wait for processors to finish uploading files that are about to be transferred
+            while any([self.served_files[path][0].get_name() in self.closing_servers
+                       for path in remote_paths if path in self.served_files]):
+                self.admission_cond.wait()
+
+            peer_files = {}
+            for path in remote_paths:
+                if path not in self.served_files:
+                    continue
+                proc, local_path = self.served_files[path]
+                peer_files[path] = (proc, local_path)
+                self.peer_readers[proc.get_name()] = self.peer_readers.get(proc.get_name(), 0) + 1
+                self.peer_transfers.setdefault(task_id, []).append(proc.get_name())
+
+        return {path: (proc.get_peer_address(), local_path) for path, (proc, local_path) in peer_files.items()}
+
+    def release_peer_files(self, task_id):
+        # Allow processors a task was transferring files from to be destroyed
+        with self.admission_cond:
+            for proc_name in self.peer_transfers.pop(task_id, []):
+                self.peer_readers[proc_name] -= 1
+            self.admission_cond.notify_all()
+
+    def forget_served_files(self, remote_paths=None):
+        # Stop serving files once nothing needs them so they aren't uploaded when processors are destroyed
+        # Returns the paths that were being served (default: stop serving every file)
+        with self.platform_lock:
+            if remote_paths is None:
+                remote_paths = list(self.served_files)
+            forgotten = [path for path in remote_paths if self.served_files.pop(path, None) is not None]
+
+            # Processors that aren't serving any more files don't have to upload anything
+            serving_procs = set([proc.get_name() for proc, _ in self.served_files.values()])
+            for proc_name in list(self.file_uploaders):
+                if proc_name not in serving_procs and proc_name not in self.closing_servers:
+                    self.file_uploaders.pop(proc_name)
+        return forgotten
+
+    def get_peer_key(self):
+        # Return (private key file, public key) processors use to authenticate with each other. Key is unique to each run.
+        with self.peer_key_lock:
+            if self.peer_key is None:
+                key_dir = tempfile.mkdtemp()
+                try:
+                    key_file = os.path.join(key_dir, "peer_key")
+                    sp.check_call(["ssh-keygen", "-q", "-t", "ed25519", "-N", "", "-f", key_file])
+                    with open("%s.pub" % key_file) as public_key:
+                        self.peer_key = (key_file, public_key.read().strip())
+                    self.peer_key_dir = key_dir
+                except BaseException:
+                    shutil.rmtree(key_dir, ignore_errors=True)
+                    raise
+            return self.peer_key
+
+    def remove_peer_key(self):
+        # Delete private key from the controller once processors no longer need it
+        with self.peer_key_lock:
+            if self.peer_key_dir is not None:
+                shutil.rmtree(self.peer_key_dir, ignore_errors=True)
+            self.peer_key = None
+            self.peer_key_dir = None
+
+    def get_local_files(self, proc):
+        # Return and forget files left on a processor by the last task that ran on it (remote path -> local path)
+        with self.platform_lock:
+            return self.local_files.pop(proc.get_name(), {})
+
+    def hand_off_processor(self, proc, task_id):
+        # Reserve a processor for the task that will run on it next
+        # Returns False if processor can't be handed off and should be destroyed instead
+        with self.admission_cond:
+            if self.__locked or proc.get_name() not in self.processors:
+                return False
+
+            logging.debug("(%s) Processor handed off to task '%s'!" % (proc.get_name(), task_id))
+            self.leased_processors[task_id] = proc
+        return True
+
+    def provision_speculative_processor(self, task_id, nr_cpus, mem, disk_space):
+        # Start creating a processor reserved for a task that is expected to become ready soon
+        # Returns False if processors aren't being re-used or if resources are needed by tasks that are already waiting
+        spec_id = "spec-%s" % task_id
+        with self.admission_cond:
+            if self.__locked or self.idle_processor_ttl <= 0 or len(self.resource_requests) > 0:
+                return False
+            if task_id in self.pending_reservations or task_id in self.reserved_processors:
+                return False
+            if not self.__fits(nr_cpus, mem, disk_space):
+                return False
+
+            # Allocate resources for processor
+            self.cpu += nr_cpus
+            self.mem += mem
+            self.disk_space += disk_space
+            self.allocations[spec_id] = (nr_cpus, mem, disk_space)
+            self.pending_reservations[task_id] = (nr_cpus, mem, disk_space)
+            self.nr_speculative += 1
+
+        logging.info("(%s) Creating processor ahead of time for task!" % task_id)
+        threading.Thread(target=self.__create_speculative_processor, args=(task_id, nr_cpus, mem, disk_space),
+                         daemon=True).start()
+        return True
+
+    def cancel_speculative_processor(self, task_id):
+        # Release processor created ahead of time for a task that won't use it to the idle pool
+        with self.admission_cond:
+            if self.pending_reservations.pop(task_id, None) is not None:
+                self.__admit_requests()
+            if task_id not in self.reserved_processors:
+                return
+            proc, idle_since, idle_start_cost = self.reserved_processors.pop(task_id)
+            logging.debug("(%s) Releasing processor '%s' created ahead of time for task!" % (task_id, proc.get_name()))
+            self.speculative_procs.add(proc.get_name())
+            self.__add_idle_processor(proc, idle_since, idle_start_cost)
+
+    def get_nr_speculative_processors(self):
+        # Number of speculative processors being created or waiting to be used
+        with self.platform_lock:
+            return self.nr_speculative
+
+    def reap_idle_processors(self, max_idle_time=None):
+        # Destroy processors that have been idle for longer than max_idle_time seconds (default: idle processor TTL)
+        # Returns False once platform has been locked
+        if max_idle_time is None:
+            max_idle_time = self.idle_processor_ttl * 60
+
+        with self.platform_lock:
+            expired = [proc_name for proc_name, (_, idle_since, _) in self.idle_processors.items()
+                       if time.time() - idle_since >= max_idle_time]
+            expired = [self.__remove_idle_processor(proc_name) for proc_name in expired]
+
+            # Processors reserved for tasks that still haven't become ready are destroyed too
+            expired_reservations = [task_id for task_id, (_, idle_since, _) in self.reserved_processors.items()
+                                    if time.time() - idle_since >= max_idle_time]
+            for task_id in expired_reservations:
+                proc, idle_since, idle_start_cost = self.reserved_processors.pop(task_id)
+                self.idle_runtime += time.time() - idle_since
+                self.idle_cost += proc.compute_cost() - idle_start_cost
+                self.nr_speculative -= 1
+                expired.append(proc)
+            is_locked = self.__locked
+
+        if len(expired) > 0:
+            logging.info("Destroying processors that sat idle: %s" % ", ".join([proc.get_name() for proc in expired]))
+            self.destroy_idle_processors(expired)
+
+        return not is_locked
+
+    def destroy_idle_processors(self, procs, is_eviction=False):
+        # Destroy processors removed from the idle pool and free up their resources
+        # Files served by processors are uploaded first
+        for proc in procs:
+            self.__upload_served_files(proc)
+
+        for proc in procs:
+            try:
+                proc.destroy(wait=False)
+            except BaseException as e:
+                logging.error("Unable to destroy idle processor '%s'!" % proc.get_name())
+                if str(e) != "":
+                    logging.error("Received the following message:\n%s" % e)
+
+        # Wait for processors to be destroyed
+        for proc in procs:
+            try:
+                proc.wait_process("destroy")
+                self.deallocate_resources(proc)
+            except BaseException as e:
+                logging.error("Unable to destroy idle processor '%s'!" % proc.get_name())
+                if str(e) != "":
+                    logging.error("Received the following message:\n%s" % e)
+            finally:
+                if is_eviction:
+                    with self.admission_cond:
+                        self.nr_evicting -= 1
+                        self.__admit_requests()
+
+    def get_idle_runtime(self):
+        # Total time processors have spent sitting idle in seconds
         with self.platform_lock:
-            cpu_overload    = self.cpu + req_cpus > self.TOTAL_NR_CPUS
-            mem_overload    = self.mem + req_mem > self.TOTAL_MEM
-            disk_overload   = self.disk_space + req_disk_space > self.TOTAL_DISK_SPACE
-        return (not cpu_overload) and (not mem_overload) and (not disk_overload) and (not self.__locked)
+            idle_procs = list(self.idle_processors.values()) + list(self.reserved_processors.values())
+            return self.idle_runtime + sum([time.time() - idle_since for _, idle_since, _ in idle_procs])
+
+    def get_idle_cost(self):
+        # Total cost of processors while they sat idle
+        with self.platform_lock:
+            idle_procs = list(self.idle_processors.values()) + list(self.reserved_processors.values())
+            return self.idle_cost + sum([proc.compute_cost() - cost for proc, _, cost in idle_procs])
+
+    def get_idle_processor_ttl(self):
+        return self.idle_processor_ttl
+
+    def cancel_resource_request(self, task_id):
+        # Remove task from admission queue and wake it up
+        with self.admission_cond:
+            if self.resource_requests.pop(task_id, None) is not None:
+                if self.reserved_request == task_id:
+                    self.reserved_request = None
+                self.__admit_requests()
+                self.admission_cond.notify_all()
+
+    def release_resources(self, task_id):
+        # Return resources allocated to a task that never claimed them with a processor
+        unused_proc = None
+        with self.admission_cond:
+            if task_id in self.allocations:
+                alloc_cpus, alloc_mem, alloc_disk_space = self.allocations.pop(task_id)
+                self.cpu -= alloc_cpus
+                self.mem -= alloc_mem
+                self.disk_space -= alloc_disk_space
+                self.__admit_requests()
+
+            # Put unclaimed idle processor back in the pool unless processors aren't being re-used
+            if task_id in self.leased_processors:
+                proc = self.leased_processors.pop(task_id)
+                if self.__locked or self.idle_processor_ttl <= 0:
+                    unused_proc = proc
+                else:
+                    self.__add_idle_processor(proc, time.time(), proc.compute_cost())
+
+        if unused_proc is not None:
+            logging.info("Destroying processor '%s' that was never used by task '%s'!" % (unused_proc.get_name(), task_id))
+            self.destroy_idle_processors([unused_proc])
 
     def deallocate_resources(self, proc):
         # Free-up resources being used by a processor
@@ -147,6 +510,15 @@ class Platform(object, metaclass=abc.ABCMeta):
             self.mem -= proc.get_mem()
             self.disk_space -= proc.get_disk_space()
             self.dealloc_procs.append(proc.get_name())
+            self.local_files.pop(proc.get_name(), None)
+
+            # Hand freed resources to waiting tasks
+            self.__admit_requests()
+
+    def read_file(self, path, max_bytes):
+        # Return up to max_bytes of a file read directly by the controller
+        # Returns None if platform can't read the file without a processor
+        return None
 
     def get_max_nr_cpus(self):
         return self.MAX_NR_CPUS
@@ -170,6 +542,21 @@ class Platform(object, metaclass=abc.ABCMeta):
         with self.platform_lock:
             self.__locked = True
 
+            # Turn away tasks still waiting to be admitted
+            self.resource_requests.clear()
+            self.reserved_request = None
+            self.admission_cond.notify_all()
+
+            # Processors created ahead of time won't be used by their tasks
+            self.pending_reservations.clear()
+            for proc, idle_since, idle_start_cost in self.reserved_processors.values():
+                self.speculative_procs.add(proc.get_name())
+                self.__add_idle_processor(proc, idle_since, idle_start_cost)
+            self.reserved_processors.clear()
+
+        # Stop waiting to re-use idle processors
+        self.reap_idle_processors(max_idle_time=0)
+
     def unlock(self):
         with self.platform_lock:
             self.__locked = False
@@ -192,6 +579,268 @@ class Platform(object, metaclass=abc.ABCMeta):
         if err:
             raise InvalidProcessorError("Processor resource requirements exceed platform capacity for single processor!")
 
+    def __admit_requests(self):
+        # Admit waiting tasks in order of priority then arrival. Caller must hold the platform lock.
+        # The first task that doesn't fit reserves resources as they're freed. Tasks behind it are only admitted
+        # if they fit alongside that reservation, which fills the platform without delaying the reserved task.
+        if self.__locked or len(self.resource_requests) == 0:
+            return
+
+        queue = sorted(self.resource_requests, key=lambda req_id: (-self.resource_requests[req_id][0],
+                                                                   self.resource_requests[req_id][1]))
+
+        # Reserved task stays at the front of the line even if higher priority tasks arrive
+        if self.reserved_request in self.resource_requests:
+            queue.remove(self.reserved_request)
+            queue.insert(0, self.reserved_request)
+
+        held_cpus, held_mem, held_disk_space = 0, 0, 0
+        admitted = False
+        for task_id in queue:
+            _, _, req_cpus, req_mem, req_disk_space, input_sizes = self.resource_requests[task_id]
+
+            # Task gets the processor being created for it once it's ready
+            if task_id in self.pending_reservations:
+                continue
+
+            # Hand task an idle processor if one has a compatible shape or already holds the task's input
+            idle_proc_name = self.__find_idle_processor(req_cpus, req_mem, req_disk_space, input_sizes)
+            if idle_proc_name is not None:
+                self.leased_processors[task_id] = self.__remove_idle_processor(idle_proc_name)
+                self.resource_requests.pop(task_id)
+                if self.reserved_request == task_id:
+                    self.reserved_request = None
+                admitted = True
+                logging.debug("(%s) Admitted task to platform with idle processor '%s'!" % (task_id, idle_proc_name))
+                continue
+
+            if self.__fits(req_cpus + held_cpus, req_mem + held_mem, req_disk_space + held_disk_space):
+                # Allocate resources to task
+                self.cpu += req_cpus
+                self.mem += req_mem
+                self.disk_space += req_disk_space
+                self.allocations[task_id] = (req_cpus, req_mem, req_disk_space)
+                self.resource_requests.pop(task_id)
+                if self.reserved_request == task_id:
+                    self.reserved_request = None
+                admitted = True
+                logging.debug("(%s) Admitted task to platform! %s" % (task_id, self.__get_curr_usage_string()))
+                continue
+
+            # Reserve resources for the first task that can't be admitted
+            if self.reserved_request is None:
+                logging.debug("(%s) Reserving platform resources for task!" % task_id)
+                self.reserved_request = task_id
+
+            if self.reserved_request == task_id:
+                held_cpus, held_mem, held_disk_space = req_cpus, req_mem, req_disk_space
+
+                # Make room by destroying idle processors that are too small or too big for reserved task
+                if self.nr_evicting == 0:
+                    self.__evict_idle_processors(req_cpus, req_mem, req_disk_space)
+
+        # Wake up admitted tasks
+        if admitted:
+            self.admission_cond.notify_all()
+
+    def __find_idle_processor(self, req_cpus, req_mem, req_disk_space, input_sizes=None):
+        # Return the idle processor with enough resources that holds the most task input,
+        # otherwise the smallest one that's no more than twice the requested size
+        # Caller must hold the platform lock
+        input_sizes = input_sizes or {}
+        best_proc_name, best_key = None, None
+        for proc_name, (proc, _, _) in self.idle_processors.items():
+            # Processors serving files can't be used until they've been uploaded
+            if proc_name in self.file_uploaders:
+                continue
+
+            shape = (proc.get_nr_cpus(), proc.get_mem(), proc.get_disk_space())
+            if shape[0] < req_cpus or shape[1] < req_mem or shape[2] < req_disk_space:
+                continue
+
+            # Size of task input that wouldn't need to be downloaded onto processor
+            local_files = self.local_files.get(proc_name, {})
+            local_size = sum([size for path, size in input_sizes.items() if path in local_files])
+
+            # Larger processors are only worth re-using if they hold task input
+            if local_size == 0 and (shape[0] > 2 * req_cpus or shape[1] > 2 * req_mem):
+                continue
+
+            key = (-local_size, shape)
+            if best_key is None or key < best_key:
+                best_proc_name, best_key = proc_name, key
+
+        if best_proc_name is not None and best_key[0] < 0:
+            logging.debug("Idle processor '%s' holds %.2fGB of task input!" % (best_proc_name, -best_key[0]))
+        return best_proc_name
+
+    def __add_idle_processor(self, proc, idle_since, idle_start_cost):
+        # Add processor to idle pool and hand it to waiting tasks. Caller must hold the platform lock.
+        self.idle_processors[proc.get_name()] = (proc, idle_since, idle_start_cost)
+        self.__start_idle_reaper()
+        self.__admit_requests()
+
+    def __start_idle_reaper(self):
+        # Start destroying processors that stay idle for too long. Caller must hold the platform lock.
+        if self.idle_reaper is None:
+            self.idle_reaper = IdleProcessorReaper(self)
+            self.idle_reaper.start()
+
+    def __remove_idle_processor(self, proc_name):
+        # Remove processor from idle pool and add the time/cost it spent idle. Caller must hold the platform lock.
+        proc, idle_since, idle_start_cost = self.idle_processors.pop(proc_name)
+        self.idle_runtime += time.time() - idle_since
+        self.idle_cost += proc.compute_cost() - idle_start_cost
+
+        # Speculative processor has been used or destroyed
+        if proc_name in self.speculative_procs:
+            self.speculative_procs.discard(proc_name)
+            self.nr_speculative -= 1
+        return proc
+
+    def __upload_served_files(self, proc):
+        # Upload files served by a processor to their remote paths before it's destroyed
+        proc_name = proc.get_name()
+        with self.admission_cond:
+            uploader = self.file_uploaders.get(proc_name, None)
+            if uploader is None:
+                return
+
+            # Wait for other processors to finish transferring files from processor
+            self.closing_servers.add(proc_name)
+            while self.peer_readers.get(proc_name, 0) > 0:
+                self.admission_cond.wait()
+            remote_paths = [path for path, (server, _) in self.served_files.items() if server is proc]
+
+        try:
+            logging.info("(%s) Uploading served files before processor is destroyed..." % proc_name)
+            uploader(remote_paths)
+        except BaseException as e:
+            logging.error("(%s) Unable to upload served files! Tasks that read them will fail." % proc_name)
+            if str(e) != "":
+                logging.error("Received the following message:\n%s" % e)
+        finally:
+            # Files are read from remote storage from now on
+            with self.admission_cond:
+                for remote_path in [path for path, (server, _) in self.served_files.items() if server is proc]:
+                    self.served_files.pop(remote_path)
+                self.file_uploaders.pop(proc_name, None)
+                self.peer_readers.pop(proc_name, None)
+                self.closing_servers.discard(proc_name)
+                self.admission_cond.notify_all()
+
+    def __claim_reserved_processor(self, task_id, req_cpus, req_mem, req_disk_space):
+        # Lease processor reserved for a task to it if it has enough resources. Caller must hold the platform lock.
+        # Processors that are too small are released to the idle pool and the task waits for admission as usual
+        if task_id in self.pending_reservations:
+            nr_cpus, mem, disk_space = self.pending_reservations[task_id]
+            if nr_cpus < req_cpus or mem < req_mem or disk_space < req_disk_space:
+                logging.debug("(%s) Processor being created ahead of time is too small for task!" % task_id)
+                self.pending_reservations.pop(task_id)
+            return False
+
+        if task_id not in self.reserved_processors:
+            return False
+
+        proc, idle_since, idle_start_cost = self.reserved_processors.pop(task_id)
+        if proc.get_nr_cpus() < req_cpus or proc.get_mem() < req_mem or proc.get_disk_space() < req_disk_space:
+            logging.debug("(%s) Processor '%s' created ahead of time is too small for task!" % (task_id, proc.get_name()))
+            self.speculative_procs.add(proc.get_name())
+            self.__add_idle_processor(proc, idle_since, idle_start_cost)
+            return False
+
+        self.idle_runtime += time.time() - idle_since
+        self.idle_cost += proc.compute_cost() - idle_start_cost
+        self.nr_speculative -= 1
+        self.leased_processors[task_id] = proc
+        logging.debug("(%s) Admitted task to platform with processor '%s' created for it!" % (task_id, proc.get_name()))
+        return True
+
+    def __create_speculative_processor(self, task_id, nr_cpus, mem, disk_space):
+        # Create processor and reserve it for the task it was created for
+        # Creation counts as idle time since no task is using the processor yet
+        spec_id = "spec-%s" % task_id
+        proc = None
+        idle_since = time.time()
+        try:
+            proc = self.get_processor(spec_id, nr_cpus, mem, disk_space)
+            proc.create()
+            with self.admission_cond:
+                if not self.__locked:
+                    self.__reserve_processor(task_id, proc, idle_since)
+                    return
+        except BaseException as e:
+            logging.warning("(%s) Unable to create speculative processor!" % spec_id)
+            if str(e) != "":
+                logging.warning("Received the following message:\n%s" % e)
+
+        # Processor was never made available so get rid of it
+        with self.admission_cond:
+            self.nr_speculative -= 1
+            if self.pending_reservations.pop(task_id, None) is not None:
+                self.__admit_requests()
+            if proc is not None:
+                self.idle_runtime += time.time() - idle_since
+                self.idle_cost += proc.compute_cost()
+        self.release_resources(spec_id)
+        if proc is not None:
+            self.destroy_idle_processors([proc])
+
+    def __reserve_processor(self, task_id, proc, idle_since):
+        # Hold created processor for its task, hand it over if the task is already waiting for admission,
+        # or release it to the idle pool if the reservation was cancelled. Caller must hold the platform lock.
+        if self.pending_reservations.pop(task_id, None) is None:
+            self.speculative_procs.add(proc.get_name())
+            self.__add_idle_processor(proc, idle_since, 0)
+            return
+
+        self.reserved_processors[task_id] = (proc, idle_since, 0)
+        self.__start_idle_reaper()
+        if task_id in self.resource_requests:
+            _, _, req_cpus, req_mem, req_disk_space, _ = self.resource_requests[task_id]
+            if self.__claim_reserved_processor(task_id, req_cpus, req_mem, req_disk_space):
+                self.resource_requests.pop(task_id)
+                if self.reserved_request == task_id:
+                    self.reserved_request = None
+                self.admission_cond.notify_all()
+            else:
+                self.__admit_requests()
+
+    def __evict_idle_processors(self, req_cpus, req_mem, req_disk_space):
+        # Destroy the longest idle processors until a request would fit. Caller must hold the platform lock.
+        # Don't destroy anything if the request still wouldn't fit after every idle processor was destroyed
+        idle_procs = [proc for proc, _, _ in self.idle_processors.values()]
+        if not self.__fits(req_cpus - sum([proc.get_nr_cpus() for proc in idle_procs]),
+                           req_mem - sum([proc.get_mem() for proc in idle_procs]),
+                           req_disk_space - sum([proc.get_disk_space() for proc in idle_procs])):
+            return
+
+        freed_cpus, freed_mem, freed_disk_space = 0, 0, 0
+        evicted = []
+        for proc_name in list(self.idle_processors):
+            if self.__fits(req_cpus - freed_cpus, req_mem - freed_mem, req_disk_space - freed_disk_space):
+                break
+            proc = self.__remove_idle_processor(proc_name)
+            freed_cpus += proc.get_nr_cpus()
+            freed_mem += proc.get_mem()
+            freed_disk_space += proc.get_disk_space()
+            evicted.append(proc)
+
+        # Resources are freed once processors have been destroyed
+        if len(evicted) > 0:
+            logging.info("Destroying idle processors to make room for waiting task: %s"
+                         % ", ".join([proc.get_name() for proc in evicted]))
+            self.nr_evicting += len(evicted)
+            threading.Thread(target=self.destroy_idle_processors, args=(evicted,), kwargs={"is_eviction": True},
+                             daemon=True).start()
+
+    def __fits(self, req_cpus, req_mem, req_disk_space):
+        # Determine whether resources are currently available on the platform. Caller must hold the platform lock.
+        cpu_overload    = self.cpu + req_cpus > self.TOTAL_NR_CPUS
+        mem_overload    = self.mem + req_mem > self.TOTAL_MEM
+        disk_overload   = self.disk_space + req_disk_space > self.TOTAL_DISK_SPACE
+        return (not cpu_overload) and (not mem_overload) and (not disk_overload)
+
     def __check_resources(self):
         err = False
         if self.MAX_NR_CPUS > self.TOTAL_NR_CPUS:
@@ -213,7 +862,7 @@ class Platform(object, metaclass=abc.ABCMeta):
 
     def __get_curr_usage_string(self):
         ret = "*********************\n"
-        ret = "Platform Usage\n"
+        ret += "Platform Usage\n"
         ret += "*********************\n"
         ret += "\tCPU: {0}\n".format(self.cpu)
         ret += "\tMem: {0}\n".format(self.mem)
@@ -252,3 +901,21 @@ class Platform(object, metaclass=abc.ABCMeta):
     def standardize_dir(dir_path):
         # Makes directory names uniform to include a single '/' at the end
         return dir_path.rstrip("/") + "/"
+
+
+class IdleProcessorReaper(threading.Thread):
+    # Periodically destroys processors that have been idle longer than the platform's idle processor TTL
+
+    def __init__(self, platform):
+        super(IdleProcessorReaper, self).__init__()
+
+        # Setting thread as daemon
+        self.daemon = True
+
+        self.platform = platform
+
+    def run(self):
+        # Check idle processors a few times per TTL until platform is locked
+        check_interval = max(self.platform.get_idle_processor_ttl() * 60 / 4.0, 5)
+        while self.platform.reap_idle_processors():
+            time.sleep(check_interval)
@@ -9,6 +9,8 @@ class Process(sp.Popen):
         # Quiet failure means logger will not register command failure as error
         self.quiet          = kwargs.pop("quiet_failure", False)
         self.log_success    = kwargs.pop("log_success", True)
+        # File fed to the command's standard input
+        self.stdin_file     = kwargs.pop("stdin_file", None)
         super(Process, self).__init__(args,     **kwargs)
         self.complete       = False
         self.stopped        = False
@@ -41,6 +43,9 @@ class Process(sp.Popen):
     def get_docker_image(self):
         return self.docker_image
 
+    def get_stdin_file(self):
+        return self.stdin_file
+
     def get_output(self):
         return self.out, self.err
 
@@ -57,13 +57,22 @@ class Processor(object, metaclass=abc.ABCMeta):
     def destroy(self, wait=True):
         self.set_status(Processor.OFF)
 
-    def run(self, job_name, cmd, num_retries=None, docker_image=None, quiet_failure=False):
+    # Text that only appears in private keys, which must never be part of a logged command
+    PRIVATE_KEY_MARKER = "PRIVATE KEY-----"
+
+    def run(self, job_name, cmd, num_retries=None, docker_image=None, quiet_failure=False, stdin_file=None):
+        # Secrets needed by a command are passed through stdin_file, a controller file fed to its standard input
 
         # Throw error if attempting to run command on stopped processor
         if self.is_locked():
             logging.error("(%s) Attempt to run process'%s' on locked processor!" % (self.name, job_name))
             raise RuntimeError("Attempt to run command on locked processor!")
 
+        # Commands are logged and visible in the process list so they can't contain private keys
+        if Processor.PRIVATE_KEY_MARKER in cmd:
+            logging.error("(%s) Process '%s' was not run because its command contains a private key!" % (self.name, job_name))
+            raise RuntimeError("Attempt to run command containing a private key!")
+
         if num_retries is None:
             num_retries = self.default_num_cmd_retries
 
@@ -122,9 +131,21 @@ class Processor(object, metaclass=abc.ABCMeta):
         kwargs["docker_image"] = docker_image
         kwargs["quiet_failure"] = quiet_failure
         kwargs["close_fds"] = True
+        kwargs["stdin_file"] = stdin_file
 
         # Add process to list of processes
-        self.processes[job_name] = Process(cmd, **kwargs)
+        # Command reads its standard input from a file instead of inheriting the controller's
+        stdin = open(stdin_file) if stdin_file is not None else None
+        try:
+            self.processes[job_name] = Process(cmd, stdin=stdin, **kwargs)
+        finally:
+            if stdin is not None:
+                stdin.close()
+
+    def is_process_finished(self, proc_name):
+        # Determine whether a process has stopped running without waiting for it
+        proc_obj = self.processes[proc_name]
+        return proc_obj.is_complete() or proc_obj.poll() is not None
 
     def wait(self):
         # Returns when all currently running processes have completed
@@ -151,6 +172,11 @@ class Processor(object, metaclass=abc.ABCMeta):
         #        logging.debug("Killing process: %s" % proc_name)
         #        proc_obj.stop()
 
+    def clear_processes(self):
+        # Forget processes and checkpoints from the last task so processor can be re-used by another task
+        self.processes = OrderedDict()
+        self.checkpoints = []
+
     ############ Getters and Setters
     def set_status(self, new_status):
         # Updates instance status with threading.lock() to prevent race conditions
@@ -231,6 +257,10 @@ class Processor(object, metaclass=abc.ABCMeta):
     def get_start_time(self):
         return self.start_time
 
+    def get_peer_address(self):
+        # Address other processors can use to reach processor directly (None = processors can't reach each other)
+        return None
+
     def get_nr_cpus(self):
         return self.nr_cpus
 
@@ -1,4 +1,8 @@
+import csv
 import logging
+import getpass
+import os
+import shlex
 
 from System.Platform import Platform
 
@@ -11,6 +15,9 @@ class StorageHelper(object):
     def __init__(self, proc):
         self.proc = proc
 
+        # Files transferred by each bulk transfer job that hasn't been checked yet
+        self.bulk_jobs = {}
+
     def mv(self, src_path, dest_path, job_name=None, log=True, wait=False, **kwargs):
         # Transfer file or dir from src_path to dest_path
         # Log the transfer unless otherwise specified
@@ -28,6 +35,86 @@ class StorageHelper(object):
             self.proc.wait_process(job_name)
         return job_name
 
+    def bulk_mv(self, src_paths, dest_dir, job_name=None, tmp_dir="/tmp", log=True, wait=False, **kwargs):
+        # Transfer many files or dirs to the same dest_dir with a single parallel transfer command
+        # Source paths are written to a manifest on the processor and the result of each transfer is written to a log
+        cmd_generator = StorageHelper.__get_storage_cmd_generator(src_paths[0], dest_dir)
+
+        job_name = "bulk_mv_%s" % Platform.generate_unique_id() if job_name is None else job_name
+        manifest = os.path.join(tmp_dir, "%s.manifest" % job_name)
+        results = os.path.join(tmp_dir, "%s.results" % job_name)
+
+        # Write manifest, transfer files, and print the results of every transfer
+        # Paths are written to the manifest as-is. Wildcards are expanded by the transfer command, not the shell.
+        # Transfer errors are only logged as the results show which files need to be transferred again
+        cmd = "printf \"%%s\\n\" %s | sudo tee %s >/dev/null ; sudo rm -f %s ; { %s ; } %s ; sudo cat %s" % \
+              (" ".join([shlex.quote(src_path) for src_path in src_paths]), manifest, results, cmd_generator.bulk_mv(manifest, results, dest_dir),
+               "!LOG2!" if log else "2>/dev/null", results)
+
+        # Run command and return job name
+        self.proc.run(job_name, cmd, **kwargs)
+        self.bulk_jobs[job_name] = list(src_paths)
+        if wait:
+            return self.get_bulk_mv_results(job_name)
+        return job_name
+
+    def get_bulk_mv_results(self, job_name):
+        # Wait for a bulk transfer to finish and return whether each file was transferred (src path -> True/False)
+        src_paths = self.bulk_jobs.pop(job_name)
+        try:
+            out, err = self.proc.wait_process(job_name)
+        except BaseException as e:
+            logging.warning("(%s) Unable to get results of bulk transfer '%s'!" % (self.proc.get_name(), job_name))
+            if str(e) != "":
+                logging.warning("Received the following msg:\n%s" % e)
+            return {src_path: False for src_path in src_paths}
+
+        # Files are transferred if every object copied from them was transferred
+        transferred = {}
+        for row in csv.DictReader(out.splitlines()):
+            src_path = (row.get("Source") or "").replace("file://", "", 1)
+            transferred.setdefault(src_path, True)
+            transferred[src_path] = transferred[src_path] and row.get("Result") == "OK"
+
+        results = {}
+        for src_path in src_paths:
+            # Objects copied from prefix paths only share the prefix
+            src_dir = src_path.rstrip("*") if src_path.endswith("*") else src_path.rstrip("/") + "/"
+            objects = [ok for path, ok in transferred.items() if path == src_path or path.startswith(src_dir)]
+            results[src_path] = len(objects) > 0 and all(objects)
+        return results
+
+    def stream(self, src_path, dest_path, job_name=None, log=True, **kwargs):
+        # Write file at src_path into the named pipe at dest_path as it's being read
+        # Job only finishes once the whole file has been read from the pipe
+        cmd_generator = StorageHelper.__get_storage_cmd_generator(src_path)
+        cmd = "%s > %s" % (cmd_generator.cat(src_path), dest_path)
+
+        job_name = "stream_%s" % Platform.generate_unique_id() if job_name is None else job_name
+
+        # Optionally add logging. Standard output is the stream itself.
+        cmd = "%s !LOG2!" % cmd if log else cmd
+
+        # Run command and return job name
+        self.proc.run(job_name, cmd, **kwargs)
+        return job_name
+
+    def pull(self, src_address, src_path, dest_path, key_file, job_name=None, log=True, wait=False, **kwargs):
+        # Transfer file or dir from src_path on another processor to dest_path over the network
+        ssh_options = "-i %s -o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null -o CheckHostIP=no" % key_file
+        cmd = "sudo rsync -a -e \"ssh %s\" %s@%s:%s %s" % (ssh_options, getpass.getuser(), src_address, src_path, dest_path)
+
+        job_name = "pull_%s" % Platform.generate_unique_id() if job_name is None else job_name
+
+        # Optionally add logging
+        cmd = "%s !LOG3!" % cmd if log else cmd
+
+        # Run command and return job name
+        self.proc.run(job_name, cmd, **kwargs)
+        if wait:
+            self.proc.wait_process(job_name)
+        return job_name
+
     def mkdir(self, dir_path, job_name=None, log=False, wait=False, **kwargs):
         # Makes a directory if it doesn't already exists
         cmd_generator = StorageHelper.__get_storage_cmd_generator(dir_path)
@@ -65,6 +152,72 @@ class StorageHelper(object):
             logging.error("Unable to check path existence: %s" % path)
             raise
 
+    def list_dir(self, dir_path, recursive=False, job_name=None, **kwargs):
+        # Return sizes in gigabytes and generations of files in a directory (file path -> (size, generation))
+        # Generation changes whenever a file is overwritten (object creation time or file modification time)
+        # Only files directly inside the directory are listed unless recursive
+        cmd_generator = StorageHelper.__get_storage_cmd_generator(dir_path)
+        cmd = cmd_generator.list_dir(dir_path.rstrip("/") + "/", recursive)
+
+        # Run command and return job name
+        job_name = "list_dir_%s" % Platform.generate_unique_id() if job_name is None else job_name
+        self.proc.run(job_name, cmd, **kwargs)
+
+        # Wait for cmd to finish and get output
+        try:
+            # Each file is listed as its size in bytes, its generation, and its path
+            out, err = self.proc.wait_process(job_name)
+            files = {}
+            for line in out.split("\n"):
+                fields = line.split()
+                if len(fields) == 3 and fields[0].isdigit():
+                    files[fields[2]] = (int(fields[0])/(1024**3.0), fields[1])
+            return files
+
+        except BaseException as e:
+            logging.debug("Unable to list directory: %s" % dir_path)
+            if str(e) != "":
+                logging.debug("Received the following msg:\n%s" % e)
+            raise
+
+    def get_file_versions(self, paths, job_name=None, **kwargs):
+        # Return a version string for each path that changes whenever a file it refers to is overwritten (path -> version)
+        # Versions are built from object checksums or local modification times. Paths ending in '/' include everything below them.
+        # Paths that don't match any file have a version of None
+        versions = {}
+        file_versions = {}
+        for count, cmd_generator in enumerate(set([StorageHelper.__get_storage_cmd_generator(path) for path in paths])):
+            group_paths = [path for path in paths if StorageHelper.__get_storage_cmd_generator(path) is cmd_generator]
+            cmd = cmd_generator.get_file_versions(group_paths)
+
+            # Run command and return job name
+            group_job_name = "get_versions_%s" % Platform.generate_unique_id() if job_name is None else "%s_%d" % (job_name, count)
+            self.proc.run(group_job_name, cmd, **kwargs)
+
+            # Each file is listed as its version followed by its path
+            try:
+                out, err = self.proc.wait_process(group_job_name)
+            except BaseException as e:
+                logging.debug("Unable to get file versions: %s" % ", ".join(group_paths))
+                if str(e) != "":
+                    logging.debug("Received the following msg:\n%s" % e)
+                raise
+            for line in out.split("\n"):
+                fields = line.split(" ", 1)
+                if len(fields) == 2:
+                    file_versions[fields[1]] = fields[0]
+
+        for path in paths:
+            if path.endswith("*"):
+                matches = [file_path for file_path in file_versions if file_path.startswith(path[:-1])]
+            elif path.endswith("/"):
+                matches = [file_path for file_path in file_versions if file_path.startswith(path)]
+            else:
+                matches = [file_path for file_path in file_versions if file_path == path]
+            versions[path] = ";".join(["%s=%s" % (file_path, file_versions[file_path]) for file_path in sorted(matches)]) \
+                if len(matches) > 0 else None
+        return versions
+
     def get_file_size(self, path, job_name=None, **kwargs):
         # Return file size in gigabytes
         cmd_generator = StorageHelper.__get_storage_cmd_generator(path)
@@ -106,6 +259,13 @@ class StorageHelper(object):
             self.proc.wait_process(job_name)
         return job_name
 
+    @staticmethod
+    def quote_path(path):
+        # Quote path for the shell. Wildcards at the end of prefix paths are left for the shell to expand.
+        if path.endswith("*"):
+            return "%s*" % shlex.quote(path.rstrip("*"))
+        return shlex.quote(path)
+
     @staticmethod
     def __get_storage_cmd_generator(src_path, dest_path=None):
         # Determine the class of file handler to use base on input file protocol types
@@ -162,6 +322,20 @@ class LocalStorageCmdGenerator(StorageCmdGenerator):
         # Move a file from one directory to another
         return "sudo mv %s %s" % (src_path, dest_dir)
 
+    @staticmethod
+    def bulk_mv(manifest, results, dest_dir):
+        # Move every file listed in manifest to dest_dir and write the result of each move to a csv file
+        # Only the wildcard at the end of prefix paths is expanded so paths with spaces or wildcards are moved as-is
+        return "(echo \"Source,Result\" ; while IFS= read -r src_path ; do " \
+               "case \"$src_path\" in *\\*) sudo mv \"${src_path%%\\*}\"* %s ;; *) sudo mv \"$src_path\" %s ;; esac && " \
+               "echo \"\\\"$src_path\\\",OK\" || echo \"\\\"$src_path\\\",error\" ; done < %s) | sudo tee %s >/dev/null" % \
+               (dest_dir, dest_dir, manifest, results)
+
+    @staticmethod
+    def cat(path):
+        # Write file to standard output
+        return "sudo cat %s" % path
+
     @staticmethod
     def mkdir(dir_path):
         # Makes a directory if it doesn't already exists
@@ -176,6 +350,17 @@ class LocalStorageCmdGenerator(StorageCmdGenerator):
     def ls(path):
         return "sudo ls %s" % path
 
+    @staticmethod
+    def list_dir(dir_path, recursive=False):
+        # Return cmd for listing size (bytes), modification time, and path of files in a directory
+        max_depth = "" if recursive else " -maxdepth 1"
+        return "sudo find %s%s -type f -printf \"%%s %%T@ %%p\\n\"" % (dir_path, max_depth)
+
+    @staticmethod
+    def get_file_versions(paths):
+        # Return cmd for listing modification time and path of every file matching paths
+        return "sudo find %s -type f -printf \"%%T@ %%p\\n\" || true" % " ".join([StorageHelper.quote_path(path) for path in paths])
+
     @staticmethod
     def rm(path):
         # Dear god do not give sudo privileges to this command
@@ -192,6 +377,17 @@ class GoogleStorageCmdGenerator(StorageCmdGenerator):
         options_fast = '-m -o "GSUtil:sliced_object_download_max_components=200"'
         return "sudo gsutil %s cp -r %s %s" % (options_fast, src_path, dest_dir)
 
+    @staticmethod
+    def bulk_mv(manifest, results, dest_dir):
+        # Copy every file listed in manifest to dest_dir in parallel and write the result of each copy to a csv file
+        options_fast = '-m -o "GSUtil:sliced_object_download_max_components=200"'
+        return "sudo gsutil %s cp -r -I -L %s %s < %s" % (options_fast, results, dest_dir, manifest)
+
+    @staticmethod
+    def cat(path):
+        # Write file to standard output
+        return "sudo gsutil cat %s" % path
+
     @staticmethod
     def mkdir(dir_path):
         # Makes a directory if it doesn't already exists
@@ -206,6 +402,19 @@ class GoogleStorageCmdGenerator(StorageCmdGenerator):
     def ls(path):
         return "gsutil ls %s" % path
 
+    @staticmethod
+    def list_dir(dir_path, recursive=False):
+        # Return cmd for listing size (bytes), creation time, and path of objects in a directory
+        return "gsutil ls -l %s%s" % (dir_path, "**" if recursive else "")
+
+    @staticmethod
+    def get_file_versions(paths):
+        # Return cmd for listing crc32c checksum and path of every object matching paths
+        # Directories are listed recursively. Wildcards are expanded by gsutil.
+        paths = [shlex.quote("%s**" % path if path.endswith("/") else path) for path in paths]
+        return "gsutil ls -L %s | awk '/^gs:\/\// {path=substr($0, 1, length($0)-1)} /Hash \\(crc32c\\):/ {print $3, path}'" \
+               % " ".join(paths)
+
     @staticmethod
     def rm(path):
         return "gsutil rm -r %s" % path
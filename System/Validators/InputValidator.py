@@ -1,13 +1,19 @@
 import logging
+import os
+import threading
 
 from .Validator import Validator
-from System.Workers import ThreadPool, PoolWorker
+from System.Workers import ThreadPool, PoolWorker, FunctionThread
 from System.Datastore import GAPFile
 from System.Platform import StorageHelper, DockerHelper
 
 class InputValidator(Validator):
 
-    def __init__(self, resource_kit, sample_data, storage_helper, docker_helper, num_threads=25):
+    # Minimum number of files in the same directory for the directory to be listed instead of checking files one by one
+    MIN_LISTED_FILES = 2
+
+    def __init__(self, resource_kit, sample_data, storage_helper, docker_helper, num_threads=25, input_cache=None,
+                 on_validated=None):
         super(InputValidator, self).__init__()
         # Check whether all input files declared in resource kit and sample data exist
         self.resources  = resource_kit
@@ -15,24 +21,44 @@ class InputValidator(Validator):
         self.storage_helper = storage_helper
         self.docker_helper  = docker_helper
 
+        # Index of input files checked by recent runs
+        self.input_cache    = input_cache
+
+        # Number of threads used to validate inputs
+        self.num_threads = num_threads
+
+        # IDs of inputs that haven't been found valid yet and function called whenever more inputs have been found valid
+        self.pending_inputs = set()
+        self.pending_lock   = threading.Lock()
+        self.on_validated   = on_validated
+
+        # Thread validating inputs while the pipeline runs, its result, and whether it has finished
+        self.validation_thread  = None
+        self.validation_errors  = None
+        self.validation_done    = threading.Event()
+
         # Create thread pool for parallelizing input file validation
-        self.thread_pool = ThreadPool(num_threads, worker_class=InputWorker, storage_helper=self.storage_helper, docker_helper=self.docker_helper)
+        self.thread_pool = ThreadPool(num_threads, worker_class=InputWorker, storage_helper=self.storage_helper, docker_helper=self.docker_helper,
+                                      on_validated=self.__mark_validated)
 
     def validate(self):
 
-        # Check resource kit paths
-        inputs = {}
-        inputs["resource"] = self.__get_resource_paths()
+        # Check resource kit paths, docker images, and sample data paths
+        inputs = self.__get_inputs()
 
-        # Check resource kit docker images
-        inputs["docker"] = self.__get_docker_images()
+        # Skip files that were checked by a recent run
+        cached_files = self.__validate_cached_files(inputs)
+        self.__mark_validated(*cached_files)
 
-        # Check sample data paths
-        inputs["sample"] = self.__get_sample_data_paths()
+        # Validate files found by listing the directories they're in
+        listed_files = self.__validate_listed_files(inputs, skipped_files=cached_files)
+        self.__mark_validated(*listed_files)
 
-        # Validate all files by adding them to thread pool's queue
+        # Validate all other files by adding them to thread pool's queue
         for input_file_src in inputs:
             for input_file in inputs[input_file_src]:
+                if id(input_file) in listed_files or id(input_file) in cached_files:
+                    continue
                 input_desc = self.__get_input_desc(input_file, input_source=input_file_src)
                 logging.info("Validating %s..." % input_desc)
                 self.thread_pool.add_task(input_file, input_desc)
@@ -40,6 +66,16 @@ class InputValidator(Validator):
         # Wait for all tasks to finish
         self.thread_pool.wait_completion()
 
+        # Remember files that were found so future runs don't have to check them again
+        if self.input_cache is not None:
+            for input_file_src in inputs:
+                for input_file in inputs[input_file_src]:
+                    if not isinstance(input_file, GAPFile) or id(input_file) in cached_files:
+                        continue
+                    if input_file.is_flagged("validated") and not input_file.is_flagged("validation_failed") \
+                            and not input_file.is_flagged("missing") and input_file.get_size() is not None:
+                        self.input_cache.store(InputValidator.__get_cache_key(input_file), input_file.get_size())
+
         # Run through all files and see if they've been validated
         for input_file_src in inputs:
             for input_file in inputs[input_file_src]:
@@ -75,6 +111,138 @@ class InputValidator(Validator):
 
         return has_errors
 
+    def validate_in_background(self):
+        # Validate inputs while the pipeline runs. Tasks can run once none of their inputs are pending
+        inputs = self.__get_inputs()
+        with self.pending_lock:
+            self.pending_inputs = set([id(input_obj) for input_src in inputs for input_obj in inputs[input_src]])
+        self.validation_thread = FunctionThread(self.__run_background_validation, "Unable to validate pipeline inputs")
+        self.validation_thread.start()
+
+    def is_validating(self):
+        return self.validation_thread is not None and not self.validation_done.is_set()
+
+    def is_input_pending(self, input_obj):
+        # Determine whether an input hasn't been found valid yet
+        with self.pending_lock:
+            return id(input_obj) in self.pending_inputs
+
+    def finalize(self):
+        # Wait for background validation to finish and return whether any inputs were invalid
+        # Raises any error that stopped the inputs from being validated
+        self.validation_thread.finalize()
+        return self.validation_errors
+
+    def __run_background_validation(self):
+        try:
+            self.validation_errors = self.validate()
+        finally:
+            # Let waiting tasks know validation has finished whether or not inputs were valid
+            self.validation_done.set()
+            if self.on_validated is not None:
+                self.on_validated()
+
+    def __mark_validated(self, *input_ids):
+        # Record inputs that were found valid and announce it to anything waiting on them
+        if len(input_ids) == 0:
+            return
+        with self.pending_lock:
+            self.pending_inputs.difference_update(input_ids)
+        if self.on_validated is not None:
+            self.on_validated()
+
+    def __get_inputs(self):
+        # Return inputs to validate grouped by where they're declared
+        inputs = {}
+        inputs["resource"] = self.__get_resource_paths()
+        inputs["docker"] = self.__get_docker_images()
+        inputs["sample"] = self.__get_sample_data_paths()
+        return inputs
+
+    def __validate_cached_files(self, inputs):
+        # Validate files with sizes recorded by a recent run without checking them again
+        # Returns IDs of validated files
+        if self.input_cache is None:
+            return set()
+
+        cached_files = set()
+        for input_file_src in inputs:
+            for input_file in inputs[input_file_src]:
+                if not isinstance(input_file, GAPFile):
+                    continue
+                size = self.input_cache.lookup(InputValidator.__get_cache_key(input_file))
+                if size is None:
+                    continue
+                input_file.flag("validated")
+                input_file.unflag("missing")
+                input_file.unflag("validation_failed")
+                input_file.set_size(size)
+                cached_files.add(id(input_file))
+
+        logging.info("Validated %d input files checked by a recent run." % len(cached_files))
+        return cached_files
+
+    def __validate_listed_files(self, inputs, skipped_files=None):
+        # Determine existence and size of files with a few directory listings instead of checking each file
+        # Wildcard files and files that don't appear in a listing are checked individually
+        # Returns IDs of validated files
+        skipped_files = skipped_files or set()
+
+        # Group files by the directory listing that would show them: (directory, recursive) -> files
+        # Size of files in a containing directory is the size of the whole directory
+        listings = {}
+        for input_file_src in inputs:
+            for input_file in inputs[input_file_src]:
+                if not isinstance(input_file, GAPFile) or input_file.is_prefix() or id(input_file) in skipped_files:
+                    continue
+                if input_file.get_containing_dir() is not None:
+                    listing = (input_file.get_containing_dir(), True)
+                elif "/" in input_file.get_path():
+                    listing = (os.path.dirname(input_file.get_path()) + "/", False)
+                else:
+                    continue
+                listings.setdefault(listing, []).append(input_file)
+
+        # Only list directories holding several files as every file in the directory is listed
+        listings = {listing: files for listing, files in listings.items()
+                    if listing[1] or len(files) >= InputValidator.MIN_LISTED_FILES}
+        if len(listings) == 0:
+            return set()
+
+        # List directories in parallel
+        dir_listings = {}
+        listing_pool = ThreadPool(min(len(listings), self.num_threads), worker_class=ListingWorker,
+                                  storage_helper=self.storage_helper, dir_listings=dir_listings)
+        for dir_path, recursive in listings:
+            listing_pool.add_task(dir_path, recursive)
+        listing_pool.wait_completion()
+
+        listed_files = set()
+        for (dir_path, recursive), files in listings.items():
+            dir_files = dir_listings.get((dir_path, recursive), None)
+            if dir_files is None:
+                continue
+
+            for input_file in files:
+                if input_file.get_path() not in dir_files:
+                    continue
+                input_file.flag("validated")
+                input_file.unflag("missing")
+                input_file.unflag("validation_failed")
+                if recursive:
+                    input_file.set_size(sum([size for size, _ in dir_files.values()]))
+                else:
+                    input_file.set_size(dir_files[input_file.get_path()][0])
+                listed_files.add(id(input_file))
+
+        logging.info("Validated %d input files by listing %d directories." % (len(listed_files), len(listings)))
+        return listed_files
+
+    @staticmethod
+    def __get_cache_key(input_file):
+        # Files are cached under the path whose existence is checked
+        return input_file.get_transferrable_path() if input_file.is_prefix() else input_file.get_path()
+
     @staticmethod
     def __get_input_desc(input_obj, input_source):
         # Return an informative description about an input
@@ -116,12 +284,15 @@ class InputValidator(Validator):
 
 class InputWorker(PoolWorker):
     # ThreadPool worker for determining whether a single input (docker images/files, etc.) exists
-    def __init__(self, task_queue, storage_helper=None, docker_helper=None):
+    def __init__(self, task_queue, storage_helper=None, docker_helper=None, on_validated=None):
 
         # Docker and storage helpers used to check existence of inputs
         self.storage_helper = storage_helper
         self.docker_helper  = docker_helper
 
+        # Function called with the ID of each input found valid
+        self.on_validated   = on_validated
+
         # Check to make sure they're the correct class
         assert isinstance(storage_helper, StorageHelper), "InputWorker needs valid StorageHelper class upon instantiation!"
         assert isinstance(docker_helper, DockerHelper), "InputWorker needs valid DockerHelper class upon instantiation!"
@@ -154,6 +325,10 @@ class InputWorker(PoolWorker):
             logging.error("Unable to validate %s!" % input_desc)
             raise
 
+        # Announce inputs that exist and whose size is known
+        if self.on_validated is not None and not input_obj.is_flagged("missing") and input_obj.get_size() is not None:
+            self.on_validated(id(input_obj))
+
     def validate_file(self, input_obj):
         # Check whether input file exists
         path_to_check = input_obj.get_transferrable_path() if input_obj.is_prefix() else input_obj.get_path()
@@ -181,3 +356,25 @@ class InputWorker(PoolWorker):
             job_name = "get_size_%s" % docker_obj.get_ID()
             image_size = self.docker_helper.get_image_size(image_name, job_name=job_name)
             docker_obj.set_size(image_size)
+
+
+class ListingWorker(PoolWorker):
+    # ThreadPool worker for listing the files in a directory
+    def __init__(self, task_queue, storage_helper=None, dir_listings=None):
+
+        # Storage helper used to list directories and where listings are stored: (directory, recursive) -> file sizes
+        self.storage_helper = storage_helper
+        self.dir_listings   = dir_listings
+
+        # Check to make sure it's the correct class
+        assert isinstance(storage_helper, StorageHelper), "ListingWorker needs valid StorageHelper class upon instantiation!"
+
+        # Start running task worker
+        super(ListingWorker, self).__init__(task_queue)
+
+    def task(self, dir_path, recursive):
+        # Files in directories that can't be listed are checked individually
+        try:
+            self.dir_listings[(dir_path, recursive)] = self.storage_helper.list_dir(dir_path, recursive=recursive)
+        except BaseException:
+            logging.debug("Unable to list directory '%s'. Checking its files individually." % dir_path)
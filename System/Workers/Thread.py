@@ -2,7 +2,6 @@ import threading
 import queue
 import logging
 import sys
-import time
 import abc
 
 
@@ -19,9 +18,8 @@ class Thread(threading.Thread, metaclass=abc.ABCMeta):
         # Setting a variable for error message that might appear
         self.err_msg = err_msg
 
-        # Thread status
-        self.finished_lock  = threading.Lock()
-        self.finished = False
+        # Thread status. Event is set once work() has returned or raised
+        self.finished = threading.Event()
 
     def run(self):
         try:
@@ -35,21 +33,19 @@ class Thread(threading.Thread, metaclass=abc.ABCMeta):
         else:
             self.exception_queue.put(None)
         finally:
-            with self.finished_lock:
-                self.finished = True
+            self.finished.set()
 
     @abc.abstractmethod
     def work(self):
         pass
 
     def is_done(self):
-        with self.finished_lock:
-            return self.finished
+        return self.finished.is_set()
 
     def finalize(self):
 
-        while not self.is_done():
-            time.sleep(2)
+        # Block until thread has finished working
+        self.finished.wait()
 
         # If exception queue is empty at this point, then the thread has been finalized already
         if not self.exception_queue.empty():
@@ -59,4 +55,15 @@ class Thread(threading.Thread, metaclass=abc.ABCMeta):
 
             # Raise the received exception
             if exc_info is not None:
-                raise exc_info[0](exc_info[1]).with_traceback(exc_info[2])
\ No newline at end of file
+                raise exc_info[0](exc_info[1]).with_traceback(exc_info[2])
+
+class FunctionThread(Thread):
+    # Thread running a single function. Exceptions raised by the function are raised again by finalize()
+    def __init__(self, func, err_msg, *args, **kwargs):
+        super(FunctionThread, self).__init__(err_msg)
+        self.func   = func
+        self.args   = args
+        self.kwargs = kwargs
+
+    def work(self):
+        self.func(*self.args, **self.kwargs)
@@ -1,2 +1,2 @@
-from .Thread import Thread
+from .Thread import Thread, FunctionThread
 from .ThreadPool import PoolWorker, ThreadPool
\ No newline at end of file
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# Benchmark of graph validation (adjacency list and cycle checks) on wide split graphs
+#
+# Builds a splitter -> N x (a -> b) -> merger graph for each requested size and times the validation run by Graph.
+# Run against another checkout of CloudConductor (e.g. a 'git worktree' of an older commit) to compare implementations:
+#
+#   python benchmarks/graph_validation.py --repo /path/to/checkout 1000 4000 10000 200000
+
+import os
+import sys
+import time
+import logging
+import argparse
+from collections import OrderedDict
+
+class BenchmarkTask(object):
+    # Minimal task holding only what graph validation looks at
+    def __init__(self, task_id):
+        self.task_id = task_id
+
+    def get_ID(self):
+        return self.task_id
+
+    def is_complete(self):
+        return False
+
+    def is_deprecated(self):
+        return False
+
+def make_graph(graph_class, nr_nodes):
+    # Create graph object directly from an adjacency list without loading a graph config
+    adj_list = OrderedDict()
+    adj_list["split"] = []
+    for i in range(nr_nodes // 2):
+        adj_list["a%d" % i] = ["split"]
+        adj_list["b%d" % i] = ["a%d" % i]
+    adj_list["merge"] = ["b%d" % i for i in range(nr_nodes // 2)]
+
+    graph = object.__new__(graph_class)
+    graph.tasks = OrderedDict((task_id, BenchmarkTask(task_id)) for task_id in adj_list)
+    graph.adj_list = adj_list
+
+    # Graphs that index children and readiness build their indexes when loaded
+    if hasattr(graph, "_Graph__index_graph"):
+        graph.children, graph.incomplete_parents, graph.unfinished, graph.ready = graph._Graph__index_graph()
+    return graph
+
+def main():
+    argparser = argparse.ArgumentParser(description="Time graph validation on wide split graphs.")
+    argparser.add_argument("--repo", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."),
+                           help="CloudConductor checkout to benchmark. Default: this checkout.")
+    argparser.add_argument("sizes", nargs="*", type=int, default=[1000, 4000, 10000],
+                           help="Number of split tasks in each benchmarked graph.")
+    args = argparser.parse_args()
+
+    sys.path.insert(0, os.path.abspath(args.repo))
+    sys.setrecursionlimit(1000000)
+    logging.disable(logging.CRITICAL)
+    from System.Graph import Graph
+
+    print("%10s %10s %12s" % ("nodes", "edges", "validate (s)"))
+    for size in args.sizes:
+        graph = make_graph(Graph, size)
+        start = time.time()
+        graph._Graph__check_adjacency_list()
+        graph._Graph__check_cycles()
+        print("%10d %10d %12.3f" % (len(graph.adj_list), sum([len(parents) for parents in graph.adj_list.values()]),
+                                     time.time() - start))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# Benchmark of splitting tasks when a splitter finishes
+#
+# Times Task.split on a single task and reports the memory held by each clone, then times split_graph on a whole
+# RefSplitter scatter with several downstream tasks.
+# Run against another checkout of CloudConductor (e.g. a 'git worktree' of an older commit) to compare implementations:
+#
+#   python benchmarks/task_split.py --repo /path/to/checkout --splits 2500
+
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+import tracemalloc
+
+# Splitter feeding a chain of samtools tasks that are all split and gathered back together
+GRAPH_CONFIG = """
+[split]
+module          = RefSplitter
+
+[index]
+module          = Samtools
+submodule       = Index
+input_from      = split
+
+[flag]
+module          = Samtools
+submodule       = Flagstat
+input_from      = index
+
+[view]
+module          = Samtools
+submodule       = View
+input_from      = index, flag
+
+[gather]
+module          = Gatherers
+submodule       = GatherBams
+input_from      = view
+final_output    = bam
+"""
+
+def load_graph(graph_class):
+    with tempfile.NamedTemporaryFile("w", suffix=".config") as graph_config:
+        graph_config.write(GRAPH_CONFIG)
+        graph_config.flush()
+        return graph_class(graph_config.name)
+
+def benchmark_task_split(graph_class, nr_clones):
+    # Average time and retained memory of splitting one task
+    task = load_graph(graph_class).get_tasks("view")
+    tracemalloc.start()
+    start = time.time()
+    clones = [task.split("split", "split_%d" % i, None) for i in range(nr_clones)]
+    runtime = time.time() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print("Task.split: %.2f ms and %.1f KB per split (%d splits)"
+          % (runtime / nr_clones * 1000, memory / nr_clones / 1024.0, len(clones)))
+
+def benchmark_split_graph(graph_class, nr_splits):
+    # Time of splitting the whole subgraph below a splitter
+    graph = load_graph(graph_class)
+    splitter = graph.get_tasks("split")
+    splitter.module.set_argument("chrom_list", ["chr%d" % i for i in range(nr_splits)])
+    splitter.module.set_argument("nr_splits", nr_splits)
+    splitter.module.get_command()
+    start = time.time()
+    graph.split_graph("split")
+    print("split_graph: %.2fs for %d-way split (%d tasks in graph)" % (time.time() - start, nr_splits, len(graph.get_tasks())))
+
+def main():
+    argparser = argparse.ArgumentParser(description="Time splitting tasks and graphs.")
+    argparser.add_argument("--repo", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."),
+                           help="CloudConductor checkout to benchmark. Default: this checkout.")
+    argparser.add_argument("--clones", type=int, default=500, help="Number of times a single task is split.")
+    argparser.add_argument("--splits", type=int, default=2500, help="Width of the split graph.")
+    args = argparser.parse_args()
+
+    # Modules are loaded the same way CloudConductor loads them
+    repo = os.path.abspath(args.repo)
+    os.chdir(repo)
+    sys.path.insert(0, repo)
+    for module_dir in ["Modules/Tools/", "Modules/Splitters/", "Modules/Mergers/"]:
+        sys.path.insert(1, os.path.join(repo, module_dir))
+    logging.disable(logging.CRITICAL)
+    from System.Graph import Graph
+
+    benchmark_task_split(Graph, args.clones)
+    benchmark_split_graph(Graph, args.splits)
+
+if __name__ == "__main__":
+    main()